@@ -6,7 +6,11 @@ import okhttp3.MediaType.Companion.toMediaType
 import okhttp3.MultipartBody
 import okhttp3.OkHttpClient
 import okhttp3.Request
+import okhttp3.RequestBody
 import okhttp3.RequestBody.Companion.toRequestBody
+import okio.Buffer
+import okio.GzipSink
+import okio.buffer
 import org.json.JSONObject
 import org.json.JSONTokener
 import java.io.IOException
@@ -49,8 +53,9 @@ class ApiClient(private val prefs: PreferencesRepository) {
                 .build()
             val request = Request.Builder()
                 .url("$apiUrl/document?url=${URLEncoder.encode(url, "UTF-8")}")
-                .put(body)
+                .put(gzip(body))
                 .header("Authorization", "Bearer $token")
+                .header("Content-Encoding", "gzip")
                 .build()
             val response = client.newCall(request).execute()
             if (response.isSuccessful) {
@@ -63,6 +68,14 @@ class ApiClient(private val prefs: PreferencesRepository) {
         }
     }
 
+    // The storage service inflates Content-Encoding: gzip bodies, and HTML
+    // compresses well, so this is a big win on slow mobile uplinks.
+    private fun gzip(body: RequestBody): RequestBody {
+        val compressed = Buffer()
+        GzipSink(compressed).buffer().use { body.writeTo(it) }
+        return compressed.readByteString().toRequestBody(body.contentType())
+    }
+
     suspend fun search(query: String, top: Int = 10): Result<SearchResponse> = withContext(Dispatchers.IO) {
         val apiUrl = prefs.apiUrl.trimEnd('/')
         val token = prefs.bearerToken
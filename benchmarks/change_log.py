@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Cost of publishing an indexed document through the change log
+(INDEX_CHANGE_LOG) against re-uploading its index snapshot, and how quickly a
+search replica takes the record in.
+
+For every size (in chunks) the synthetic index from generate_index.py is
+generated, or reused from --cache-dir, and published to a moto S3 bucket with
+the indexer's `_upload_index_file`.  --records documents of the index's shape
+(--chunks-per-document chunks, synthetic embeddings) are then appended with
+the indexer's `append_change`, and the search service downloads the snapshot
+and replays them.  It reports:
+
+    snapshot_mb             what the indexer uploads per document without the log
+    record_kb               median gzip record size per document
+    append_ms               median `append_change` time (LIST + HEAD + PUT on moto)
+    replay_ms_per_record    search-side `_catch_up_change_log` time over all
+                            the records, per record
+    catch_up_one_ms         `_get_shards` with one new record pending: list,
+                            apply, checkpoint and reopen, as a request pays it
+    compact_s               `compact_change_log` folding every record into a
+                            new snapshot (download, replay, gzip and upload)
+    publish_estimate_ms     per-document S3 time at --latency-ms/--bandwidth-mb-s,
+                            for the snapshot upload and for the record
+    freshness_estimate_s    how long until a replica serves a new document:
+                            half the poll interval, plus LIST, GET and apply
+
+moto answers in-process, so measured times leave out the network; the
+estimates add it back.
+
+Usage:
+    python benchmarks/change_log.py --sizes 10000,50000 \\
+        --cache-dir /tmp/jml-indexes --output benchmarks/results/change-log.json
+
+Needs the search and index services' dependencies (sqlite-vec) and moto.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_index import IndexSpec, _unit_vectors, generate_index
+from handlers import BENCHMARK_ENV
+from pipeline import load_service
+
+DEFAULT_SIZES = "10000"
+DEFAULT_RECORDS = 20
+DEFAULT_LATENCY_MS = 30.0  # first-byte latency of an S3 request from Lambda
+DEFAULT_BANDWIDTH_MB_S = 90.0
+
+
+def _estimate_ms(requests: int, nbytes: float, latency_ms: float, bw: float) -> float:
+    return requests * latency_ms + nbytes / 1e6 / bw * 1000
+
+
+def _documents(spec: IndexSpec, count: int, seed: int):
+    """(url, chunks, embeddings, title) shaped like the synthetic index's."""
+    rng = random.Random(seed)
+    text = "synthetic change log chunk " * (spec.chunk_chars // 27 + 1)
+    for number in range(count):
+        blobs = _unit_vectors(
+            rng, spec.chunks_per_document, spec.dimensions, spec.topic_weight
+        )
+        embeddings = [list(struct.unpack(f"{spec.dimensions}f", b)) for b in blobs]
+        chunks = [text[: spec.chunk_chars]] * spec.chunks_per_document
+        yield f"https://changes.example/{number}", chunks, embeddings, "Change #log"
+
+
+def benchmark_size(indexer, search, path: Path, spec: IndexSpec, workdir, args):
+    import boto3  # pyright: ignore[reportMissingImports]
+
+    s3 = boto3.client("s3")
+    bucket = BENCHMARK_ENV["APPLICATION_BUCKET"]
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            s3.delete_object(Bucket=bucket, Key=obj["Key"])
+    indexer._upload_index_file(str(path), bucket, indexer.VECTOR_DB_S3_KEY)
+
+    record_bytes, append_ms = [], []
+    for url, chunks, embeddings, title in _documents(spec, args.records, args.seed):
+        change = indexer._document_change(url, chunks, embeddings, title)
+        started = time.perf_counter()
+        sequence = indexer.append_change(change)
+        append_ms.append((time.perf_counter() - started) * 1000)
+        key = indexer._log_key(0, sequence)
+        record_bytes.append(s3.head_object(Bucket=bucket, Key=key)["ContentLength"])
+
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{search.VECTOR_DB_LOCAL_PATH}{suffix}").unlink(missing_ok=True)
+    search._shards = []
+    search._download_index()
+    started = time.perf_counter()
+    search._catch_up_change_log()
+    replay_ms = (time.perf_counter() - started) * 1000
+    search._get_shards()
+
+    (url, chunks, embeddings, title) = next(
+        _documents(spec, 1, args.seed + args.records)
+    )
+    indexer.append_change(indexer._document_change(url, chunks, embeddings, title))
+    search._change_log_checked = 0.0
+    started = time.perf_counter()
+    search._get_shards()
+    catch_up_one_ms = (time.perf_counter() - started) * 1000
+    for conn in search._shards:
+        conn.close()
+    search._shards = []
+
+    indexer.VECTOR_DB_LOCAL_PATH = str(workdir / "indexer.db")
+    started = time.perf_counter()
+    folded = indexer.compact_change_log()
+    compact_s = time.perf_counter() - started
+    assert folded == args.records + 1
+
+    size = path.stat().st_size
+    record = statistics.median(record_bytes)
+    per_record_ms = replay_ms / args.records
+    # A record reaches a replica on its next poll: one LIST and one GET
+    freshness_ms = (
+        args.poll_seconds * 1000 / 2
+        + _estimate_ms(2, record, args.latency_ms, args.bandwidth_mb_s)
+        + catch_up_one_ms
+    )
+    return {
+        "documents": spec.documents,
+        "chunks": spec.chunks,
+        "snapshot_mb": round(size / 1e6, 1),
+        "record_kb": round(record / 1e3, 1),
+        "append_ms": round(statistics.median(append_ms), 2),
+        "replay_ms_per_record": round(per_record_ms, 2),
+        "catch_up_one_ms": round(catch_up_one_ms, 2),
+        "compact_s": round(compact_s, 2),
+        "publish_estimate_ms": {
+            "snapshot": round(
+                _estimate_ms(1, size, args.latency_ms, args.bandwidth_mb_s)
+            ),
+            # LIST + HEAD to find the next sequence, then the PUT
+            "change_log": round(
+                _estimate_ms(3, record, args.latency_ms, args.bandwidth_mb_s)
+            ),
+        },
+        "freshness_estimate_s": round(freshness_ms / 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare change-log records with snapshot uploads",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated chunk counts (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=DEFAULT_RECORDS,
+        help=f"Documents appended per size (default: {DEFAULT_RECORDS})",
+    )
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS)
+    parser.add_argument("--bandwidth-mb-s", type=float, default=DEFAULT_BANDWIDTH_MB_S)
+    parser.add_argument("--chunks-per-document", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="Keep/reuse generated indexes here"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["INDEX_CHANGE_LOG"] = "true"
+
+    import boto3  # pyright: ignore[reportMissingImports]
+    from moto import mock_aws  # pyright: ignore[reportMissingImports]
+
+    with mock_aws(), tempfile.TemporaryDirectory(prefix="jml-change-log-") as tmp:
+        boto3.client("s3").create_bucket(Bucket=BENCHMARK_ENV["APPLICATION_BUCKET"])
+        workdir = Path(tmp)
+        search = load_service("search-documents-service")
+        search.get_s3_client.cache_clear()
+        search.VECTOR_DB_LOCAL_PATH = str(workdir / "search.db")
+        args.poll_seconds = search.INDEX_CHANGE_LOG_POLL_SECONDS
+        cache_dir = args.cache_dir or workdir
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sizes = []
+        for chunks in (int(s) for s in args.sizes.split(",")):
+            spec = IndexSpec(
+                documents=max(1, chunks // args.chunks_per_document),
+                chunks_per_document=args.chunks_per_document,
+                seed=args.seed,
+            )
+            path = cache_dir / spec.cache_name()
+            if not path.exists():
+                print(f"Generating {spec.chunks} chunks → {path}", file=sys.stderr)
+                generate_index(path, spec)
+            # generate_index reloads the indexer, so load ours afterwards
+            indexer = load_service("index-documents-service")
+            indexer.get_s3_client.cache_clear()
+            print(f"Appending to {spec.chunks} chunks", file=sys.stderr)
+            sizes.append(benchmark_size(indexer, search, path, spec, workdir, args))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "records": args.records,
+        "poll_seconds": args.poll_seconds,
+        "latency_ms": args.latency_ms,
+        "bandwidth_mb_s": args.bandwidth_mb_s,
+        "sizes": sizes,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Generate a deterministic synthetic `index.db` for scale testing.
+
+The schema comes from the indexer's own `_init_schema`, titles go through its
+`_parse_title`, and embeddings are float32 blobs laid out like
+`_serialize_embedding` output, so the file is the same shape as the one the indexer uploads to S3.  Only the content
+is synthetic:
+
+- titles are drawn from a generated vocabulary with a Zipf-like skew, so a
+  few words are common and most are rare (like real titles);
+- tags are drawn the same way from their own, smaller vocabulary;
+- every document gets a random unit "topic" vector, and each chunk a
+  normalised mix of it and its own random direction (--topic-weight), so a
+  document's chunks are related like real ones; chunk_text is filler of the
+  indexer's typical chunk length;
+- per-document centroids and truncated short vectors (--short-dimensions)
+  are filled in by the indexer's own backfills.
+
+The same arguments and seed always produce the same rows.
+
+Usage:
+    # 10k chunks (1000 documents × 10 chunks)
+    python benchmarks/generate_index.py /tmp/index-10k.db --documents 1000
+
+    # 1M chunks, 200 tags with a heavier head
+    python benchmarks/generate_index.py /tmp/index-1m.db \\
+        --documents 100000 --chunks-per-document 10 --tags 200 --tag-skew 1.3
+
+Needs the index service's dependencies (sqlite-vec).  numpy is used for the
+vectors when it is installed, which makes million-chunk indexes much faster.
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+import struct
+import sys
+from array import array
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from handlers import BENCHMARK_ENV
+from pipeline import load_service
+
+INSERT_BATCH_SIZE = 5000
+_SYLLABLES = (
+    "ka ri to ne mu sa lo vi de pa shi ro fe an el or ul im ba zu "
+    "qui tor len mar ves dal pin gro sto flu"
+).split()
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    documents: int = 1000
+    chunks_per_document: int = 10
+    title_vocabulary: int = 2000
+    title_words: int = 6  # words per title (before tags)
+    tags: int = 50  # distinct tags
+    tags_per_document: float = 1.5  # mean; exponential, capped at 8
+    tag_skew: float = 1.1  # Zipf exponent for tag popularity
+    title_skew: float = 1.0  # Zipf exponent for title word popularity
+    chunk_chars: int = 2000
+    dimensions: int = 1024
+    short_dimensions: int = 256  # truncated vectors for the first search pass
+    topic_weight: float = 0.8  # how much a chunk's vector follows its document's
+    seed: int = 0
+
+    @property
+    def chunks(self) -> int:
+        return self.documents * self.chunks_per_document
+
+    def cache_name(self) -> str:
+        """File name that changes whenever any parameter does."""
+        fields = "-".join(f"{v}" for v in asdict(self).values())
+        return f"index-{fields}.db"
+
+
+def vocabulary(size: int, rng: random.Random, prefix: str = "") -> list[str]:
+    """Deterministic pronounceable pseudo-words, unique, length 2-4 syllables."""
+    words: dict[str, None] = {}
+    while len(words) < size:
+        word = "".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4)))
+        words[prefix + word] = None
+    return list(words)
+
+
+def zipf_weights(n: int, skew: float) -> list[float]:
+    return list(itertools.accumulate(1 / (rank**skew) for rank in range(1, n + 1)))
+
+
+def _unit_vectors(
+    rng: random.Random, count: int, dimensions: int, topic_weight: float = 0.0
+) -> list[bytes]:
+    """`count` random unit vectors as float32 blobs.
+
+    With `topic_weight`, every vector is pulled that far towards one shared
+    random direction, so the set looks like the chunks of one document.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        rows = [array("h", rng.randbytes(2 * dimensions)) for _ in range(count + 1)]
+        norms = [math.sqrt(sum(x * x for x in row)) or 1 for row in rows]
+        topic = [x * topic_weight / norms[0] for x in rows[0]]
+        blobs = []
+        for row, norm in zip(rows[1:], norms[1:]):
+            weight = (1 - topic_weight) / norm
+            mixed = [t + x * weight for t, x in zip(topic, row)]
+            scale = 1 / (math.sqrt(sum(x * x for x in mixed)) or 1)
+            blobs.append(array("f", (x * scale for x in mixed)).tobytes())
+        return blobs
+
+    generator = np.random.default_rng(rng.getrandbits(64))
+    vectors = generator.standard_normal((count + 1, dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = topic_weight * vectors[:1] + (1 - topic_weight) * vectors[1:]
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [row.tobytes() for row in vectors]
+
+
+def generate_index(path: Path, spec: IndexSpec) -> Path:
+    """Write a synthetic index for `spec` to `path` (replacing it)."""
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    indexer = load_service("index-documents-service")
+    indexer.EMBEDDING_DIMENSIONS = spec.dimensions
+    indexer.SHORT_EMBEDDING_DIMENSIONS = spec.short_dimensions
+
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    indexer.VECTOR_DB_LOCAL_PATH = str(path)
+    conn = indexer._open_db()
+    conn.execute("PRAGMA synchronous=OFF")
+    indexer._init_schema(conn)
+
+    rng = random.Random(spec.seed)
+    title_words = vocabulary(spec.title_vocabulary, rng)
+    tags = vocabulary(spec.tags, rng, prefix="t")
+    title_cum = zipf_weights(len(title_words), spec.title_skew)
+    tag_cum = zipf_weights(len(tags), spec.tag_skew)
+
+    chunk_rows: list[tuple] = []
+    vec_rows: list[tuple] = []
+    chunk_id = 0
+    for number in range(spec.documents):
+        url = f"https://synthetic.example/{spec.seed}/{number}"
+        words = rng.choices(title_words, cum_weights=title_cum, k=spec.title_words)
+        tag_count = min(8, int(rng.expovariate(1 / spec.tags_per_document) + 0.5))
+        doc_tags = set(rng.choices(tags, cum_weights=tag_cum, k=tag_count))
+        raw_title = " ".join(words + [f"#{t}" for t in sorted(doc_tags)])
+        full_title, normalized_title, parsed_tags = indexer._parse_title(raw_title)
+        conn.execute(
+            "INSERT INTO documents (url, full_title, title) VALUES (?, ?, ?)",
+            (url, full_title, normalized_title),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO document_tags (url, tag) VALUES (?, ?)",
+            [(url, tag) for tag in parsed_tags],
+        )
+
+        filler = " ".join(words)
+        chunk_text = (filler + " ") * (spec.chunk_chars // (len(filler) + 1) + 1)
+        vectors = _unit_vectors(
+            rng, spec.chunks_per_document, spec.dimensions, spec.topic_weight
+        )
+        for chunk_index, blob in enumerate(vectors):
+            chunk_id += 1
+            chunk_rows.append(
+                (chunk_id, url, chunk_index, chunk_text[: spec.chunk_chars])
+            )
+            vec_rows.append((chunk_id, blob))
+
+        if len(chunk_rows) >= INSERT_BATCH_SIZE or number == spec.documents - 1:
+            conn.executemany(
+                "INSERT INTO chunks (id, url, chunk_index, chunk_text) "
+                "VALUES (?, ?, ?, ?)",
+                chunk_rows,
+            )
+            conn.executemany(
+                "INSERT INTO vec_chunks (chunk_id, embedding) VALUES (?, ?)", vec_rows
+            )
+            conn.commit()
+            chunk_rows, vec_rows = [], []
+
+    indexer._backfill_document_centroids(conn)
+    indexer._backfill_short_vectors(conn)
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return path
+
+
+def split_index(path: Path, shards: int) -> list[Path]:
+    """Split an index into `shards` files the way the indexer assigns URLs.
+
+    Shard files sit next to `path` and are reused if they already exist.
+    """
+    indexer = load_service("index-documents-service")
+    indexer.INDEX_SHARDS = shards
+    paths = [
+        path.with_name(f"{path.stem}-shard-{i}-of-{shards}.db") for i in range(shards)
+    ]
+    for shard, shard_path in enumerate(paths):
+        if shard_path.exists():
+            continue
+        partial = shard_path.with_suffix(".partial")
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{partial}{suffix}").unlink(missing_ok=True)
+        conn = indexer._open_db(str(partial))
+        conn.execute("PRAGMA synchronous=OFF")
+        indexer._init_schema(conn)
+        conn.create_function("shard_of", 1, indexer._shard_for, deterministic=True)
+        conn.execute("ATTACH DATABASE ? AS src", (str(path),))
+        mine = f"shard_of(url) = {shard}"
+        for table in ("documents", "document_tags", "chunks"):
+            conn.execute(f"INSERT INTO {table} SELECT * FROM src.{table} WHERE {mine}")
+        for table in ("vec_chunks", "vec_chunks_short"):
+            conn.execute(
+                f"INSERT INTO {table} (chunk_id, embedding) "
+                f"SELECT chunk_id, embedding FROM src.{table} "
+                f"WHERE chunk_id IN (SELECT id FROM main.chunks)"
+            )
+        conn.execute(
+            "INSERT INTO vec_documents (embedding, url) "
+            f"SELECT embedding, url FROM src.vec_documents WHERE {mine}"
+        )
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        partial.rename(shard_path)
+    return paths
+
+
+def random_query_vector(rng: random.Random, dimensions: int) -> list[float]:
+    return list(struct.unpack(f"{dimensions}f", _unit_vectors(rng, 1, dimensions)[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic index.db",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("output", type=Path, help="Where to write index.db")
+    defaults = IndexSpec()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(value),
+            default=value,
+            help=f"(default: {value})",
+        )
+    args = parser.parse_args()
+
+    spec = IndexSpec(**{name: getattr(args, name) for name in asdict(defaults)})
+    generate_index(args.output, spec)
+    print(
+        f"Wrote {args.output}: {spec.documents} documents, {spec.chunks} chunks, "
+        f"{args.output.stat().st_size / 1e6:.1f} MB",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
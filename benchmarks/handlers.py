@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Cold-start and per-invocation benchmark for each service's `lambda_handler`.
+
+Each service runs in a fresh interpreter against local stand-ins: moto for
+S3/SSM/EventBridge and a deterministic fake Bedrock.  The worker imports `app`
+(timed), sends one realistic event (first invoke, which also pays for lazy
+clients and the index download), then the same event several more times
+(warm invokes).  Peak RSS is read from the kernel, so it includes moto's own
+footprint and is only meaningful relative to other runs of this script.
+
+Events:
+    document-storage-service  PUT /document with a multipart HTML upload
+    index-documents-service   SQS batch carrying a "Document stored" event
+    search-documents-service  GET /search against the index the indexer built
+
+Usage:
+    # Benchmark every service in its own uv environment (+ moto), print JSON
+    python benchmarks/handlers.py
+
+    # Write a new baseline
+    python benchmarks/handlers.py --output benchmarks/results/handlers.json
+
+    # Fail if import/first/warm latency regressed by more than 25%
+    python benchmarks/handlers.py --baseline benchmarks/results/handlers.json
+
+    # Use a specific interpreter (must have the service deps and moto)
+    python benchmarks/handlers.py --python .venv/bin/python
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from import_time import BENCHMARK_ENV, REPO_ROOT, SERVICES
+
+MOTO_REQUIREMENT = "moto[s3,ssm,events]>=5"
+BEARER_TOKEN = "benchmark-token"
+DOCUMENT_URL = "https://example.com/benchmarks/handler-latency"
+DOCUMENT_TITLE = "Handler latency #benchmark #lambda"
+DOCUMENT_FOLDER = "document-storage/benchmark"
+SEARCH_QUERY = "cold start latency #benchmark"
+EMBEDDING_DIMENSIONS = 1024
+# Quiet logs so that stdout handling doesn't dominate warm invocations
+WORKER_ENV = {
+    **BENCHMARK_ENV,
+    "LOG_LEVEL": "WARNING",
+    "POWERTOOLS_LOG_LEVEL": "WARNING",
+}
+COMPARED_METRICS = ("import_ms", "first_invoke_ms", "warm_invoke_ms")
+
+
+# ---------------------------------------------------------------------------
+# Local stand-ins (run inside the worker)
+# ---------------------------------------------------------------------------
+
+
+class FakeLambdaContext:
+    function_name = "benchmark"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 512
+    invoked_function_arn = "arn:aws:lambda:us-east-1:000000000000:function:benchmark"
+    aws_request_id = "benchmark-request"
+
+
+class _Body:
+    def __init__(self, payload: bytes):
+        self._payload = payload
+
+    def read(self) -> bytes:
+        return self._payload
+
+
+class FakeBedrock:
+    """Titan-shaped invoke_model returning a deterministic unit vector."""
+
+    def invoke_model(self, modelId: str, body: str) -> dict:
+        request = json.loads(body)
+        dimensions = request.get("dimensions", EMBEDDING_DIMENSIONS)
+        seed = int.from_bytes(
+            hashlib.sha256(request["inputText"].encode()).digest()[:4], "big"
+        )
+        vector = [math.sin(seed + i) for i in range(dimensions)]
+        norm = math.sqrt(sum(x * x for x in vector))
+        return {
+            "body": _Body(
+                json.dumps({"embedding": [x / norm for x in vector]}).encode()
+            )
+        }
+
+
+def benchmark_document_html(paragraphs: int = 40) -> str:
+    """A ~25KB article: enough text for the indexer to produce several chunks."""
+    sentences = (
+        "Cold starts are paid once per execution environment, before the first event.",
+        "Warm invocations reuse module state, open connections and downloaded files.",
+        "Import time is dominated by the heaviest third-party packages on the path.",
+        "The vector index is downloaded from S3 and opened with sqlite-vec.",
+        "Each chunk is embedded separately and stored alongside its source URL.",
+    )
+    body = "\n".join(
+        f"<p>{' '.join(sentences[(i + j) % len(sentences)] for j in range(4))}</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        "<html><head><title>Handler latency</title></head>"
+        f"<body><nav>Home | About</nav><article>{body}</article></body></html>"
+    )
+
+
+def _http_event(method: str, path: str, query: dict, headers: dict, body: str = ""):
+    return {
+        "version": "2.0",
+        "routeKey": f"{method} {path}",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in query.items()),
+        "headers": {"authorization": f"Bearer {BEARER_TOKEN}", **headers},
+        "queryStringParameters": query,
+        "isBase64Encoded": False,
+        "body": body,
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": "benchmark",
+            },
+            "requestId": "benchmark-request",
+            "stage": "$default",
+        },
+    }
+
+
+def _setup_aws() -> None:
+    import boto3
+
+    bucket = BENCHMARK_ENV["APPLICATION_BUCKET"]
+    boto3.client("s3").create_bucket(Bucket=bucket)
+    boto3.client("ssm").put_parameter(
+        Name=BENCHMARK_ENV["BEARER_TOKEN_PARAM_NAME"],
+        Value=BEARER_TOKEN,
+        Type="SecureString",
+    )
+    boto3.client("events").create_event_bus(Name=BENCHMARK_ENV["EVENT_BUS_NAME"])
+
+
+def _storage_event(workdir: Path) -> dict:
+    boundary = "benchmark-boundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="document"; filename="document.html"\r\n'
+        "Content-Type: text/html\r\n\r\n"
+        f"{benchmark_document_html()}\r\n"
+        f"--{boundary}--\r\n"
+    )
+    return _http_event(
+        "PUT",
+        "/document",
+        {"url": DOCUMENT_URL, "title": DOCUMENT_TITLE},
+        {"content-type": f"multipart/form-data; boundary={boundary}"},
+        body,
+    )
+
+
+def _index_event(workdir: Path) -> dict:
+    import boto3
+
+    s3 = boto3.client("s3")
+    bucket = BENCHMARK_ENV["APPLICATION_BUCKET"]
+    s3.put_object(
+        Bucket=bucket,
+        Key=f"{DOCUMENT_FOLDER}/document.html",
+        Body=benchmark_document_html().encode(),
+        ContentType="text/html",
+    )
+    s3.put_object(
+        Bucket=bucket,
+        Key=f"{DOCUMENT_FOLDER}/.metadata.json",
+        Body=json.dumps(
+            {
+                "url": DOCUMENT_URL,
+                "title": DOCUMENT_TITLE,
+                "entrypoint": "document.html",
+            }
+        ).encode(),
+    )
+    detail = {"folderPath": DOCUMENT_FOLDER, "documentUrl": DOCUMENT_URL}
+    return {
+        "Records": [
+            {
+                "messageId": "benchmark-message",
+                "body": json.dumps(
+                    {"detail-type": "Document stored", "detail": detail}
+                ),
+            }
+        ]
+    }
+
+
+def _search_event(workdir: Path) -> dict:
+    import boto3
+
+    index_path = workdir / "index.db"
+    if not index_path.exists():
+        raise RuntimeError(f"{index_path} missing; run index-documents-service first")
+    boto3.client("s3").upload_file(
+        str(index_path), BENCHMARK_ENV["APPLICATION_BUCKET"], "vector-index/index.db"
+    )
+    return _http_event("GET", "/search", {"q": SEARCH_QUERY, "top": "5"}, {})
+
+
+def _keep_index(workdir: Path) -> None:
+    """Save the indexer's output so the search benchmark can serve it."""
+    import boto3
+
+    boto3.client("s3").download_file(
+        BENCHMARK_ENV["APPLICATION_BUCKET"],
+        "vector-index/index.db",
+        str(workdir / "index.db"),
+    )
+
+
+EVENT_BUILDERS = {
+    "document-storage-service": _storage_event,
+    "index-documents-service": _index_event,
+    "search-documents-service": _search_event,
+}
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _invoke(app_module, event: dict) -> float:
+    started = time.perf_counter()
+    result = app_module.lambda_handler(event, FakeLambdaContext())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.get("statusCode") != 200:
+        raise RuntimeError(f"Handler returned {result.get('statusCode')}: {result}")
+    return elapsed_ms
+
+
+def run_worker(service: str, workdir: Path, warm: int) -> dict:
+    from moto import mock_aws
+
+    sys.path.insert(0, os.getcwd())
+    with mock_aws():
+        _setup_aws()
+        event = EVENT_BUILDERS[service](workdir)
+
+        started = time.perf_counter()
+        import app
+
+        import_ms = (time.perf_counter() - started) * 1000
+        rss_after_import = _peak_rss_mb()
+
+        if hasattr(app, "VECTOR_DB_LOCAL_PATH"):
+            app.VECTOR_DB_LOCAL_PATH = str(workdir / f"{service}.db")
+        if hasattr(app, "get_bedrock_client"):
+            fake_bedrock = FakeBedrock()
+            app.get_bedrock_client = lambda: fake_bedrock
+
+        first_invoke_ms = _invoke(app, event)
+        warm_runs = [_invoke(app, event) for _ in range(warm)]
+
+        if service == "index-documents-service":
+            _keep_index(workdir)
+
+    return {
+        "import_ms": import_ms,
+        "first_invoke_ms": first_invoke_ms,
+        "warm_runs_ms": warm_runs,
+        "rss_after_import_mb": rss_after_import,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+
+def _worker_command(service: str, python: str | None) -> list[str]:
+    if python:
+        command = [python]
+    else:
+        command = ["uv", "run", "--project", str(REPO_ROOT / service)]
+        command += ["--with", MOTO_REQUIREMENT, "python"]
+    return command + [str(Path(__file__).resolve())]
+
+
+def _run_once(service: str, python: str | None, workdir: Path, warm: int) -> dict:
+    result_path = workdir / f"{service}.json"
+    command = _worker_command(service, python) + [
+        "--worker",
+        service,
+        "--workdir",
+        str(workdir),
+        "--warm",
+        str(warm),
+    ]
+    result = subprocess.run(
+        command,
+        cwd=REPO_ROOT / service / "src",
+        env={**os.environ, **WORKER_ENV},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0 or not result_path.exists():
+        raise RuntimeError(f"Benchmarking {service} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result_path.read_text())
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(pct * len(ordered)) - 1)]
+
+
+def benchmark_service(
+    service: str, python: str | None, workdir: Path, repeat: int, warm: int
+) -> dict:
+    runs = [_run_once(service, python, workdir, warm) for _ in range(repeat)]
+    warm_runs = [ms for run in runs for ms in run["warm_runs_ms"]]
+    return {
+        "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "first_invoke_ms": round(
+            statistics.median(r["first_invoke_ms"] for r in runs), 1
+        ),
+        "warm_invoke_ms": round(statistics.median(warm_runs), 2),
+        "warm_invoke_p95_ms": round(_percentile(warm_runs, 0.95), 2),
+        "rss_after_import_mb": max(r["rss_after_import_mb"] for r in runs),
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "runs": repeat,
+        "warm_invocations": len(warm_runs),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for service, current in results["services"].items():
+        previous = baseline.get("services", {}).get(service)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in previous:
+                continue
+            limit = previous[metric] * (1 + tolerance)
+            if current[metric] > limit:
+                regressions.append(
+                    f"{service} {metric}: {current[metric]}ms > {limit:.1f}ms "
+                    f"(baseline {previous[metric]}ms + {tolerance:.0%})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold start and invocation latency of each service",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--python", help="Interpreter to use instead of the service's uv env"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Fresh processes per service"
+    )
+    parser.add_argument(
+        "--warm", type=int, default=20, help="Warm invocations per process"
+    )
+    parser.add_argument(
+        "--service", action="append", choices=SERVICES, help="Limit to a service"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare against a results JSON file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown vs baseline (default: 0.25 = 25%%)",
+    )
+    parser.add_argument("--worker", choices=SERVICES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.workdir, args.warm)
+        (args.workdir / f"{args.worker}.json").write_text(json.dumps(result))
+        return
+
+    selected = args.service or list(SERVICES)
+    with tempfile.TemporaryDirectory(prefix="jml-bench-") as tmp:
+        workdir = Path(tmp)
+        if (
+            "search-documents-service" in selected
+            and "index-documents-service" not in selected
+        ):
+            # Search needs an index to serve; build one without reporting it
+            _run_once("index-documents-service", args.python, workdir, warm=0)
+        services = {}
+        for service in SERVICES:
+            if service in selected:
+                print(f"Benchmarking {service}", file=sys.stderr)
+                services[service] = benchmark_service(
+                    service, args.python, workdir, args.repeat, args.warm
+                )
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "services": services,
+    }
+
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
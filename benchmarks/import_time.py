@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Import-time (cold start) profile for each service's `app` module.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter for each
+service, several times, and records the median cumulative import time of
+`app` plus its heaviest direct imports.  That import is exactly what a Lambda
+init phase pays for before the first event is handled.
+
+Usage:
+    # Profile every service in its own uv environment, print JSON
+    python benchmarks/import_time.py
+
+    # Write a new baseline (check it in alongside the change that moved it)
+    python benchmarks/import_time.py --output benchmarks/results/import-time.json
+
+    # Fail if any service got more than 25% slower than the checked-in baseline
+    python benchmarks/import_time.py --baseline benchmarks/results/import-time.json
+
+    # Use a specific interpreter instead of `uv run --project <service>`
+    python benchmarks/import_time.py --python .venv/bin/python
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SERVICES = (
+    "document-storage-service",
+    "index-documents-service",
+    "search-documents-service",
+)
+# Enough configuration for the modules to import; nothing talks to AWS
+BENCHMARK_ENV = {
+    "APPLICATION_BUCKET": "benchmark-bucket",
+    "EVENT_BUS_NAME": "benchmark-bus",
+    "BEARER_TOKEN_PARAM_NAME": "/just-my-links/auth-token/benchmark",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "POWERTOOLS_TRACE_DISABLED": "1",
+    "POWERTOOLS_METRICS_NAMESPACE": "benchmark",
+}
+TOP_IMPORT_COUNT = 10
+
+
+def _parse_importtime(stderr: str) -> tuple[int, list[tuple[str, int]]]:
+    """Return (cumulative µs for `app`, [(direct import, cumulative µs)])."""
+    direct_imports: list[tuple[str, int]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _self_us, cumulative_us, name = line.split("|")
+        # `-X importtime` nests children two spaces deeper than their parent
+        # and prints them *before* the parent line.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        module = name.strip()
+        cumulative = int(cumulative_us.strip())
+        if depth == 0:
+            if module == "app":
+                return cumulative, direct_imports
+            direct_imports = []
+        elif depth == 1:
+            direct_imports.append((module, cumulative))
+    raise RuntimeError("`app` did not appear in the -X importtime output")
+
+
+def profile_service(service: str, python: str | None, repeat: int) -> dict:
+    service_dir = REPO_ROOT / service
+    command = (
+        [python] if python else ["uv", "run", "--project", str(service_dir), "python"]
+    )
+    command += ["-X", "importtime", "-c", "import app"]
+
+    runs: list[int] = []
+    top_imports: dict[str, list[int]] = {}
+    for _ in range(repeat):
+        result = subprocess.run(
+            command,
+            cwd=service_dir / "src",
+            env={**os.environ, **BENCHMARK_ENV},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {service} failed:\n{result.stderr[-2000:]}")
+        total_us, direct_imports = _parse_importtime(result.stderr)
+        runs.append(total_us)
+        for module, cumulative in direct_imports:
+            top_imports.setdefault(module, []).append(cumulative)
+
+    medians = {m: statistics.median(v) for m, v in top_imports.items()}
+    heaviest = sorted(medians.items(), key=lambda x: x[1], reverse=True)
+    return {
+        "import_ms": round(statistics.median(runs) / 1000, 1),
+        "runs_ms": [round(r / 1000, 1) for r in runs],
+        "top_imports_ms": {
+            module: round(us / 1000, 1) for module, us in heaviest[:TOP_IMPORT_COUNT]
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for service, current in results["services"].items():
+        previous = baseline.get("services", {}).get(service)
+        if not previous:
+            continue
+        limit = previous["import_ms"] * (1 + tolerance)
+        if current["import_ms"] > limit:
+            regressions.append(
+                f"{service}: {current['import_ms']}ms > {limit:.1f}ms "
+                f"(baseline {previous['import_ms']}ms + {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Profile import time (cold start) of each service",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--python", help="Interpreter to use instead of the service's uv env"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per service")
+    parser.add_argument(
+        "--service", action="append", choices=SERVICES, help="Limit to a service"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare against a results JSON file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown vs baseline (default: 0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "services": {
+            service: profile_service(service, args.python, args.repeat)
+            for service in (args.service or SERVICES)
+        },
+    }
+
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
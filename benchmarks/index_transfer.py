@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Size and speed of the gzip index copy (INDEX_PUBLISH_FORMATS) against the raw
+file, for the synthetic index from generate_index.py.
+
+For every size (in chunks) the index is generated, or reused from --cache-dir.
+It is then compressed at each --levels setting the way the indexer's
+`_upload_index_file` does it, and decoded the way `_download_index_file` does
+it (zlib stream, TRANSFER_CHUNK_BYTES at a time).  Per level it reports:
+
+    ratio                  compressed bytes / raw bytes
+    compress_mb_s          raw MB compressed per second (indexer side)
+    decompress_mb_s        raw MB produced per second (search side)
+    download_s/upload_s    estimated wall time at --bandwidth-mb-s, counting
+                           the transfer and the (de)compression one after
+                           the other (the indexer compresses, then uploads)
+    streamed_download_s    the slower of the two instead, since the search
+                           service decodes the body as it arrives
+
+S3 itself is not involved, so the numbers do not depend on the network this
+runs on.  The raw row (level 0) is the transfer alone.
+
+Usage:
+    python benchmarks/index_transfer.py --sizes 10000,50000 \\
+        --cache-dir /tmp/jml-indexes --output benchmarks/results/index-transfer.json
+
+Needs the index service's dependencies (sqlite-vec) to generate indexes.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from generate_index import IndexSpec, generate_index
+from handlers import BENCHMARK_ENV
+from pipeline import load_service
+
+DEFAULT_SIZES = "10000,50000"
+DEFAULT_LEVELS = "1,6"
+# Roughly what a Lambda function sees from S3 in the same region
+DEFAULT_BANDWIDTH_MB_S = 90.0
+
+
+def _compress(path: Path, level: int, chunk_bytes: int) -> tuple[Path, float]:
+    compressed = path.with_name(f"{path.name}.{level}.gz")
+    started = time.perf_counter()
+    with open(path, "rb") as f_in, gzip.open(compressed, "wb", level) as f_out:
+        shutil.copyfileobj(f_in, f_out, chunk_bytes)
+    return compressed, time.perf_counter() - started
+
+
+def _decompress(compressed: Path, chunk_bytes: int) -> tuple[int, float]:
+    started = time.perf_counter()
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    written = 0
+    with open(compressed, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            written += len(decompressor.decompress(chunk))
+    written += len(decompressor.flush())
+    return written, time.perf_counter() - started
+
+
+def benchmark_size(
+    path: Path, spec: IndexSpec, levels: list[int], chunk_bytes: int, bandwidth: float
+) -> dict:
+    raw_bytes = path.stat().st_size
+    raw_mb = raw_bytes / 1e6
+    transfer_s = raw_mb / bandwidth
+    rows = [
+        {
+            "level": 0,
+            "bytes": raw_bytes,
+            "ratio": 1.0,
+            "download_s": round(transfer_s, 2),
+            "streamed_download_s": round(transfer_s, 2),
+            "upload_s": round(transfer_s, 2),
+        }
+    ]
+    for level in levels:
+        compressed, compress_s = _compress(path, level, chunk_bytes)
+        try:
+            written, decompress_s = _decompress(compressed, chunk_bytes)
+            assert written == raw_bytes
+            compressed_bytes = compressed.stat().st_size
+        finally:
+            compressed.unlink()
+        transfer_s = compressed_bytes / 1e6 / bandwidth
+        rows.append(
+            {
+                "level": level,
+                "bytes": compressed_bytes,
+                "ratio": round(compressed_bytes / raw_bytes, 3),
+                "compress_mb_s": round(raw_mb / compress_s, 1),
+                "decompress_mb_s": round(raw_mb / decompress_s, 1),
+                "download_s": round(transfer_s + decompress_s, 2),
+                "streamed_download_s": round(max(transfer_s, decompress_s), 2),
+                "upload_s": round(transfer_s + compress_s, 2),
+            }
+        )
+    return {"documents": spec.documents, "chunks": spec.chunks, "formats": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the raw and gzip index copies",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated chunk counts (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--levels",
+        default=DEFAULT_LEVELS,
+        help=f"Comma-separated gzip levels (default: {DEFAULT_LEVELS})",
+    )
+    parser.add_argument(
+        "--bandwidth-mb-s",
+        type=float,
+        default=DEFAULT_BANDWIDTH_MB_S,
+        help=f"Assumed S3 throughput (default: {DEFAULT_BANDWIDTH_MB_S})",
+    )
+    parser.add_argument("--chunks-per-document", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="Keep/reuse generated indexes here"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    indexer = load_service("index-documents-service")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="jml-index-transfer-") as tmp:
+        cache_dir = args.cache_dir or Path(tmp)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sizes = []
+        for chunks in (int(s) for s in args.sizes.split(",")):
+            spec = IndexSpec(
+                documents=max(1, chunks // args.chunks_per_document),
+                chunks_per_document=args.chunks_per_document,
+                seed=args.seed,
+            )
+            path = cache_dir / spec.cache_name()
+            if not path.exists():
+                print(f"Generating {spec.chunks} chunks → {path}", file=sys.stderr)
+                generate_index(path, spec)
+            print(f"Compressing {spec.chunks} chunks", file=sys.stderr)
+            sizes.append(
+                benchmark_size(
+                    path,
+                    spec,
+                    levels,
+                    indexer.TRANSFER_CHUNK_BYTES,
+                    args.bandwidth_mb_s,
+                )
+            )
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "bandwidth_mb_s": args.bandwidth_mb_s,
+        "default_level": indexer.INDEX_COMPRESSION_LEVEL,
+        "sizes": sizes,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
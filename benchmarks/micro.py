@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot pure-Python paths, run over `corpus/`.
+
+Cases (named `<service>.<function>[<input>]`):
+    index.extract_text             HTML pages, plain text and a PDF
+    index.chunk_text               extracted article text, long plain text
+    index._split_long_text         one paragraph far above MAX_CHUNK_CHARS
+    index._parse_title / normalize_title   200 hashtag-laden titles
+    index._serialize_embedding     one 1024-dim vector
+    storage._stream_multipart_to_s3  article + assets, identity and gzip bodies,
+                                   against an S3 that discards writes
+
+Each case is calibrated pytest-benchmark style: the loop count is raised
+until one round takes at least --min-round-time.  Then --rounds rounds
+are timed, and min/median/mean/stddev per call are reported.  --baseline
+compares medians and exits non-zero when a case regressed by more than
+--tolerance.
+
+Usage:
+    python benchmarks/micro.py                          # all cases, print JSON
+    python benchmarks/micro.py -k extract_text          # substring filter
+    python benchmarks/micro.py --output benchmarks/results/micro.json
+    python benchmarks/micro.py --baseline benchmarks/results/micro.json
+
+Needs the storage and index services' dependencies in one environment, e.g.
+    uv run --project index-documents-service --with python-multipart \\
+        python benchmarks/micro.py
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+from handlers import BENCHMARK_ENV, _http_event
+from pipeline import load_service
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+HTML_PAGES = ("article.html", "docs-page.html", "news-page.html")
+TITLE_SAMPLES = 200
+
+
+# ---------------------------------------------------------------------------
+# Stand-ins
+# ---------------------------------------------------------------------------
+
+
+class NullS3:
+    """S3 client stand-in that accepts and discards writes (CPU-only timings)."""
+
+    def __init__(self):
+        from botocore.exceptions import ClientError
+
+        self.exceptions = SimpleNamespace(ClientError=ClientError)
+        self._not_found = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def put_object(self, **kwargs) -> dict:
+        body = kwargs.get("Body")
+        if hasattr(body, "read"):
+            body.read()
+        return {"ETag": '"benchmark"'}
+
+    def create_multipart_upload(self, **kwargs) -> dict:
+        return {"UploadId": "benchmark"}
+
+    def upload_part(self, **kwargs) -> dict:
+        return {"ETag": f'"part-{kwargs["PartNumber"]}"'}
+
+    def complete_multipart_upload(self, **kwargs) -> dict:
+        return {}
+
+    def abort_multipart_upload(self, **kwargs) -> dict:
+        return {}
+
+    def head_object(self, **kwargs) -> dict:
+        raise self._not_found  # every asset looks new, so it is always uploaded
+
+
+def _multipart_event(files: list[tuple[str, str, str, bytes]], gzip_body: bool) -> dict:
+    boundary = "micro-benchmark-boundary"
+    body = b""
+    for field_name, filename, content_type, content in files:
+        body += (
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{field_name}"; '
+                f'filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n"
+            ).encode()
+            + content
+            + b"\r\n"
+        )
+    body += f"--{boundary}--\r\n".encode()
+    headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+    if gzip_body:
+        body = gzip.compress(body)
+        headers["content-encoding"] = "gzip"
+    event = _http_event("PUT", "/document", {"url": "https://example.com/m"}, headers)
+    event["body"] = base64.b64encode(body).decode()
+    event["isBase64Encoded"] = True
+    return event
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+
+
+def build_cases() -> dict[str, Callable[[], object]]:
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    indexer = load_service("index-documents-service")
+    storage = load_service("document-storage-service")
+
+    corpus = {path.name: path.read_bytes() for path in CORPUS_DIR.iterdir()}
+    article_text = indexer.extract_text(corpus["article.html"], "text/html")
+    notes_text = corpus["notes.txt"].decode()
+    long_paragraph = max(notes_text.split("\n\n"), key=len)
+    titles = [
+        f"{' '.join(article_text.split()[i : i + 8])} #tag{i % 7} #Reading"
+        for i in range(0, TITLE_SAMPLES * 8, 8)
+    ]
+    embedding = [
+        ((i * 7919) % 1000) / 1000 for i in range(indexer.EMBEDDING_DIMENSIONS)
+    ]
+
+    cases: dict[str, Callable[[], object]] = {}
+    for page in HTML_PAGES:
+        cases[f"index.extract_text[{page}]"] = lambda p=page: indexer.extract_text(
+            corpus[p], "text/html"
+        )
+    cases["index.extract_text[notes.txt]"] = lambda: indexer.extract_text(
+        corpus["notes.txt"], "text/plain"
+    )
+    cases["index.extract_text[report.pdf]"] = lambda: indexer.extract_text(
+        corpus["report.pdf"], "application/pdf"
+    )
+    cases["index.chunk_text[article.html]"] = lambda: indexer.chunk_text(article_text)
+    cases["index.chunk_text[notes.txt]"] = lambda: indexer.chunk_text(notes_text)
+    cases["index._split_long_text[notes.txt]"] = lambda: indexer._split_long_text(
+        long_paragraph
+    )
+    cases["index._parse_title[200 titles]"] = lambda: [
+        indexer._parse_title(t) for t in titles
+    ]
+    cases["index.normalize_title[200 titles]"] = lambda: [
+        indexer.normalize_title(t) for t in titles
+    ]
+    cases["index._serialize_embedding[1024]"] = lambda: indexer._serialize_embedding(
+        embedding
+    )
+
+    null_s3 = NullS3()
+    storage.get_s3_client = lambda: null_s3
+    upload = [
+        ("document", "document.html", "text/html", corpus["article.html"]),
+        ("asset", "site.css", "text/css", corpus["docs-page.html"][:20_000]),
+        ("asset", "hero.png", "image/png", random.Random(0).randbytes(64 * 1024)),
+    ]
+    for encoding, gzip_body in (("identity", False), ("gzip", True)):
+        event = _multipart_event(upload, gzip_body)
+        cases[f"storage._stream_multipart_to_s3[{encoding}]"] = lambda e=event: (
+            storage._stream_multipart_to_s3(
+                storage.APIGatewayProxyEventV2(e), "micro-benchmark"
+            )
+        )
+    return cases
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+
+def _calibrate(fn: Callable[[], object], min_round_time: float) -> int:
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= min_round_time:
+            return loops
+        loops *= 2
+
+
+def benchmark(fn: Callable[[], object], rounds: int, min_round_time: float) -> dict:
+    fn()  # warm-up: imports, regex compilation, lazy clients
+    loops = _calibrate(fn, min_round_time)
+    per_call_us = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call_us.append((time.perf_counter() - started) / loops * 1e6)
+    return {
+        "median_us": round(statistics.median(per_call_us), 2),
+        "min_us": round(min(per_call_us), 2),
+        "mean_us": round(statistics.mean(per_call_us), 2),
+        "stddev_us": round(statistics.stdev(per_call_us), 2) if rounds > 1 else 0.0,
+        "rounds": rounds,
+        "loops": loops,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous:
+            continue
+        limit = previous["median_us"] * (1 + tolerance)
+        if current["median_us"] > limit:
+            regressions.append(
+                f"{name}: {current['median_us']}µs > {limit:.1f}µs "
+                f"(baseline {previous['median_us']}µs + {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for extraction, chunking and multipart parsing",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-k", dest="filter", help="Only cases containing this")
+    parser.add_argument("--rounds", type=int, default=7, help="Timed rounds per case")
+    parser.add_argument(
+        "--min-round-time",
+        type=float,
+        default=0.05,
+        help="Seconds each round should take at least (default: 0.05)",
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare against a results JSON file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown vs baseline (default: 0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    cases = {
+        name: fn
+        for name, fn in build_cases().items()
+        if not args.filter or args.filter in name
+    }
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": {},
+    }
+    for name, fn in cases.items():
+        print(f"Running {name}", file=sys.stderr)
+        results["cases"][name] = benchmark(fn, args.rounds, args.min_round_time)
+
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+End-to-end local pipeline: store → event bus → SQS → indexer → S3 → search.
+
+All three services are loaded into one interpreter, under distinct module names
+since each is called `app`, and wired together in-process:
+
+    storage  lambda_handler(PUT /document)    writes to moto S3, publishes
+    bus      InMemoryEventBus                 turns "Document stored" into
+                                              SQS records, like the rule +
+                                              queue in main.yaml
+    indexer  process_sqs_record(record)       downloads/updates/uploads index
+    search   lambda_handler(GET /search)      serves the uploaded index
+
+Bedrock is replaced by the deterministic fake from handlers.py.  The runner
+ingests a synthetic corpus of N documents and reports indexing throughput
+(documents per second), index size growth, and search latency percentiles.
+
+Needs the dependencies of all three services plus moto in one environment:
+
+    uv run --project index-documents-service --with python-multipart \\
+        --with 'moto[s3,ssm]' python benchmarks/pipeline.py --documents 200
+
+    python benchmarks/pipeline.py --output benchmarks/results/pipeline.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from types import ModuleType
+
+from handlers import (
+    REPO_ROOT,
+    WORKER_ENV,
+    FakeBedrock,
+    FakeLambdaContext,
+    _http_event,
+    _percentile,
+    _setup_aws,
+)
+
+MODULE_NAMES = {
+    "document-storage-service": "storage_app",
+    "index-documents-service": "index_app",
+    "search-documents-service": "search_app",
+}
+SIZE_SAMPLES = 10  # index size checkpoints across the ingest
+VOCABULARY = (
+    "lambda cold start latency throughput index vector embedding search query "
+    "sqlite chunk document bookmark storage bucket event queue batch cache "
+    "memory python import network bandwidth compression token title tag "
+    "recipe travel finance garden music history science design security"
+).split()
+TAGS = ("reading", "work", "recipes", "travel", "python", "aws", "music", "later")
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+
+def synthetic_document(rng: random.Random, number: int) -> tuple[str, str, str]:
+    """Return (url, title, html) for a deterministic pseudo-article."""
+    words = rng.sample(VOCABULARY, 4)
+    tags = rng.sample(TAGS, rng.randint(0, 3))
+    title = " ".join(w.capitalize() for w in words) + "".join(f" #{t}" for t in tags)
+    paragraphs = "\n".join(
+        "<p>"
+        + ". ".join(
+            " ".join(rng.choices(VOCABULARY, k=rng.randint(8, 16))).capitalize()
+            for _ in range(rng.randint(3, 6))
+        )
+        + ".</p>"
+        for _ in range(rng.randint(4, 30))
+    )
+    html = (
+        f"<html><head><title>{title}</title></head>"
+        f"<body><article><h1>{title}</h1>{paragraphs}</article></body></html>"
+    )
+    return f"https://example.com/corpus/{number}", title, html
+
+
+def synthetic_query(rng: random.Random) -> str:
+    query = " ".join(rng.sample(VOCABULARY, rng.randint(1, 4)))
+    if rng.random() < 0.3:
+        query += f" #{rng.choice(TAGS)}"
+    return query
+
+
+def _store_event(url: str, title: str, html: str) -> dict:
+    boundary = "pipeline-boundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="document"; filename="document.html"\r\n'
+        "Content-Type: text/html\r\n\r\n"
+        f"{html}\r\n"
+        f"--{boundary}--\r\n"
+    )
+    return _http_event(
+        "PUT",
+        "/document",
+        {"url": url, "title": title},
+        {"content-type": f"multipart/form-data; boundary={boundary}"},
+        body,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Wiring
+# ---------------------------------------------------------------------------
+
+
+class InMemoryEventBus:
+    """EventBridge stand-in routing "Document stored" events to an SQS queue."""
+
+    def __init__(self):
+        self.queue: deque[dict] = deque()
+        self.published: list[dict] = []
+
+    def put_events(self, Entries: list[dict]) -> dict:
+        for entry in Entries:
+            self.published.append(entry)
+            if entry["DetailType"] != "Document stored":
+                continue
+            envelope = {
+                "version": "0",
+                "id": f"event-{len(self.published)}",
+                "detail-type": entry["DetailType"],
+                "source": entry["Source"],
+                "detail": json.loads(entry["Detail"]),
+            }
+            self.queue.append(
+                {
+                    "messageId": f"message-{len(self.published)}",
+                    "body": json.dumps(envelope),
+                }
+            )
+        return {"FailedEntryCount": 0, "Entries": [{} for _ in Entries]}
+
+
+def load_service(service: str) -> ModuleType:
+    """Import a service's src/app.py under a unique module name."""
+    path = REPO_ROOT / service / "src" / "app.py"
+    spec = importlib.util.spec_from_file_location(MODULE_NAMES[service], path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _latency_summary(samples: list[float]) -> dict:
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(_percentile(samples, 0.95), 2),
+        "p99_ms": round(_percentile(samples, 0.99), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+
+def run_pipeline(documents: int, queries: int, seed: int, workdir: Path) -> dict:
+    from moto import mock_aws
+
+    rng = random.Random(seed)
+    bus = InMemoryEventBus()
+    bedrock = FakeBedrock()
+    context = FakeLambdaContext()
+
+    with mock_aws():
+        _setup_aws()
+        storage, indexer, search = (load_service(s) for s in MODULE_NAMES)
+        for module in (storage, indexer):
+            module.get_eventbridge_client = lambda: bus
+        for module in (indexer, search):
+            module.get_bedrock_client = lambda: bedrock
+        indexer.VECTOR_DB_LOCAL_PATH = str(workdir / "indexer.db")
+        search.VECTOR_DB_LOCAL_PATH = str(workdir / "search.db")
+
+        store_ms: list[float] = []
+        index_ms: list[float] = []
+        size_growth: list[dict] = []
+        checkpoint = max(1, documents // SIZE_SAMPLES)
+        for number in range(1, documents + 1):
+            started = time.perf_counter()
+            result = storage.lambda_handler(
+                _store_event(*synthetic_document(rng, number)), context
+            )
+            store_ms.append((time.perf_counter() - started) * 1000)
+            if result["statusCode"] != 200:
+                raise RuntimeError(f"Storing document {number} failed: {result}")
+
+            while bus.queue:
+                record = bus.queue.popleft()
+                started = time.perf_counter()
+                indexer.process_sqs_record(record)
+                index_ms.append((time.perf_counter() - started) * 1000)
+
+            if number % checkpoint == 0 or number == documents:
+                # The file just published (only its gzip copy is in S3)
+                index_bytes = os.path.getsize(indexer.VECTOR_DB_LOCAL_PATH)
+                size_growth.append({"documents": number, "bytes": index_bytes})
+
+        search_ms: list[float] = []
+        result_counts: list[int] = []
+        for _ in range(queries):
+            event = _http_event("GET", "/search", {"q": synthetic_query(rng)}, {})
+            started = time.perf_counter()
+            result = search.lambda_handler(event, context)
+            search_ms.append((time.perf_counter() - started) * 1000)
+            if result["statusCode"] != 200:
+                raise RuntimeError(f"Search failed: {result}")
+            sections = json.loads(result["body"])["sections"]
+            result_counts.append(sum(len(hits) for hits in sections.values()))
+
+    final_size = size_growth[-1]["bytes"]
+    indexing_seconds = sum(index_ms) / 1000
+    return {
+        "documents": documents,
+        "queries": queries,
+        "seed": seed,
+        "ingest": {
+            "documents_per_second": round(documents / indexing_seconds, 2),
+            "end_to_end_documents_per_second": round(
+                documents / ((sum(store_ms) + sum(index_ms)) / 1000), 2
+            ),
+            "store": _latency_summary(store_ms),
+            "index": _latency_summary(index_ms),
+        },
+        "index_size": {
+            "bytes": final_size,
+            "bytes_per_document": round(final_size / documents),
+            "growth": size_growth,
+        },
+        "search": {
+            "first_query_ms": round(search_ms[0], 2),
+            **_latency_summary(search_ms[1:] or search_ms),
+            "mean_results": round(statistics.mean(result_counts), 1),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run store → index → search locally and measure throughput",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--documents", type=int, default=100, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=200, help="Searches to run")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus/query seed")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update(WORKER_ENV)
+    with (
+        tempfile.TemporaryDirectory(prefix="jml-pipeline-") as tmp,
+        open(os.devnull, "w") as devnull,
+        # Powertools logs and EMF metrics go to stdout; keep it for the results
+        contextlib.redirect_stdout(devnull),
+    ):
+        pipeline = run_pipeline(args.documents, args.queries, args.seed, Path(tmp))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **pipeline,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Query latency of the search service's `_vector_search` (two-stage, global,
+short-vector prefiltered and tag-filtered), `_title_search` and
+`_tags_search` across synthetic index sizes.
+
+For every size (in chunks) a deterministic index is generated with
+generate_index.py, or reused from --cache-dir.  It is opened with the search
+service's own `_open_db`, and each search function runs against the same
+seeded query set.  Query vectors are stored chunk vectors plus noise, so they
+land near real documents.  Results are written as JSON, with per-function
+percentiles for every size.  The two-stage and short-vector searches also
+report their recall against the exhaustive global ranking.  With --shards,
+the index is also split by URL hash like the indexer does it, and
+`_vector_search_shards` is timed over the shard files as "vector_sharded".
+
+Usage:
+    # 1k, 10k and 100k chunks (default), print JSON
+    python benchmarks/query_latency.py
+
+    # Also time a 4-way sharded index
+    python benchmarks/query_latency.py --shards 4 --cache-dir /tmp/jml-indexes
+
+    # Up to 1M chunks, keeping the generated indexes between runs
+    python benchmarks/query_latency.py --sizes 10000,100000,1000000 \\
+        --cache-dir /tmp/jml-indexes --output benchmarks/results/query-latency.json
+
+Needs the search and index services' dependencies (sqlite-vec).
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+from generate_index import (
+    IndexSpec,
+    generate_index,
+    random_query_vector,
+    split_index,
+    vocabulary,
+    zipf_weights,
+)
+from handlers import BENCHMARK_ENV, _percentile
+from pipeline import load_service
+
+DEFAULT_SIZES = "1000,10000,100000"
+TOP_K = 5
+
+
+def _queries(spec: IndexSpec, count: int, seed: int) -> list[dict]:
+    """Query inputs drawn from the same vocabularies as the index."""
+    # Rebuild the generator's vocabularies in the order generate_index made them
+    vocab_rng = random.Random(spec.seed)
+    title_words = vocabulary(spec.title_vocabulary, vocab_rng)
+    tags = vocabulary(spec.tags, vocab_rng, prefix="t")
+    title_cum = zipf_weights(len(title_words), spec.title_skew)
+    tag_cum = zipf_weights(len(tags), spec.tag_skew)
+
+    rng = random.Random(seed)
+    return [
+        {
+            "embedding": random_query_vector(rng, spec.dimensions),
+            "text": " ".join(
+                rng.choices(title_words, cum_weights=title_cum, k=rng.randint(1, 2))
+            ),
+            "tags": sorted(
+                set(rng.choices(tags, cum_weights=tag_cum, k=rng.randint(1, 2)))
+            ),
+        }
+        for _ in range(count)
+    ]
+
+
+def _near_document_vectors(
+    conn, spec: IndexSpec, queries: list[dict], seed: int
+) -> None:
+    """Replace each query embedding with a random stored chunk vector plus noise."""
+    rng = random.Random(seed)
+    for query in queries:
+        (blob,) = conn.execute(
+            "SELECT embedding FROM vec_chunks WHERE chunk_id = ?",
+            (rng.randint(1, spec.chunks),),
+        ).fetchone()
+        stored = struct.unpack(f"{spec.dimensions}f", blob)
+        noise = random_query_vector(rng, spec.dimensions)
+        mixed = [0.5 * a + 0.5 * b for a, b in zip(stored, noise)]
+        norm = math.sqrt(sum(x * x for x in mixed))
+        query["embedding"] = [x / norm for x in mixed]
+
+
+def _time(fn, *args) -> tuple[float, int]:
+    started = time.perf_counter()
+    results = fn(*args)
+    return (time.perf_counter() - started) * 1000, len(results)
+
+
+@contextmanager
+def _settings(search, **overrides):
+    """Temporarily override the search module's tuning constants."""
+    previous = {name: getattr(search, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(search, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(search, name, value)
+
+
+def _global_vector_search(search, conn, embedding: list[float]) -> list[dict]:
+    """`_vector_search` scoring every full-length chunk vector."""
+    with _settings(
+        search, CENTROID_CANDIDATES_PER_RESULT=0, SHORT_VECTOR_CANDIDATES_PER_RESULT=0
+    ):
+        return search._vector_search(conn, embedding, TOP_K)
+
+
+def _short_vector_search(
+    search, conn, embedding: list[float], candidates: int
+) -> list[dict]:
+    """`_vector_search` over every chunk's short vector, re-ranked exactly."""
+    with _settings(
+        search,
+        CENTROID_CANDIDATES_PER_RESULT=0,
+        SHORT_VECTOR_CANDIDATES_PER_RESULT=candidates,
+    ):
+        return search._vector_search(conn, embedding, TOP_K)
+
+
+def _recall(search, conn, queries: list[dict], searcher) -> float:
+    """Mean share of the exhaustive top-k URLs that `searcher` also returns."""
+    recalls = []
+    for q in queries:
+        exact = {r["url"] for r in _global_vector_search(search, conn, q["embedding"])}
+        found = {r["url"] for r in searcher(q["embedding"])}
+        recalls.append(len(exact & found) / len(exact) if exact else 1.0)
+    return statistics.mean(recalls)
+
+
+def benchmark_size(
+    search,
+    path: Path,
+    spec: IndexSpec,
+    queries: list[dict],
+    short_candidates: int,
+    shards: int = 1,
+) -> dict:
+    search.VECTOR_DB_LOCAL_PATH = str(path)
+    search.SHORT_EMBEDDING_DIMENSIONS = spec.short_dimensions
+    conn = search._open_db()
+    _near_document_vectors(conn, spec, queries, spec.seed + 2)
+    cases = {
+        "vector": lambda q: _time(search._vector_search, conn, q["embedding"], TOP_K),
+        "vector_global": lambda q: _time(
+            _global_vector_search, search, conn, q["embedding"]
+        ),
+        "vector_short": lambda q: _time(
+            _short_vector_search, search, conn, q["embedding"], short_candidates
+        ),
+        "vector_tags": lambda q: _time(
+            search._vector_search, conn, q["embedding"], TOP_K, q["tags"]
+        ),
+        "title": lambda q: _time(search._title_search, conn, q["text"], TOP_K),
+        "tags": lambda q: _time(search._tags_search, conn, q["tags"], TOP_K),
+    }
+    shard_conns = []
+    if shards > 1:
+        search.INDEX_SHARDS = shards
+        shard_conns = [search._open_db(str(p)) for p in split_index(path, shards)]
+        cases["vector_sharded"] = lambda q: _time(
+            search._vector_search_shards, shard_conns, q["embedding"], TOP_K
+        )
+    functions = {}
+    for name, run in cases.items():
+        run(queries[0])  # warm the page cache and statement cache
+        timings, hits = zip(*(run(q) for q in queries))
+        functions[name] = {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(_percentile(list(timings), 0.95), 3),
+            "max_ms": round(max(timings), 3),
+            "mean_results": round(statistics.mean(hits), 2),
+        }
+    functions["vector"]["recall_vs_global"] = round(
+        _recall(
+            search,
+            conn,
+            queries,
+            lambda embedding: search._vector_search(conn, embedding, TOP_K),
+        ),
+        3,
+    )
+    functions["vector_short"]["recall_vs_global"] = round(
+        _recall(
+            search,
+            conn,
+            queries,
+            lambda embedding: _short_vector_search(
+                search, conn, embedding, short_candidates
+            ),
+        ),
+        3,
+    )
+    if shard_conns:
+        functions["vector_sharded"]["recall_vs_global"] = round(
+            _recall(
+                search,
+                conn,
+                queries,
+                lambda embedding: search._vector_search_shards(
+                    shard_conns, embedding, TOP_K
+                ),
+            ),
+            3,
+        )
+    for shard_conn in shard_conns:
+        shard_conn.close()
+    conn.close()
+    return {
+        "documents": spec.documents,
+        "chunks": spec.chunks,
+        "index_bytes": path.stat().st_size,
+        "functions": functions,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark search query latency across synthetic index sizes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated chunk counts (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument("--chunks-per-document", type=int, default=10)
+    parser.add_argument(
+        "--short-dimensions",
+        type=int,
+        default=256,
+        help="Dimensions of the truncated chunk vectors (default: 256)",
+    )
+    parser.add_argument(
+        "--short-candidates",
+        type=int,
+        default=20,
+        help="vector_short: chunks re-ranked per result (default: 20)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Also time vector search over this many shards (default: 1, off)",
+    )
+    parser.add_argument("--queries", type=int, default=100, help="Queries per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="Keep/reuse generated indexes here"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    search = load_service("search-documents-service")
+
+    with tempfile.TemporaryDirectory(prefix="jml-query-latency-") as tmp:
+        cache_dir = args.cache_dir or Path(tmp)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sizes = []
+        for chunks in (int(s) for s in args.sizes.split(",")):
+            spec = IndexSpec(
+                documents=max(1, chunks // args.chunks_per_document),
+                chunks_per_document=args.chunks_per_document,
+                short_dimensions=args.short_dimensions,
+                seed=args.seed,
+            )
+            path = cache_dir / spec.cache_name()
+            if not path.exists():
+                print(f"Generating {spec.chunks} chunks → {path}", file=sys.stderr)
+                generate_index(path, spec)
+            print(f"Querying {spec.chunks} chunks", file=sys.stderr)
+            queries = _queries(spec, args.queries, args.seed + 1)
+            sizes.append(
+                benchmark_size(
+                    search, path, spec, queries, args.short_candidates, args.shards
+                )
+            )
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "top_k": TOP_K,
+        "queries": args.queries,
+        "short_candidates": args.short_candidates,
+        "shards": args.shards,
+        "spec": {
+            k: v
+            for k, v in asdict(
+                IndexSpec(
+                    chunks_per_document=args.chunks_per_document,
+                    short_dimensions=args.short_dimensions,
+                    seed=args.seed,
+                )
+            ).items()
+            if k != "documents"
+        },
+        "sizes": sizes,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
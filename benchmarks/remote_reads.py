@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+What the search service's "remote" serving mode (INDEX_SERVING_MODE=remote)
+reads from S3 per query, compared with downloading the whole index first.
+
+For every size (in chunks) the synthetic index from generate_index.py is
+generated, or reused from --cache-dir, then uploaded to a moto S3 bucket.  For
+each --block-kib setting (INDEX_REMOTE_BLOCK_BYTES), the query_latency.py
+query set goes through `_vector_search`, `_title_search` and `_tags_search` on
+a connection from the service's own `_open_shard`.  Per search function it
+reports:
+
+    cold_requests/cold_mb   median ranged GETs and MB for one query on a new
+                            container (empty block cache, new connection)
+    cold_estimate_ms        cold_requests × --latency-ms plus cold_mb at
+                            --bandwidth-mb-s; moto answers in-process, so
+                            measured times leave out the network
+    warm_requests           GETs per query once the earlier queries of the
+                            set have filled the block cache
+    warm_p50_ms             measured p50 over the set (cache-bound)
+    cache_mb                block cache size after the whole set
+
+`download_estimate_ms` is the same estimate for fetching the whole file, which
+every other serving mode does before its first query.  moto reads the whole
+stored object for every ranged GET, so indexes much above 10k chunks make this
+run slowly without changing what it counts.
+
+Usage:
+    python benchmarks/remote_reads.py --sizes 10000 \\
+        --cache-dir /tmp/jml-indexes --output benchmarks/results/remote-reads.json
+
+Needs the search and index services' dependencies (sqlite-vec, apsw) and moto.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_index import IndexSpec, generate_index
+from handlers import BENCHMARK_ENV
+from pipeline import load_service
+from query_latency import TOP_K, _near_document_vectors, _queries, _settings
+
+DEFAULT_SIZES = "10000"
+DEFAULT_BLOCK_KIB = "64,256"
+DEFAULT_LATENCY_MS = 30.0  # first-byte latency of an S3 GET from Lambda
+DEFAULT_BANDWIDTH_MB_S = 90.0
+COLD_QUERIES = 3
+
+
+def _estimate_ms(requests: float, nbytes: float, latency_ms: float, bw: float) -> float:
+    return requests * latency_ms + nbytes / 1e6 / bw * 1000
+
+
+def _searches(search) -> dict:
+    return {
+        "vector": lambda conn, q: search._vector_search(conn, q["embedding"], TOP_K),
+        "title": lambda conn, q: search._title_search(conn, q["text"], TOP_K),
+        "tags": lambda conn, q: search._tags_search(conn, q["tags"], TOP_K),
+    }
+
+
+def _fresh_connection(search):
+    """A new connection and empty block cache, as on a new container."""
+    search._remote_block_cache.cache_clear()
+    return search._open_shard(0), search._remote_block_cache()
+
+
+def benchmark_block_size(search, queries: list[dict], args) -> dict:
+    functions = {}
+    for name, run in _searches(search).items():
+        cold_requests, cold_bytes = [], []
+        for query in queries[:COLD_QUERIES]:
+            conn, cache = _fresh_connection(search)
+            run(conn, query)
+            cold_requests.append(cache.requests)
+            cold_bytes.append(cache.bytes_fetched)
+            conn.close()
+
+        conn, cache = _fresh_connection(search)
+        timings, requests_after = [], []
+        for query in queries:
+            before = cache.requests
+            started = time.perf_counter()
+            run(conn, query)
+            timings.append((time.perf_counter() - started) * 1000)
+            requests_after.append(cache.requests - before)
+        conn.close()
+
+        requests = statistics.median(cold_requests)
+        nbytes = statistics.median(cold_bytes)
+        half = len(queries) // 2
+        functions[name] = {
+            "cold_requests": requests,
+            "cold_mb": round(nbytes / 1e6, 2),
+            "cold_estimate_ms": round(
+                _estimate_ms(requests, nbytes, args.latency_ms, args.bandwidth_mb_s)
+            ),
+            "warm_requests": round(statistics.mean(requests_after[half:]), 2),
+            "warm_p50_ms": round(statistics.median(timings[half:]), 3),
+            "cache_mb": round(cache.stats()["cached_bytes"] / 1e6, 1),
+        }
+    return functions
+
+
+def benchmark_size(search, path: Path, spec: IndexSpec, queries, args) -> dict:
+    import boto3  # pyright: ignore[reportMissingImports]
+
+    search.INDEX_SERVING_MODE = "file"
+    conn = search._open_db(str(path))
+    _near_document_vectors(conn, spec, queries, spec.seed + 2)
+    conn.close()
+
+    boto3.client("s3").upload_file(
+        str(path), BENCHMARK_ENV["APPLICATION_BUCKET"], search.VECTOR_DB_S3_KEY
+    )
+    search.INDEX_SERVING_MODE = "remote"
+    search._download_index()
+
+    size = path.stat().st_size
+    blocks = {}
+    for block_kib in (int(b) for b in args.block_kib.split(",")):
+        print(f"  {block_kib} KiB blocks", file=sys.stderr)
+        with _settings(search, INDEX_REMOTE_BLOCK_BYTES=block_kib * 1024):
+            blocks[str(block_kib)] = benchmark_block_size(search, queries, args)
+    return {
+        "documents": spec.documents,
+        "chunks": spec.chunks,
+        "index_bytes": size,
+        "download_estimate_ms": round(
+            _estimate_ms(1, size, args.latency_ms, args.bandwidth_mb_s)
+        ),
+        "block_kib": blocks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure S3 range reads of the remote serving mode",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated chunk counts (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--block-kib",
+        default=DEFAULT_BLOCK_KIB,
+        help=f"Comma-separated block sizes in KiB (default: {DEFAULT_BLOCK_KIB})",
+    )
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS)
+    parser.add_argument("--bandwidth-mb-s", type=float, default=DEFAULT_BANDWIDTH_MB_S)
+    parser.add_argument("--chunks-per-document", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20, help="Queries per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="Keep/reuse generated indexes here"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import boto3  # pyright: ignore[reportMissingImports]
+    from moto import mock_aws  # pyright: ignore[reportMissingImports]
+
+    with mock_aws(), tempfile.TemporaryDirectory(prefix="jml-remote-reads-") as tmp:
+        boto3.client("s3").create_bucket(Bucket=BENCHMARK_ENV["APPLICATION_BUCKET"])
+        search = load_service("search-documents-service")
+        search.get_s3_client.cache_clear()
+        cache_dir = args.cache_dir or Path(tmp)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sizes = []
+        for chunks in (int(s) for s in args.sizes.split(",")):
+            spec = IndexSpec(
+                documents=max(1, chunks // args.chunks_per_document),
+                chunks_per_document=args.chunks_per_document,
+                seed=args.seed,
+            )
+            path = cache_dir / spec.cache_name()
+            if not path.exists():
+                print(f"Generating {spec.chunks} chunks → {path}", file=sys.stderr)
+                generate_index(path, spec)
+            print(f"Querying {spec.chunks} chunks", file=sys.stderr)
+            queries = _queries(spec, args.queries, args.seed + 1)
+            sizes.append(benchmark_size(search, path, spec, queries, args))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "top_k": TOP_K,
+        "queries": args.queries,
+        "latency_ms": args.latency_ms,
+        "bandwidth_mb_s": args.bandwidth_mb_s,
+        "sizes": sizes,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Memory cost against query latency for the search service's index serving
+modes (INDEX_SERVING_MODE: file, mmap, memory).
+
+For every size (in chunks) the synthetic index from generate_index.py is
+generated, or reused from --cache-dir.  Each mode then runs in a fresh forked
+process, so one mode's page cache and heap do not count towards the next.
+That process opens the index with the search service's own `_open_db` and
+runs the query_latency.py query set through `_vector_search`, `_title_search`
+and `_tags_search`.  Per mode it reports:
+
+    open_ms        time for `_open_db` (the in-memory copy for "memory")
+    rss_delta_mb   resident set growth from before the open to after the
+                   queries; mapped file pages count for "mmap", and the
+                   private copy counts for "memory"
+    p50_ms/p95_ms  per search function, and p50 speedup relative to "file"
+
+The OS page cache is not dropped between modes.  The file is read once
+before the first mode, so every mode starts warm, like a primed Lambda.
+
+Usage:
+    python benchmarks/serving_modes.py --sizes 10000,100000 \\
+        --cache-dir /tmp/jml-indexes --output benchmarks/results/serving-modes.json
+
+Needs the search and index services' dependencies (sqlite-vec).  Linux only
+(RSS is read from /proc).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_index import IndexSpec, generate_index
+from handlers import BENCHMARK_ENV, _percentile
+from pipeline import load_service
+from query_latency import TOP_K, _near_document_vectors, _queries, _time
+
+DEFAULT_SIZES = "10000,50000"
+MODES = ("file", "mmap", "memory")
+
+
+def _rss_bytes() -> int:
+    return int(Path("/proc/self/statm").read_text().split()[1]) * os.sysconf(
+        "SC_PAGE_SIZE"
+    )
+
+
+def _run_mode(search, mode: str, path: Path, queries: list[dict], results) -> None:
+    """Forked worker: open the index in `mode`, time the queries, report back."""
+    search.INDEX_SERVING_MODE = mode
+    search.VECTOR_DB_LOCAL_PATH = str(path)
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    conn = search._open_db()
+    open_ms = (time.perf_counter() - started) * 1000
+
+    cases = {
+        "vector": lambda q: _time(search._vector_search, conn, q["embedding"], TOP_K),
+        "title": lambda q: _time(search._title_search, conn, q["text"], TOP_K),
+        "tags": lambda q: _time(search._tags_search, conn, q["tags"], TOP_K),
+    }
+    functions = {}
+    for name, run in cases.items():
+        run(queries[0])
+        timings = [run(q)[0] for q in queries]
+        functions[name] = {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(_percentile(timings, 0.95), 3),
+        }
+    results.put(
+        {
+            "open_ms": round(open_ms, 1),
+            "rss_delta_mb": round((_rss_bytes() - rss_before) / 1e6, 1),
+            "functions": functions,
+        }
+    )
+    conn.close()
+
+
+def benchmark_size(search, path: Path, spec: IndexSpec, queries: list[dict]) -> dict:
+    search.VECTOR_DB_LOCAL_PATH = str(path)
+    search.INDEX_SERVING_MODE = "file"
+    conn = search._open_db()
+    _near_document_vectors(conn, spec, queries, spec.seed + 2)
+    conn.close()
+    with open(path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+
+    context = multiprocessing.get_context("fork")
+    modes = {}
+    for mode in MODES:
+        print(f"  {mode}", file=sys.stderr)
+        results = context.Queue()
+        worker = context.Process(
+            target=_run_mode, args=(search, mode, path, queries, results)
+        )
+        worker.start()
+        modes[mode] = results.get()
+        worker.join()
+
+    for mode in MODES:
+        for name, timing in modes[mode]["functions"].items():
+            baseline = modes["file"]["functions"][name]["p50_ms"]
+            timing["speedup_vs_file"] = round(baseline / timing["p50_ms"], 2)
+    return {
+        "documents": spec.documents,
+        "chunks": spec.chunks,
+        "index_bytes": path.stat().st_size,
+        "modes": modes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare memory and latency of the index serving modes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated chunk counts (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument("--chunks-per-document", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50, help="Queries per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", type=Path, help="Keep/reuse generated indexes here"
+    )
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    os.environ.update({k: v for k, v in BENCHMARK_ENV.items() if k not in os.environ})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    search = load_service("search-documents-service")
+
+    with tempfile.TemporaryDirectory(prefix="jml-serving-modes-") as tmp:
+        cache_dir = args.cache_dir or Path(tmp)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sizes = []
+        for chunks in (int(s) for s in args.sizes.split(",")):
+            spec = IndexSpec(
+                documents=max(1, chunks // args.chunks_per_document),
+                chunks_per_document=args.chunks_per_document,
+                seed=args.seed,
+            )
+            path = cache_dir / spec.cache_name()
+            if not path.exists():
+                print(f"Generating {spec.chunks} chunks → {path}", file=sys.stderr)
+                generate_index(path, spec)
+            print(f"Querying {spec.chunks} chunks", file=sys.stderr)
+            queries = _queries(spec, args.queries, args.seed + 1)
+            sizes.append(benchmark_size(search, path, spec, queries))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "top_k": TOP_K,
+        "queries": args.queries,
+        "mmap_size": search.INDEX_MMAP_SIZE,
+        "cache_size_kib": search.INDEX_CACHE_SIZE_KIB,
+        "sizes": sizes,
+    }
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()
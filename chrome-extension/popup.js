@@ -85,10 +85,20 @@ async function getPageContent(tab) {
   return { blob: new Blob([html], { type: 'text/html' }), filename: 'document.html' };
 }
 
+// Serialise the multipart body (keeping the browser-generated boundary) and
+// gzip it; the storage service inflates Content-Encoding: gzip bodies.
+async function gzipFormData(formData) {
+  const multipart = new Response(formData);
+  const contentType = multipart.headers.get('Content-Type');
+  const compressed = multipart.body.pipeThrough(new CompressionStream('gzip'));
+  return { body: await new Response(compressed).blob(), contentType };
+}
+
 async function savePage(tab, apiUrl, token) {
   const { blob, filename } = await getPageContent(tab);
   const formData = new FormData();
   formData.append('document', blob, filename);
+  const { body, contentType } = await gzipFormData(formData);
 
   const title = titleEl.value.trim();
   const params = new URLSearchParams({ url: tab.url });
@@ -96,8 +106,12 @@ async function savePage(tab, apiUrl, token) {
 
   const response = await fetch(`${apiUrl}/document?${params}`, {
     method: 'PUT',
-    headers: { 'Authorization': `Bearer ${token}` },
-    body: formData,
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Content-Type': contentType,
+      'Content-Encoding': 'gzip',
+    },
+    body,
   });
 
   if (!response.ok) {
@@ -112,11 +126,12 @@ async function savePage(tab, apiUrl, token) {
 
 const searchInput = document.getElementById('search-input');
 const searchBtn = document.getElementById('search-btn');
+const relatedBtn = document.getElementById('related-btn');
 const searchStatus = document.getElementById('search-status');
 const resultsEl = document.getElementById('results');
 const statsStripe = document.getElementById('stats-stripe');
 
-const SECTION_LABELS = { vector: 'Semantic', title: 'Title Match', tags: 'Tags' };
+const SECTION_LABELS = { vector: 'Semantic', title: 'Title Match', tags: 'Tags', similar: 'Related' };
 const STATS_KEY = 'jml-search-stats';
 
 function getStats() {
@@ -238,9 +253,13 @@ async function doSearch(apiUrl, token) {
   setSearchStatus('Searching…');
 
   try {
+    const started = performance.now();
     const response = await fetch(`${apiUrl}/search?q=${encodeURIComponent(query)}&top=8`, {
       headers: { 'Authorization': `Bearer ${token}` },
     });
+    // Server-side breakdown vs. what the popup actually waited for
+    console.log('[JML] Search took', Math.round(performance.now() - started), 'ms; Server-Timing:',
+      response.headers.get('Server-Timing'));
 
     if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
@@ -253,6 +272,31 @@ async function doSearch(apiUrl, token) {
   }
 }
 
+// Related saves come from the page's stored vectors, no embedding call
+async function doRelated(apiUrl, token, pageUrl) {
+  relatedBtn.disabled = true;
+  resultsEl.innerHTML = '';
+  setSearchStatus('Finding related saves…');
+
+  try {
+    const response = await fetch(`${apiUrl}/similar?url=${encodeURIComponent(pageUrl)}&top=8`, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    if (response.status === 404) {
+      setSearchStatus('Save this page first to see related saves.');
+      return;
+    }
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+    const { results } = await response.json();
+    renderResults({ similar: results });
+  } catch (err) {
+    setSearchStatus(`Error: ${err.message}`, 'error');
+  } finally {
+    relatedBtn.disabled = false;
+  }
+}
+
 // ---------------------------------------------------------------------------
 // Init
 // ---------------------------------------------------------------------------
@@ -293,6 +337,7 @@ async function init() {
     e.preventDefault();
     doSearch(apiUrl, bearerToken);
   });
+  relatedBtn.addEventListener('click', () => doRelated(apiUrl, bearerToken, tab.url));
 }
 
 init();
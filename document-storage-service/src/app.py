@@ -5,13 +5,15 @@ import json
 import os
 import re
 import secrets
+import time
+import zlib
 from contextlib import contextmanager
 from dataclasses import dataclass, field
-from functools import cache
-from typing import Any, Dict, List, Optional, cast
+from functools import cache, wraps
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, cast
 
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
-import boto3
 from python_multipart import MultipartParser
 from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.event_handler import (
@@ -31,10 +33,57 @@ tracer = Tracer()
 metrics = Metrics(namespace="just-my-links")
 app = APIGatewayHttpResolver()
 
-# Initialize AWS clients
-ssm_client = boto3.client("ssm")
-s3_client = boto3.client("s3")
-eventbridge_client = boto3.client("events")
+
+# AWS clients (and boto3 itself) are created on first use so cold starts don't
+# pay for them up front and unauthorized requests never build them at all
+@cache
+def get_ssm_client() -> Any:
+    import boto3
+
+    return boto3.client("ssm")
+
+
+@cache
+def get_s3_client() -> Any:
+    import boto3
+
+    return boto3.client("s3")
+
+
+@cache
+def get_eventbridge_client() -> Any:
+    import boto3
+
+    return boto3.client("events")
+
+
+ALLOWED_ENTRYPOINTS = ("document.html", "document.txt", "document.pdf")
+ENTRYPOINT_CONTENT_TYPES = {
+    "document.html": "text/html",
+    "document.txt": "text/plain",
+    "document.pdf": "application/pdf",
+}
+# Text entrypoints are gzipped at rest; PDFs are already compressed internally
+COMPRESSED_ENTRYPOINTS = ("document.html", "document.txt")
+COMPRESSED_ENTRYPOINT_ENCODING = "gzip"
+
+# Non-document parts are stored once, content-addressed, and shared across
+# documents; each document folder gets an .assets.json manifest pointing at them
+ASSETS_FOLDER = "document-assets"
+ASSETS_MANIFEST_FILENAME = ".assets.json"
+
+MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
+# Compressed request bodies are inflated incrementally; stop once the inflated
+# body outgrows what we'd ever accept so a gzip bomb can't pin the Lambda.  The
+# cap is on the whole body, all parts together, not per file
+MAX_DECOMPRESSED_BODY_SIZE = MAX_FILE_SIZE
+DECOMPRESS_CHUNK_SIZE = 256 * 1024
+
+# Direct-to-S3 uploads land in a staging area until the client finalizes them
+UPLOAD_STAGING_FOLDER = "document-uploads"
+MAX_DIRECT_UPLOAD_SIZE = 500 * 1024 * 1024  # 500MB
+DIRECT_UPLOAD_PART_SIZE = 16 * 1024 * 1024  # S3 minimum is 5MB
+PRESIGNED_URL_EXPIRY_SECONDS = 15 * 60
 
 
 def _to_s3_key(document_url: str) -> str:
@@ -74,8 +123,7 @@ def store_document():
                 body={"error": e.message},
             )
 
-        allowed_entrypoints = ("document.html", "document.txt", "document.pdf")
-        entrypoint = next((x for x in uploaded_files if x in allowed_entrypoints), None)
+        entrypoint = next((x for x in uploaded_files if x in ALLOWED_ENTRYPOINTS), None)
         if not entrypoint:
             return Response(
                 status_code=400,
@@ -84,49 +132,240 @@ def store_document():
                     "error": "No document.html, document.txt, or document.pdf file was successfully uploaded"
                 },
             )
-        metadata = {
-            "documentUrl": document_url,
-            "entrypoint": entrypoint,
-            "files": uploaded_files,
-            "timestamp": json.dumps(
-                {"$date": {"$numberLong": str(int(__import__("time").time() * 1000))}}
+        _publish_stored_document(
+            application_bucket,
+            document_folder,
+            document_url,
+            document_title,
+            entrypoint,
+            uploaded_files,
+            entrypoint_encoding=(
+                COMPRESSED_ENTRYPOINT_ENCODING
+                if entrypoint in COMPRESSED_ENTRYPOINTS
+                else None
             ),
-        }
-        if document_title:
-            metadata["title"] = document_title
+        )
 
-        s3_client.put_object(
-            Bucket=application_bucket,
-            Key=f"{document_folder}/.metadata.json",
-            Body=json.dumps(metadata, indent=2),
-            ContentType="application/json",
+    return Response(
+        status_code=200,
+        content_type=content_types.APPLICATION_JSON,
+        body={"message": "Document stored successfully", "files": uploaded_files},
+    )
+
+
+def _publish_stored_document(
+    application_bucket: str,
+    document_folder: str,
+    document_url: str,
+    document_title: str | None,
+    entrypoint: str,
+    uploaded_files: List[str],
+    entrypoint_encoding: str | None = None,
+) -> None:
+    """Write .metadata.json for a stored document and announce it on EventBridge"""
+    metadata = {
+        "documentUrl": document_url,
+        "entrypoint": entrypoint,
+        "files": uploaded_files,
+        "timestamp": json.dumps(
+            {"$date": {"$numberLong": str(int(time.time() * 1000))}}
+        ),
+    }
+    if document_title:
+        metadata["title"] = document_title
+    if entrypoint_encoding:
+        metadata["entrypointEncoding"] = entrypoint_encoding
+
+    get_s3_client().put_object(
+        Bucket=application_bucket,
+        Key=f"{document_folder}/.metadata.json",
+        Body=json.dumps(metadata, indent=2),
+        ContentType="application/json",
+    )
+    logger.info(
+        "Stored document",
+        extra={"s3_path": document_folder, "document_url": document_url},
+    )
+
+    event_bus_name = get_event_bus_name()
+    event_detail = {"folderPath": document_folder, "documentUrl": document_url}
+
+    get_eventbridge_client().put_events(
+        Entries=[
+            {
+                "Source": "just-my-links.document-storage",
+                "DetailType": "Document stored",
+                "Detail": json.dumps(event_detail),
+                "EventBusName": event_bus_name,
+            }
+        ]
+    )
+    logger.debug("Published event to EventBridge", extra={"event_detail": event_detail})
+
+
+def _error_response(status_code: int, message: str) -> Response:
+    return Response(
+        status_code=status_code,
+        content_type=content_types.APPLICATION_JSON,
+        body={"error": message},
+    )
+
+
+def _staging_key(document_url: str, filename: str) -> str:
+    return f"{UPLOAD_STAGING_FOLDER}/{_to_s3_key(document_url)}/{filename}"
+
+
+@app.post("/document/uploads")
+@tracer.capture_method
+def create_document_upload():
+    """Issue pre-signed S3 URLs so a client can upload a document directly.
+
+    Small files get a single PUT URL; anything larger than one part gets an S3
+    multipart upload with a pre-signed URL per part. The client then calls
+    POST /document/uploads/complete to publish the document.
+    """
+    query_params = app.current_event.query_string_parameters or {}
+    document_url = query_params.get("url")
+    filename = query_params.get("filename")
+
+    if not document_url:
+        return _error_response(400, "Missing required 'url' query parameter")
+    if filename not in ENTRYPOINT_CONTENT_TYPES:
+        return _error_response(
+            400, f"'filename' must be one of {', '.join(ENTRYPOINT_CONTENT_TYPES)}"
         )
-        logger.info(
-            "Stored document",
-            extra={"s3_path": document_folder, "document_url": document_url},
+    try:
+        size = int(query_params.get("size", ""))
+    except ValueError:
+        return _error_response(400, "Missing or invalid 'size' query parameter")
+    if size <= 0:
+        return _error_response(400, "Missing or invalid 'size' query parameter")
+    if size > MAX_DIRECT_UPLOAD_SIZE:
+        return _error_response(
+            413,
+            "Document file is too large. Maximum allowed size is "
+            f"{MAX_DIRECT_UPLOAD_SIZE // (1024 * 1024)}MB.",
         )
 
-        event_bus_name = get_event_bus_name()
-        event_detail = {"folderPath": document_folder, "documentUrl": document_url}
+    application_bucket, _ = get_documents_folder()
+    key = _staging_key(document_url, filename)
+    content_type = ENTRYPOINT_CONTENT_TYPES[filename]
+    body: Dict[str, Any] = {"filename": filename, "contentType": content_type}
+
+    if size <= DIRECT_UPLOAD_PART_SIZE:
+        body["uploadUrl"] = get_s3_client().generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": application_bucket,
+                "Key": key,
+                "ContentType": content_type,
+            },
+            ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS,
+        )
+    else:
+        upload_id = get_s3_client().create_multipart_upload(
+            Bucket=application_bucket, Key=key, ContentType=content_type
+        )["UploadId"]
+        part_count = -(-size // DIRECT_UPLOAD_PART_SIZE)
+        body["uploadId"] = upload_id
+        body["partSize"] = DIRECT_UPLOAD_PART_SIZE
+        body["partUrls"] = [
+            get_s3_client().generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": application_bucket,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS,
+            )
+            for part_number in range(1, part_count + 1)
+        ]
 
-        eventbridge_client.put_events(
-            Entries=[
-                {
-                    "Source": "just-my-links.document-storage",
-                    "DetailType": "Document stored",
-                    "Detail": json.dumps(event_detail),
-                    "EventBusName": event_bus_name,
-                }
-            ]
+    logger.info(
+        "Issued direct upload URLs",
+        extra={"document_url": document_url, "staging_key": key, "size": size},
+    )
+    return Response(
+        status_code=200, content_type=content_types.APPLICATION_JSON, body=body
+    )
+
+
+@app.post("/document/uploads/complete")
+@tracer.capture_method
+def complete_document_upload():
+    """Move a directly-uploaded document into place and publish it.
+
+    Expects a JSON body of {"filename": ..., "uploadId": ..., "parts": [...]},
+    where uploadId/parts (ETag + PartNumber per part) are only needed for
+    multipart uploads.
+    """
+    query_params = app.current_event.query_string_parameters or {}
+    document_url = query_params.get("url")
+    document_title = query_params.get("title") or None
+
+    if not document_url:
+        return _error_response(400, "Missing required 'url' query parameter")
+    try:
+        request = app.current_event.json_body or {}
+    except ValueError:
+        return _error_response(400, "Request body must be JSON")
+    filename = request.get("filename")
+    if filename not in ENTRYPOINT_CONTENT_TYPES:
+        return _error_response(
+            400, f"'filename' must be one of {', '.join(ENTRYPOINT_CONTENT_TYPES)}"
         )
-        logger.debug(
-            "Published event to EventBridge", extra={"event_detail": event_detail}
+
+    application_bucket, documents_folder = get_documents_folder()
+    staging_key = _staging_key(document_url, filename)
+
+    try:
+        if upload_id := request.get("uploadId"):
+            get_s3_client().complete_multipart_upload(
+                Bucket=application_bucket,
+                Key=staging_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": request.get("parts", [])},
+            )
+        staged = get_s3_client().head_object(Bucket=application_bucket, Key=staging_key)
+    except get_s3_client().exceptions.ClientError as e:
+        logger.warning(
+            "Direct upload could not be completed",
+            extra={"staging_key": staging_key, "error": str(e)},
+        )
+        return _error_response(400, f"No completed upload found for {filename}")
+
+    if staged["ContentLength"] > MAX_DIRECT_UPLOAD_SIZE:
+        get_s3_client().delete_object(Bucket=application_bucket, Key=staging_key)
+        return _error_response(
+            413,
+            "Document file is too large. Maximum allowed size is "
+            f"{MAX_DIRECT_UPLOAD_SIZE // (1024 * 1024)}MB.",
+        )
+
+    document_folder = f"{documents_folder}/{_to_s3_key(document_url)}"
+    with backup_in_case_of_error(application_bucket, document_folder):
+        # Server-side copy: the document bytes never pass through this Lambda
+        get_s3_client().copy_object(
+            Bucket=application_bucket,
+            CopySource={"Bucket": application_bucket, "Key": staging_key},
+            Key=f"{document_folder}/{filename}",
+        )
+        get_s3_client().delete_object(Bucket=application_bucket, Key=staging_key)
+        _publish_stored_document(
+            application_bucket,
+            document_folder,
+            document_url,
+            document_title,
+            filename,
+            [filename],
         )
 
     return Response(
         status_code=200,
         content_type=content_types.APPLICATION_JSON,
-        body={"message": "Document stored successfully", "files": uploaded_files},
+        body={"message": "Document stored successfully", "files": [filename]},
     )
 
 
@@ -148,7 +387,9 @@ class StreamingS3Upload:
     key: str
     content_type: str
     max_size: int = 2 * 1024 * 1024
+    content_encoding: Optional[str] = None
     current_size: int = field(default=0, init=False)
+    stored_size: int = field(default=0, init=False)
     size_exceeded: bool = field(default=False, init=False)
     completed: bool = field(default=False, init=False)
     aborted: bool = field(default=False, init=False)
@@ -165,6 +406,28 @@ class StreamingS3Upload:
     # For small files, we'll use regular put_object
     use_multipart: bool = field(default=False, init=False)
 
+    # Streaming gzip compressor, only set when content_encoding is "gzip"
+    compressor: Any = field(default=None, init=False)
+
+    def __post_init__(self) -> None:
+        if self.content_encoding == "gzip":
+            # wbits=16+MAX_WBITS makes zlib emit a gzip header and trailer
+            self.compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        elif self.content_encoding is not None:
+            raise ValueError(f"Unsupported content encoding: {self.content_encoding}")
+
+    def _object_params(self) -> Dict[str, str]:
+        """ContentType/ContentEncoding arguments shared by put and multipart create"""
+        params = {"ContentType": self.content_type}
+        if self.content_encoding:
+            params["ContentEncoding"] = self.content_encoding
+        return params
+
+    def _buffer(self, data: bytes) -> None:
+        """Append (possibly compressed) bytes to the current part buffer"""
+        self.stored_size += len(data)
+        self.current_part_buffer.write(data)
+
     def get_filename(self) -> str:
         """Get the filename from the S3 key"""
         return self.key.split("/")[-1]
@@ -173,7 +436,7 @@ class StreamingS3Upload:
         """Initialize multipart upload"""
         if self.upload_id is None:
             response = self.s3_client.create_multipart_upload(
-                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+                Bucket=self.bucket, Key=self.key, **self._object_params()
             )
             self.upload_id = response["UploadId"]
             self.use_multipart = True
@@ -215,7 +478,7 @@ class StreamingS3Upload:
             return
 
         self.current_size += len(data)
-        self.current_part_buffer.write(data)
+        self._buffer(self.compressor.compress(data) if self.compressor else data)
 
         # Upload part if buffer is large enough
         self._upload_part_if_ready()
@@ -242,6 +505,9 @@ class StreamingS3Upload:
             return True
 
         try:
+            if self.compressor:
+                self._buffer(self.compressor.flush())
+
             if self.use_multipart:
                 self._upload_part_if_ready(force=True)
 
@@ -257,7 +523,7 @@ class StreamingS3Upload:
                     Bucket=self.bucket,
                     Key=self.key,
                     Body=self.current_part_buffer.getvalue(),
-                    ContentType=self.content_type,
+                    **self._object_params(),
                 )
 
             self.completed = True
@@ -269,10 +535,103 @@ class StreamingS3Upload:
             return False
 
     def get_size(self) -> int:
-        """Get the current size of uploaded data"""
+        """Get the current size of uploaded data (before any compression)"""
         return self.current_size
 
 
+@dataclass
+class ContentAddressedAssetUpload:
+    """Buffers a supporting asset (image, CSS, ...) and stores it once by hash.
+
+    Assets live under ASSETS_FOLDER keyed by their SHA-256 so that pages sharing
+    logos and stylesheets reference a single copy. The upload is skipped when
+    an object with that hash already exists.
+    """
+
+    s3_client: Any
+    bucket: str
+    filename: str
+    content_type: str
+    max_size: int = 2 * 1024 * 1024
+    current_size: int = field(default=0, init=False)
+    stored_size: int = field(default=0, init=False)
+    size_exceeded: bool = field(default=False, init=False)
+    completed: bool = field(default=False, init=False)
+    deduplicated: bool = field(default=False, init=False)
+    digest: Any = field(default_factory=hashlib.sha256, init=False)
+    buffer: io.BytesIO = field(default_factory=io.BytesIO, init=False)
+
+    @property
+    def key(self) -> str:
+        return f"{ASSETS_FOLDER}/{self.digest.hexdigest()}"
+
+    def get_filename(self) -> str:
+        """Get the filename the document refers to this asset by"""
+        return self.filename
+
+    def write(self, data: bytes) -> None:
+        """Buffer and hash data, checking size limits"""
+        if self.size_exceeded:
+            return
+
+        if self.current_size + len(data) > self.max_size:
+            self.size_exceeded = True
+            self.buffer = io.BytesIO()
+            return
+
+        self.current_size += len(data)
+        self.digest.update(data)
+        self.buffer.write(data)
+
+    def _exists(self) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+            return True
+        except self.s3_client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _abort_upload(self) -> None:
+        """Nothing reaches S3 before complete(), so just drop the buffer"""
+        self.buffer = io.BytesIO()
+
+    def complete(self) -> bool:
+        """Store the asset unless it is already present. Returns True on success"""
+        if self.size_exceeded:
+            return False
+
+        try:
+            if self._exists():
+                self.deduplicated = True
+            else:
+                self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=self.buffer.getvalue(),
+                    ContentType=self.content_type,
+                )
+                self.stored_size = self.current_size
+            self.completed = True
+            return True
+
+        except Exception as e:
+            logger.error("Failed to store asset", extra={"error": str(e)})
+            return False
+
+    def get_size(self) -> int:
+        """Get the size of the asset"""
+        return self.current_size
+
+    def manifest_entry(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "sha256": self.digest.hexdigest(),
+            "size": self.current_size,
+            "contentType": self.content_type,
+        }
+
+
 def _ensure_document_headers_are_valid(
     current_part_name: str | None, content_type: str
 ):
@@ -309,6 +668,50 @@ def _get_content_disposition_field(
     return match.group(1) or match.group(2)
 
 
+def _iter_request_body(request_body: bytes, content_encoding: str) -> Iterator[bytes]:
+    """Yield the request body in chunks, inflating it if it was sent gzipped
+
+    A gzipped body is capped as a whole at MAX_DECOMPRESSED_BODY_SIZE, so it is
+    stricter than the per-file MAX_FILE_SIZE an uncompressed body gets: all of
+    its parts together must inflate to no more than that.
+    """
+    if content_encoding in ("", "identity"):
+        yield request_body
+        return
+
+    if content_encoding not in ("gzip", "x-gzip"):
+        raise MultipartParsingError(
+            f"Unsupported Content-Encoding: {content_encoding}", status_code=415
+        )
+
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    decompressed_size = 0
+
+    def checked(chunk: bytes) -> bytes:
+        nonlocal decompressed_size
+        decompressed_size += len(chunk)
+        if decompressed_size > MAX_DECOMPRESSED_BODY_SIZE:
+            raise MultipartParsingError(
+                "Decompressed request body is too large. A gzipped request may "
+                f"inflate to at most {MAX_DECOMPRESSED_BODY_SIZE // (1024 * 1024)}MB "
+                "across all of its parts.",
+                status_code=413,
+            )
+        return chunk
+
+    pending = request_body
+    try:
+        while pending:
+            yield checked(decompressor.decompress(pending, DECOMPRESS_CHUNK_SIZE))
+            pending = decompressor.unconsumed_tail
+        yield checked(decompressor.flush())
+    except zlib.error as e:
+        raise MultipartParsingError(f"Invalid gzip request body: {e}")
+
+    if not decompressor.eof:
+        raise MultipartParsingError("Invalid gzip request body: truncated stream")
+
+
 def _stream_multipart_to_s3(
     event: APIGatewayProxyEventV2, s3_folder_name: str
 ) -> Dict[str, int]:
@@ -316,9 +719,10 @@ def _stream_multipart_to_s3(
     application_bucket, documents_folder = get_documents_folder()
     document_folder = f"{documents_folder}/{s3_folder_name}"
 
-    MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
     request_body = event.body
-    content_type_header = getattr(event, "headers", {}).get("content-type", "")
+    headers = getattr(event, "headers", None) or {}
+    content_type_header = headers.get("content-type", "")
+    content_encoding = headers.get("content-encoding", "").strip().lower()
     content_type, options = parse_options_header(content_type_header)
 
     if not request_body or not content_type.decode("latin-1").startswith(
@@ -344,12 +748,14 @@ def _stream_multipart_to_s3(
 
     # Parse multipart data using callback-based approach with streaming to S3
     uploaded_files = {}
+    assets: Dict[str, Dict[str, Any]] = {}
     current_part_name: str | None = None
-    current_upload: StreamingS3Upload | None = None
+    current_upload: StreamingS3Upload | ContentAddressedAssetUpload | None = None
     current_headers: dict[str, str] = {}
     header_name_buffer: list[bytes] = []
     header_value_buffer: list[bytes] = []
     document_part_too_large: bool = False
+    deduplicated_asset_count = 0
 
     def on_part_begin():
         nonlocal current_part_name, current_upload, current_headers
@@ -362,20 +768,26 @@ def _stream_multipart_to_s3(
             current_upload.write(data[start:end])
 
     def on_part_end():
-        nonlocal document_part_too_large
+        nonlocal document_part_too_large, deduplicated_asset_count
         if not current_upload:
             return
         success = current_upload.complete()
         if success:
             # Store the actual filename used in S3, not the form field name
             actual_filename = current_upload.get_filename()
-            uploaded_files[actual_filename] = current_upload.get_size()
+            # Assets are listed in the manifest, not among the folder's files
+            if isinstance(current_upload, ContentAddressedAssetUpload):
+                assets[actual_filename] = current_upload.manifest_entry()
+                deduplicated_asset_count += current_upload.deduplicated
+            else:
+                uploaded_files[actual_filename] = current_upload.get_size()
             logger.debug(
                 "Successfully uploaded file",
                 extra={
                     "form_field_name": current_part_name,
                     "actual_filename": actual_filename,
                     "size": current_upload.get_size(),
+                    "stored_size": current_upload.stored_size,
                 },
             )
         else:
@@ -417,12 +829,27 @@ def _stream_multipart_to_s3(
             or f"{current_part_name}.txt"
         )
 
+        if current_part_name != "document" and filename not in ALLOWED_ENTRYPOINTS:
+            current_upload = ContentAddressedAssetUpload(
+                s3_client=get_s3_client(),
+                bucket=application_bucket,
+                filename=filename,
+                content_type=content_type,
+                max_size=MAX_FILE_SIZE,
+            )
+            return
+
         current_upload = StreamingS3Upload(
-            s3_client=s3_client,
+            s3_client=get_s3_client(),
             bucket=application_bucket,
             key=f"{document_folder}/{filename}",
             content_type=content_type,
             max_size=MAX_FILE_SIZE,
+            content_encoding=(
+                COMPRESSED_ENTRYPOINT_ENCODING
+                if filename in COMPRESSED_ENTRYPOINTS
+                else None
+            ),
         )
 
     # Set up callbacks
@@ -440,7 +867,14 @@ def _stream_multipart_to_s3(
     parser = MultipartParser(
         boundary, cast(Any, callbacks)
     )  # Note the cast is the easiest way to bypass a complex typing mechanic. You can't just import the underlying type as it is created inside an if TYPE_CHECKING block
-    parser.write(request_body)
+    try:
+        for chunk in _iter_request_body(request_body, content_encoding):
+            parser.write(chunk)
+    except MultipartParsingError:
+        # Don't leave a half-written part behind as an orphaned multipart upload
+        if current_upload and not current_upload.completed:
+            current_upload._abort_upload()
+        raise
     parser.finalize()
 
     # Check if document part was found and handle size errors
@@ -449,17 +883,27 @@ def _stream_multipart_to_s3(
             f"Document file is too large. Maximum allowed size is {MAX_FILE_SIZE // (1024 * 1024)}MB."
         )
 
-    if not any(
-        f in ("document.html", "document.txt", "document.pdf") for f in uploaded_files
-    ):
+    if not any(f in ALLOWED_ENTRYPOINTS for f in uploaded_files):
         raise MultipartParsingError("Missing required 'document' part")
 
+    if assets:
+        manifest = json.dumps(assets, indent=2)
+        get_s3_client().put_object(
+            Bucket=application_bucket,
+            Key=f"{document_folder}/{ASSETS_MANIFEST_FILENAME}",
+            Body=manifest,
+            ContentType="application/json",
+        )
+        uploaded_files[ASSETS_MANIFEST_FILENAME] = len(manifest)
+
     logger.debug(
         "Multipart parts streamed to S3",
         extra={
             "s3_path": document_folder,
             "file_count": len(uploaded_files),
             "file_names": list(uploaded_files.keys()),
+            "asset_count": len(assets),
+            "deduplicated_asset_count": deduplicated_asset_count,
         },
     )
 
@@ -479,7 +923,7 @@ def get_bearer_token() -> str:
         raise ValueError("BEARER_TOKEN_PARAM_NAME environment variable not set")
 
     try:
-        response = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
+        response = get_ssm_client().get_parameter(Name=param_name, WithDecryption=True)
         logger.debug("Bearer token retrieved from SSM Parameter Store")
         return response["Parameter"]["Value"]
     except Exception as e:
@@ -509,7 +953,7 @@ def get_event_bus_name() -> str:
 
 def _get_s3_folder_contents(bucket: str, folder: str):
     # Note that this will fetch only the first 1000 items. That's more than enough for our purposes
-    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=f"{folder}/")
+    response = get_s3_client().list_objects_v2(Bucket=bucket, Prefix=f"{folder}/")
     for c in response.get("Contents", []):
         yield c["Key"]
 
@@ -533,7 +977,7 @@ def backup_in_case_of_error(bucket: str, document_folder: str):
 
             # Create backup by copying all objects
             for old_key in content_keys:
-                s3_client.copy_object(
+                get_s3_client().copy_object(
                     Bucket=bucket,
                     CopySource={"Bucket": bucket, "Key": old_key},
                     Key=old_key.replace(f"{document_folder}/", f"{backup_folder}/", 1),
@@ -549,7 +993,7 @@ def backup_in_case_of_error(bucket: str, document_folder: str):
             logger.debug(
                 "Deleting existing document folder", extra={"folder": document_folder}
             )
-            s3_client.delete_objects(
+            get_s3_client().delete_objects(
                 Bucket=bucket,
                 Delete={"Objects": [{"Key": key} for key in content_keys]},
             )
@@ -568,7 +1012,7 @@ def backup_in_case_of_error(bucket: str, document_folder: str):
                     _get_s3_folder_contents(bucket, document_folder)
                 )
                 if any(current_content_keys):
-                    s3_client.delete_objects(
+                    get_s3_client().delete_objects(
                         Bucket=bucket,
                         Delete={
                             "Objects": [{"Key": key} for key in current_content_keys]
@@ -580,7 +1024,7 @@ def backup_in_case_of_error(bucket: str, document_folder: str):
                         f"{backup_folder}/", f"{document_folder}/", 1
                     )
 
-                    s3_client.copy_object(
+                    get_s3_client().copy_object(
                         Bucket=bucket,
                         CopySource={"Bucket": bucket, "Key": old_key},
                         Key=new_key,
@@ -600,7 +1044,7 @@ def backup_in_case_of_error(bucket: str, document_folder: str):
                 logger.debug(
                     "Cleaning up backup folder", extra={"backup_folder": backup_folder}
                 )
-                s3_client.delete_objects(
+                get_s3_client().delete_objects(
                     Bucket=bucket,
                     Delete={
                         "Objects": [
@@ -625,24 +1069,26 @@ def _unauthorized_request() -> Response:
     )
 
 
+def _has_valid_bearer_token(auth_header: str) -> bool:
+    """Check an Authorization header value against the expected bearer token"""
+    if not auth_header.startswith("Bearer "):
+        return False
+
+    provided_token = auth_header[7:]  # Remove "Bearer " prefix
+    expected_token = get_bearer_token()
+
+    return secrets.compare_digest(provided_token, expected_token)
+
+
 def authentication_middleware(
     app: APIGatewayHttpResolver, next_middleware: NextMiddleware
 ) -> Response:
     """Middleware to authenticate requests using bearer token"""
 
     headers = getattr(app.current_event, "headers", None) or {}
-    auth_header = headers.get("Authorization", "")
 
-    if not auth_header.startswith("Bearer "):
-        return _unauthorized_request()
-
-    provided_token = auth_header[7:]  # Remove "Bearer " prefix
-    expected_token = get_bearer_token()
-
-    is_valid = secrets.compare_digest(provided_token, expected_token)
-
-    if not is_valid:
-        logger.debug("Invalid bearer token provided")
+    if not _has_valid_bearer_token(headers.get("Authorization", "")):
+        logger.debug("Missing or invalid bearer token provided")
         return _unauthorized_request()
 
     # Authentication successful, proceed to next middleware/route
@@ -654,9 +1100,120 @@ def authentication_middleware(
 app.use(middlewares=[authentication_middleware])
 
 
+# ---------------------------------------------------------------------------
+# On-demand profiling
+# ---------------------------------------------------------------------------
+
+# "always" profiles every invocation; "query" only authenticated requests sent
+# with `?profile=1`, so one problem upload can be replayed with it added next
+# to `url=`. Reports go to PROFILE_OUTPUT (a local dir or s3://bucket/prefix)
+PROFILE_INVOCATIONS = os.getenv("PROFILE_INVOCATIONS", "").lower()
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "/tmp/profiles")
+PROFILE_QUERY_PARAMETER = "profile"
+PROFILE_TOP_N = 40
+
+
+def _should_profile(event: Dict[str, Any]) -> bool:
+    if PROFILE_INVOCATIONS == "always":
+        return True
+    if PROFILE_INVOCATIONS == "query":
+        params = event.get("queryStringParameters") or {}
+        if params.get(PROFILE_QUERY_PARAMETER, "").lower() not in ("1", "true"):
+            return False
+        # The wrapper runs ahead of authentication_middleware, so check the
+        # token here too or anyone could make us profile and write reports
+        headers = APIGatewayProxyEventV2(event).headers
+        return _has_valid_bearer_token(headers.get("Authorization", ""))
+    return False
+
+
+def profile_on_demand(handler):
+    """Run the handler under cProfile + tracemalloc when profiling is requested."""
+
+    @wraps(handler)
+    def wrapper(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+        if not _should_profile(event):
+            return handler(event, context)
+
+        import cProfile
+        import tracemalloc
+
+        profiler = cProfile.Profile()
+        tracemalloc.start(10)
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(handler, event, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            try:
+                _write_profile(
+                    profiler, snapshot, peak_bytes, duration_ms, context.aws_request_id
+                )
+            except Exception:
+                logger.exception("Failed to write invocation profile")
+
+    return wrapper
+
+
+def _write_profile(
+    profiler: Any,
+    snapshot: Any,
+    peak_bytes: int,
+    duration_ms: float,
+    request_id: str,
+) -> None:
+    """Write `<request_id>.prof` (pstats) and `<request_id>.txt` (summary)."""
+    import pstats
+    import tempfile
+
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_text)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    allocations = "\n".join(
+        str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+    )
+    report = (
+        f"Duration: {duration_ms:.1f} ms\n"
+        f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MiB\n\n"
+        f"Top allocations by line:\n{allocations}\n\n"
+        f"{stats_text.getvalue()}"
+    )
+    with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+        profiler.dump_stats(f.name)
+        profile_bytes = Path(f.name).read_bytes()
+
+    if PROFILE_OUTPUT.startswith("s3://"):
+        bucket, _, prefix = PROFILE_OUTPUT.removeprefix("s3://").partition("/")
+        location = f"s3://{bucket}/{prefix.rstrip('/')}/{request_id}"
+        for suffix, body in ((".prof", profile_bytes), (".txt", report.encode())):
+            get_s3_client().put_object(
+                Bucket=bucket,
+                Key=f"{prefix.rstrip('/')}/{request_id}{suffix}".lstrip("/"),
+                Body=body,
+            )
+    else:
+        os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+        location = os.path.join(PROFILE_OUTPUT, request_id)
+        Path(f"{location}.prof").write_bytes(profile_bytes)
+        Path(f"{location}.txt").write_text(report)
+
+    logger.info(
+        "Wrote invocation profile",
+        extra={
+            "location": location,
+            "duration_ms": duration_ms,
+            "peak_traced_bytes": peak_bytes,
+        },
+    )
+
+
 @logger.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_HTTP)
 @tracer.capture_lambda_handler
 @metrics.log_metrics
+@profile_on_demand
 def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler function"""
     try:
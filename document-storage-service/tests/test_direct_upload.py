@@ -0,0 +1,233 @@
+"""Tests for the pre-signed direct-to-S3 upload flow."""
+
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+def make_event(method: str, path: str, query: dict, body: dict | None = None):
+    """Build a minimal, authenticated API Gateway v2 event dict."""
+    return {
+        "version": "2.0",
+        "headers": {
+            "authorization": "Bearer test-token",
+            "content-type": "application/json",
+        },
+        "isBase64Encoded": False,
+        "body": json.dumps(body) if body is not None else None,
+        "queryStringParameters": query,
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "1.2.3.4",
+                "userAgent": "test",
+            },
+            "requestId": "test-123",
+            "stage": "$default",
+        },
+        "routeKey": f"{method} {path}",
+        "rawPath": path,
+        "rawQueryString": "",
+    }
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    monkeypatch.setenv("APPLICATION_BUCKET", "test-bucket")
+    monkeypatch.setenv("EVENT_BUS_NAME", "test-bus")
+    monkeypatch.setenv("BEARER_TOKEN_PARAM_NAME", "/just-my-links/auth-token/test")
+    sys.modules.pop("app", None)
+
+    mock_s3 = MagicMock()
+    mock_s3.exceptions.ClientError = ClientError
+    mock_s3.list_objects_v2.return_value = {"KeyCount": 0}
+    mock_s3.generate_presigned_url.side_effect = lambda op, Params, ExpiresIn: (
+        f"https://signed/{op}/{Params.get('PartNumber', 0)}"
+    )
+    mock_s3.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    mock_ssm = MagicMock()
+    mock_ssm.get_parameter.return_value = {"Parameter": {"Value": "test-token"}}
+
+    def client_factory(service, **kwargs):
+        if service == "s3":
+            return mock_s3
+        elif service == "ssm":
+            return mock_ssm
+        return MagicMock()
+
+    with patch("boto3.client", side_effect=client_factory):
+        import app as m
+
+        m.get_documents_folder.cache_clear()
+        m.get_bearer_token.cache_clear()
+        m.get_event_bus_name.cache_clear()
+        yield m
+
+
+def resolve(app_module, event) -> tuple[int, dict]:
+    result = app_module.app.resolve(event, MagicMock())
+    return result["statusCode"], json.loads(result["body"])
+
+
+def test_small_upload_gets_single_presigned_put(app_module):
+    status, body = resolve(
+        app_module,
+        make_event(
+            "POST",
+            "/document/uploads",
+            {
+                "url": "https://example.com/a.pdf",
+                "filename": "document.pdf",
+                "size": "1024",
+            },
+        ),
+    )
+
+    assert status == 200
+    assert body["uploadUrl"] == "https://signed/put_object/0"
+    assert body["contentType"] == "application/pdf"
+    assert "uploadId" not in body
+    app_module.get_s3_client().create_multipart_upload.assert_not_called()
+
+
+def test_large_upload_gets_one_presigned_url_per_part(app_module):
+    size = app_module.DIRECT_UPLOAD_PART_SIZE * 2 + 1
+    status, body = resolve(
+        app_module,
+        make_event(
+            "POST",
+            "/document/uploads",
+            {
+                "url": "https://example.com/a.pdf",
+                "filename": "document.pdf",
+                "size": str(size),
+            },
+        ),
+    )
+
+    assert status == 200
+    assert body["uploadId"] == "upload-1"
+    assert body["partUrls"] == [
+        "https://signed/upload_part/1",
+        "https://signed/upload_part/2",
+        "https://signed/upload_part/3",
+    ]
+    key = app_module.get_s3_client().create_multipart_upload.call_args.kwargs["Key"]
+    assert key.startswith(f"{app_module.UPLOAD_STAGING_FOLDER}/")
+
+
+def test_upload_rejects_unknown_filename(app_module):
+    status, body = resolve(
+        app_module,
+        make_event(
+            "POST",
+            "/document/uploads",
+            {"url": "https://example.com/a", "filename": "evil.exe", "size": "10"},
+        ),
+    )
+    assert status == 400
+
+
+def test_complete_moves_staged_file_and_publishes(app_module):
+    app_module.get_s3_client().head_object.return_value = {"ContentLength": 1024}
+
+    status, body = resolve(
+        app_module,
+        make_event(
+            "POST",
+            "/document/uploads/complete",
+            {"url": "https://example.com/a.pdf", "title": "Big #pdf"},
+            {
+                "filename": "document.pdf",
+                "uploadId": "upload-1",
+                "parts": [{"ETag": '"abc"', "PartNumber": 1}],
+            },
+        ),
+    )
+
+    assert status == 200
+    assert body["files"] == ["document.pdf"]
+    app_module.get_s3_client().complete_multipart_upload.assert_called_once()
+    copy_kwargs = app_module.get_s3_client().copy_object.call_args.kwargs
+    assert copy_kwargs["Key"].endswith("/document.pdf")
+    assert copy_kwargs["CopySource"]["Key"].startswith(
+        f"{app_module.UPLOAD_STAGING_FOLDER}/"
+    )
+    metadata = json.loads(
+        app_module.get_s3_client().put_object.call_args.kwargs["Body"]
+    )
+    assert metadata["entrypoint"] == "document.pdf"
+    assert metadata["title"] == "Big #pdf"
+    assert "entrypointEncoding" not in metadata
+    app_module.get_eventbridge_client().put_events.assert_called_once()
+
+
+def test_complete_without_upload_is_rejected(app_module):
+    app_module.get_s3_client().head_object.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    status, _ = resolve(
+        app_module,
+        make_event(
+            "POST",
+            "/document/uploads/complete",
+            {"url": "https://example.com/a.pdf"},
+            {"filename": "document.pdf"},
+        ),
+    )
+
+    assert status == 400
+    app_module.get_eventbridge_client().put_events.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("mode", "query", "profiled"),
+    [
+        ("", {"profile": "1"}, False),
+        ("always", {}, True),
+        ("query", {}, False),
+        ("query", {"profile": "1"}, True),
+    ],
+)
+def test_profiling_triggers(app_module, monkeypatch, tmp_path, mode, query, profiled):
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", mode)
+    monkeypatch.setattr(app_module, "PROFILE_OUTPUT", str(tmp_path))
+    handler = app_module.profile_on_demand(app_module.app.resolve)
+    event = make_event(
+        "POST",
+        "/document/uploads",
+        {
+            "url": "https://example.com/a.pdf",
+            "filename": "document.pdf",
+            "size": "1024",
+            **query,
+        },
+    )
+
+    result = handler(event, MagicMock(aws_request_id="req-1"))
+
+    assert result["statusCode"] == 200
+    assert (tmp_path / "req-1.prof").exists() is profiled
+    if profiled:
+        assert "Peak traced memory" in (tmp_path / "req-1.txt").read_text()
+
+
+def test_profiling_query_opt_in_requires_authentication(
+    app_module, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", "query")
+    monkeypatch.setattr(app_module, "PROFILE_OUTPUT", str(tmp_path))
+    handler = app_module.profile_on_demand(app_module.app.resolve)
+    event = make_event("POST", "/document/uploads", {"profile": "1"})
+    event["headers"]["authorization"] = "Bearer wrong-token"
+
+    result = handler(event, MagicMock(aws_request_id="req-1"))
+
+    assert result["statusCode"] == 401
+    assert not list(tmp_path.iterdir())
@@ -162,3 +162,240 @@ def test_missing_document_part_raises_error(mock_aws):
         app_module.MultipartParsingError, match="Missing required 'document' part"
     ):
         app_module._stream_multipart_to_s3(event, "ghi789sha256hash")
+
+
+def test_html_part_is_gzipped_at_rest(mock_aws):
+    """Text entrypoints are stored gzip-compressed with a matching ContentEncoding."""
+    import gzip
+    import sys
+
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+
+    boundary = "gzipboundary4321"
+    html_content = "<html><body>" + "<p>Repetitive markup</p>" * 200 + "</body></html>"
+    body = make_multipart_body(boundary, html_content, "text/html")
+    event = APIGatewayProxyEventV2(make_event(boundary, body, base64_encode=True))
+
+    result = app_module._stream_multipart_to_s3(event, "jkl012sha256hash")
+
+    # Reported size is the uncompressed size so the 20MB limit keeps its meaning
+    assert result["document.html"] == len(html_content.encode("utf-8"))
+    put_kwargs = mock_aws.put_object.call_args.kwargs
+    assert put_kwargs["ContentEncoding"] == "gzip"
+    assert put_kwargs["ContentType"] == "text/html"
+    assert len(put_kwargs["Body"]) < len(html_content)
+    assert gzip.decompress(put_kwargs["Body"]).decode("utf-8") == html_content
+
+
+def test_gzip_request_body_is_inflated_before_parsing(mock_aws):
+    """A gzip Content-Encoding on the request should be transparently inflated."""
+    import gzip
+    import sys
+
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+
+    boundary = "gzipbody1111"
+    html_content = "<html><body><h1>Sent compressed</h1></body></html>"
+    body = gzip.compress(make_multipart_body(boundary, html_content, "text/html"))
+    raw_event = make_event(boundary, body, base64_encode=True)
+    raw_event["headers"]["content-encoding"] = "gzip"
+    event = APIGatewayProxyEventV2(raw_event)
+
+    result = app_module._stream_multipart_to_s3(event, "mno345sha256hash")
+
+    assert result["document.html"] == len(html_content.encode("utf-8"))
+
+
+def test_gzip_bomb_is_rejected(mock_aws, monkeypatch):
+    """The size limit applies to the inflated body, not the compressed bytes."""
+    import gzip
+    import sys
+
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+    monkeypatch.setattr(app_module, "MAX_DECOMPRESSED_BODY_SIZE", 64 * 1024)
+    monkeypatch.setattr(app_module, "DECOMPRESS_CHUNK_SIZE", 4 * 1024)
+
+    boundary = "gzipbomb2222"
+    body = gzip.compress(make_multipart_body(boundary, "A" * (1024 * 1024)))
+    raw_event = make_event(boundary, body, base64_encode=True)
+    raw_event["headers"]["content-encoding"] = "gzip"
+    event = APIGatewayProxyEventV2(raw_event)
+
+    with pytest.raises(app_module.MultipartParsingError) as exc_info:
+        app_module._stream_multipart_to_s3(event, "pqr678sha256hash")
+    assert exc_info.value.status_code == 413
+
+
+def test_gzip_flush_output_counts_toward_limit(mock_aws, monkeypatch):
+    """Bytes only flush() returns are held to the same inflated-size cap."""
+    import sys
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    class FlushingDecompressor:
+        unconsumed_tail = b""
+        eof = True
+
+        def decompress(self, data, max_length):
+            return b""
+
+        def flush(self):
+            return b"A" * (app_module.MAX_DECOMPRESSED_BODY_SIZE + 1)
+
+    monkeypatch.setattr(
+        app_module.zlib, "decompressobj", lambda wbits: FlushingDecompressor()
+    )
+
+    with pytest.raises(app_module.MultipartParsingError) as exc_info:
+        list(app_module._iter_request_body(b"compressed", "gzip"))
+    assert exc_info.value.status_code == 413
+    assert "across all of its parts" in exc_info.value.message
+
+
+def test_unsupported_content_encoding_is_rejected(mock_aws):
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+    import sys
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+
+    boundary = "brboundary3333"
+    raw_event = make_event(boundary, make_multipart_body(boundary, "<p>hi</p>"))
+    raw_event["headers"]["content-encoding"] = "br"
+    event = APIGatewayProxyEventV2(raw_event)
+
+    with pytest.raises(app_module.MultipartParsingError) as exc_info:
+        app_module._stream_multipart_to_s3(event, "stu901sha256hash")
+    assert exc_info.value.status_code == 415
+
+
+def test_assets_are_stored_once_by_content_hash(mock_aws):
+    """Non-document parts go to the shared asset store and are deduplicated."""
+    import hashlib
+    import json
+    import sys
+
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+    from botocore.exceptions import ClientError
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+
+    stored: set[str] = set()
+
+    def head_object(Bucket, Key):
+        if Key not in stored:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
+    mock_aws.exceptions.ClientError = ClientError
+    mock_aws.head_object.side_effect = head_object
+    mock_aws.put_object.side_effect = lambda Bucket, Key, **kwargs: stored.add(Key)
+
+    boundary = "assetboundary777"
+    css = "body { color: rebeccapurple; }"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="document"; filename="document.html"\r\n'
+        "Content-Type: text/html\r\n"
+        "\r\n"
+        '<html><link rel="stylesheet" href="site.css"></html>\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="asset"; filename="site.css"\r\n'
+        "Content-Type: text/css\r\n"
+        "\r\n"
+        f"{css}\r\n"
+        f"--{boundary}--\r\n"
+    ).encode("utf-8")
+    asset_key = f"document-assets/{hashlib.sha256(css.encode('utf-8')).hexdigest()}"
+
+    for folder in ("page-one-hash", "page-two-hash"):
+        event = APIGatewayProxyEventV2(make_event(boundary, body))
+        result = app_module._stream_multipart_to_s3(event, folder)
+        # The folder's files are the document and the manifest, not the asset
+        assert sorted(result) == [".assets.json", "document.html"]
+
+    asset_puts = [
+        c for c in mock_aws.put_object.call_args_list if c.kwargs["Key"] == asset_key
+    ]
+    assert len(asset_puts) == 1  # second page reused the stored copy
+    assert not any(key.endswith("/site.css") for key in stored)
+
+    manifest_puts = [
+        c
+        for c in mock_aws.put_object.call_args_list
+        if c.kwargs["Key"].endswith("/.assets.json")
+    ]
+    assert len(manifest_puts) == 2
+    manifest = json.loads(manifest_puts[-1].kwargs["Body"])
+    assert manifest["site.css"]["key"] == asset_key
+    assert manifest["site.css"]["contentType"] == "text/css"
+
+
+def test_large_asset_is_hashed_before_anything_is_uploaded(mock_aws):
+    """An asset over the part size is put once, straight to its hash key."""
+    import hashlib
+    import sys
+
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
+    from botocore.exceptions import ClientError
+
+    sys.modules.pop("app", None)
+    import app as app_module
+
+    app_module.get_documents_folder.cache_clear()
+    mock_aws.exceptions.ClientError = ClientError
+    mock_aws.head_object.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    image = b"\x89PNG" + b"\x00" * (6 * 1024 * 1024)
+    boundary = "largeassetboundary"
+    body = (
+        (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="document"; filename="document.txt"\r\n'
+            "Content-Type: text/plain\r\n"
+            "\r\n"
+            "hello\r\n"
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="asset"; filename="big.png"\r\n'
+            "Content-Type: image/png\r\n"
+            "\r\n"
+        ).encode("utf-8")
+        + image
+        + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    )
+
+    event = APIGatewayProxyEventV2(make_event(boundary, body))
+    app_module._stream_multipart_to_s3(event, "large-asset-hash")
+
+    mock_aws.create_multipart_upload.assert_not_called()
+    mock_aws.put_object.assert_any_call(
+        Bucket="test-bucket",
+        Key=f"document-assets/{hashlib.sha256(image).hexdigest()}",
+        Body=image,
+        ContentType="image/png",
+    )
+    mock_aws.copy_object.assert_not_called()
+    mock_aws.delete_object.assert_not_called()
@@ -1,7 +1,15 @@
+import base64
+import gzip
+import hashlib
 import io
 import json
+import math
 import os
+import re
+import shutil
 import struct
+import time
+import zlib
 from pathlib import Path
 
 try:
@@ -9,32 +17,54 @@ try:
 except ImportError:
     import sqlite3  # type: ignore[no-redef]
 from contextlib import contextmanager
-from functools import cache
+from functools import cache, wraps
 from typing import Any, Generator
 
-import boto3
-import sqlite_vec
 from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.metrics import MetricUnit
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
 
 logger = Logger(level=os.getenv("LOG_LEVEL", "INFO"))
 tracer = Tracer()
 metrics = Metrics(namespace="just-my-links")
 
-s3_client = boto3.client("s3")
-eventbridge_client = boto3.client("events")
-bedrock_client = boto3.client("bedrock-runtime")
-
 VECTOR_DB_S3_KEY = "vector-index/index.db"
 VECTOR_DB_LOCAL_PATH = "/tmp/index.db"
+# Documents are spread over this many index files by URL hash, so an update
+# only moves one shard through S3; must match the search service's.  1 keeps
+# the single VECTOR_DB_S3_KEY
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", "1"))
+# Index files are published both as-is and gzip-compressed as "<key>.gz",
+# tagged with object metadata index-format=COMPRESSED_INDEX_FORMAT, and read
+# from there when the tag is one this code understands.  Readers that predate
+# the compressed copy, and search's "remote" serving mode, read only the raw key
+INDEX_PUBLISH_FORMATS = frozenset(
+    os.getenv("INDEX_PUBLISH_FORMATS", "raw,gzip").split(",")
+)
+# Set once no raw-key reader is left: publishing without "raw" then deletes the
+# last raw copy instead of leaving it in place for them
+INDEX_DELETE_UNPUBLISHED_RAW = os.getenv(
+    "INDEX_DELETE_UNPUBLISHED_RAW", ""
+).lower() in ("1", "true")
+INDEX_COMPRESSION_LEVEL = int(os.getenv("INDEX_COMPRESSION_LEVEL", "1"))
+COMPRESSED_INDEX_FORMAT = "gzip-1"
+TRANSFER_CHUNK_BYTES = 1024 * 1024
+# With the change log on, each indexed document is appended to its shard's log
+# in S3 as one small record instead of re-uploading the shard.  Search replicas
+# replay new records on top of their snapshot, and a scheduled {"compact": true}
+# event folds them into the snapshot.  Must match the search service's
+INDEX_CHANGE_LOG = os.getenv("INDEX_CHANGE_LOG", "").lower() in ("1", "true")
+CHANGE_LOG_FORMAT = 1
 BEDROCK_MODEL_ID = "amazon.titan-embed-text-v2:0"
 EMBEDDING_DIMENSIONS = 1024
+# Leading dimensions kept (renormalised) per chunk for search's cheap first pass
+SHORT_EMBEDDING_DIMENSIONS = 256
 # Titan V2 max input is 8192 tokens; we chunk well below that
 MAX_CHUNK_CHARS = 2000  # ≈ 500 tokens at ~4 chars/token
 OVERLAP_CHARS = 200  # ≈ 50 tokens of overlap between chunks
+# Bump whenever extract_text/normalize_extracted_text output changes so cached
+# extracted-text sidecars are regenerated rather than reused
+EXTRACTOR_VERSION = 1
 
 # ---------------------------------------------------------------------------
 # Title normalisation
@@ -72,13 +102,80 @@ def get_event_bus_name() -> str:
     return v
 
 
+# ---------------------------------------------------------------------------
+# AWS clients — built on first use to keep boto3 out of the cold start
+# ---------------------------------------------------------------------------
+
+
+@cache
+def get_s3_client() -> Any:
+    import boto3
+
+    return boto3.client("s3")
+
+
+@cache
+def get_eventbridge_client() -> Any:
+    import boto3
+
+    return boto3.client("events")
+
+
+@cache
+def get_bedrock_client() -> Any:
+    import boto3
+
+    return boto3.client("bedrock-runtime")
+
+
+# ---------------------------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------------------------
+
+
+@contextmanager
+def timed_stage(name: str) -> Generator[None, None, None]:
+    """Record a pipeline stage as an X-Ray subsegment and a `<name>Duration` metric."""
+    started = time.perf_counter()
+    with tracer.provider.in_subsegment(f"## {name}"):
+        try:
+            yield
+        finally:
+            metrics.add_metric(
+                name=f"{name}Duration",
+                unit=MetricUnit.Milliseconds,
+                value=(time.perf_counter() - started) * 1000,
+            )
+
+
 # ---------------------------------------------------------------------------
 # sqlite-vec helpers
 # ---------------------------------------------------------------------------
 
 
-def _open_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(VECTOR_DB_LOCAL_PATH)
+def _shard_for(url: str) -> int:
+    """Shard holding a document; stable across processes, unlike hash()."""
+    digest = hashlib.blake2b(url.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % INDEX_SHARDS
+
+
+def _shard_key(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return VECTOR_DB_S3_KEY
+    return f"vector-index/shards-{INDEX_SHARDS}/{shard:03d}.db"
+
+
+def _shard_path(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return VECTOR_DB_LOCAL_PATH
+    root, ext = os.path.splitext(VECTOR_DB_LOCAL_PATH)
+    return f"{root}-{shard:03d}{ext}"
+
+
+def _open_db(path: str | None = None) -> sqlite3.Connection:
+    import sqlite_vec
+
+    conn = sqlite3.connect(path or VECTOR_DB_LOCAL_PATH)
     conn.enable_load_extension(True)
     sqlite_vec.load(conn)
     conn.enable_load_extension(False)
@@ -97,6 +194,8 @@ def _init_schema(conn: sqlite3.Connection) -> None:
         )
     """
     )
+    # Tag-filtered search maps a document's URL to its chunk ids
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_url ON chunks(url)")
     conn.execute(
         f"""
         CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks USING vec0(
@@ -105,6 +204,36 @@ def _init_schema(conn: sqlite3.Connection) -> None:
         )
     """
     )
+    # One normalised mean vector per document, so search can shortlist
+    # documents before scoring their chunks
+    has_centroids = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'vec_documents'"
+    ).fetchone()
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_documents USING vec0(
+            document_id INTEGER PRIMARY KEY,
+            embedding   float[{EMBEDDING_DIMENSIONS}],
+            +url        TEXT
+        )
+    """
+    )
+    if not has_centroids:
+        _backfill_document_centroids(conn)
+    # Truncated copy of every chunk vector, scanned before the exact re-rank
+    has_short_vectors = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'vec_chunks_short'"
+    ).fetchone()
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks_short USING vec0(
+            chunk_id  INTEGER PRIMARY KEY,
+            embedding float[{SHORT_EMBEDDING_DIMENSIONS}]
+        )
+    """
+    )
+    if not has_short_vectors:
+        _backfill_short_vectors(conn)
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS documents (
@@ -134,9 +263,73 @@ def _init_schema(conn: sqlite3.Connection) -> None:
         )
     """
     )
+    # Sequence of the last change-log record folded into this file
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log_position (
+            id       INTEGER PRIMARY KEY CHECK (id = 1),
+            sequence INTEGER NOT NULL
+        )
+    """
+    )
     conn.commit()
 
 
+def _centroid(embeddings: list[list[float]]) -> list[float]:
+    """Normalised mean of a document's chunk embeddings."""
+    total = [sum(values) for values in zip(*embeddings)]
+    norm = math.sqrt(sum(x * x for x in total)) or 1.0
+    return [x / norm for x in total]
+
+
+def _backfill_document_centroids(conn: sqlite3.Connection) -> None:
+    """Compute centroids from the stored chunk vectors of every indexed URL."""
+    urls = [url for (url,) in conn.execute("SELECT DISTINCT url FROM chunks")]
+    for url in urls:
+        embeddings = [
+            list(struct.unpack(f"{EMBEDDING_DIMENSIONS}f", blob))
+            for (blob,) in conn.execute(
+                """
+                SELECT v.embedding FROM chunks c
+                JOIN vec_chunks v ON v.chunk_id = c.id
+                WHERE c.url = ?
+                """,
+                (url,),
+            )
+        ]
+        if embeddings:
+            conn.execute(
+                "INSERT INTO vec_documents (embedding, url) VALUES (?, ?)",
+                (_serialize_embedding(_centroid(embeddings)), url),
+            )
+    logger.info("Backfilled document centroids", extra={"document_count": len(urls)})
+
+
+def _short_vector(embedding: list[float]) -> list[float]:
+    """Leading SHORT_EMBEDDING_DIMENSIONS of an embedding, renormalised."""
+    short = embedding[:SHORT_EMBEDDING_DIMENSIONS]
+    norm = math.sqrt(sum(x * x for x in short)) or 1.0
+    return [x / norm for x in short]
+
+
+def _backfill_short_vectors(conn: sqlite3.Connection) -> None:
+    """Derive short vectors from every stored full-length chunk vector."""
+    rows = conn.execute("SELECT chunk_id, embedding FROM vec_chunks").fetchall()
+    conn.executemany(
+        "INSERT INTO vec_chunks_short (chunk_id, embedding) VALUES (?, ?)",
+        (
+            (
+                chunk_id,
+                _serialize_embedding(
+                    _short_vector(list(struct.unpack(f"{EMBEDDING_DIMENSIONS}f", blob)))
+                ),
+            )
+            for chunk_id, blob in rows
+        ),
+    )
+    logger.info("Backfilled short chunk vectors", extra={"chunk_count": len(rows)})
+
+
 def _parse_title(raw: str) -> tuple[str, str, list[str]]:
     """Parse raw title into (full_title, normalized_title, tags).
 
@@ -160,30 +353,349 @@ def _serialize_embedding(embedding: list[float]) -> bytes:
     return struct.pack(f"{len(embedding)}f", *embedding)
 
 
+def _is_missing(error: Exception) -> bool:
+    code = error.response["Error"]["Code"]  # type: ignore[attr-defined]
+    return code in ("404", "NoSuchKey")
+
+
+def _download_index_file(bucket: str, key: str, local_path: str) -> bool:
+    """Fetch an index file, preferring its compressed copy.
+
+    The gzip stream is decoded straight to `local_path`; a stream that ends
+    early raises EOFError.  Returns False if neither copy exists.
+    """
+    s3 = get_s3_client()
+    try:
+        response = s3.get_object(Bucket=bucket, Key=f"{key}.gz")
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+    else:
+        if response["Metadata"].get("index-format") == COMPRESSED_INDEX_FORMAT:
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+            with open(local_path, "wb") as f:
+                for chunk in response["Body"].iter_chunks(TRANSFER_CHUNK_BYTES):
+                    f.write(decompressor.decompress(chunk))
+                f.write(decompressor.flush())
+            if not decompressor.eof:
+                raise EOFError(f"Truncated compressed index at {key}.gz")
+            return True
+        response["Body"].close()  # written by a newer format; use the raw copy
+    try:
+        s3.download_file(bucket, key, local_path)
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+        return False
+    return True
+
+
+def _upload_index_file(
+    local_path: str, bucket: str, key: str, log_sequence: int = 0
+) -> None:
+    """Publish an index file in every format in INDEX_PUBLISH_FORMATS.
+
+    Both copies carry the change-log position folded into the file as
+    `log-sequence` metadata.
+    """
+    s3 = get_s3_client()
+    metadata = {"log-sequence": str(log_sequence)}
+    if "gzip" in INDEX_PUBLISH_FORMATS:
+        compressed_path = f"{local_path}.gz"
+        with (
+            open(local_path, "rb") as f_in,
+            gzip.open(
+                compressed_path, "wb", compresslevel=INDEX_COMPRESSION_LEVEL
+            ) as f_out,
+        ):
+            shutil.copyfileobj(f_in, f_out, TRANSFER_CHUNK_BYTES)
+        metrics.add_metric(
+            name="IndexCompressedBytes",
+            unit=MetricUnit.Bytes,
+            value=os.path.getsize(compressed_path),
+        )
+        try:
+            s3.upload_file(
+                compressed_path,
+                bucket,
+                f"{key}.gz",
+                ExtraArgs={
+                    "Metadata": {**metadata, "index-format": COMPRESSED_INDEX_FORMAT}
+                },
+            )
+        finally:
+            os.remove(compressed_path)
+    else:
+        # Readers prefer the compressed copy, so never leave a stale one behind
+        s3.delete_object(Bucket=bucket, Key=f"{key}.gz")
+    if "raw" in INDEX_PUBLISH_FORMATS:
+        s3.upload_file(local_path, bucket, key, ExtraArgs={"Metadata": metadata})
+    elif INDEX_DELETE_UNPUBLISHED_RAW:
+        s3.delete_object(Bucket=bucket, Key=key)
+
+
+@contextmanager
+def sync_vector_db(url: str) -> Generator[sqlite3.Connection, None, None]:
+    """Download the shard holding `url` from S3, yield a connection, upload on exit."""
+    with _sync_shard(_shard_for(url)) as conn:
+        yield conn
+
+
 @contextmanager
-def sync_vector_db() -> Generator[sqlite3.Connection, None, None]:
-    """Download the vector DB from S3, yield an open connection, upload on exit."""
+def _sync_shard(shard: int) -> Generator[sqlite3.Connection, None, None]:
+    """Download a shard, fold in its change log, yield a connection, upload on exit.
+
+    Nothing is published if the body raises.  The log records folded in are
+    deleted once the new snapshot is uploaded.
+    """
     bucket = get_application_bucket()
+    key, local_path = _shard_key(shard), _shard_path(shard)
 
     # Download existing index (ok if it doesn't exist yet)
-    try:
-        s3_client.download_file(bucket, VECTOR_DB_S3_KEY, VECTOR_DB_LOCAL_PATH)
-        logger.info("Downloaded existing vector index from S3")
-    except s3_client.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
-            logger.info("No existing vector index found — starting fresh")
+    with timed_stage("IndexDownload"):
+        if _download_index_file(bucket, key, local_path):
+            logger.info("Downloaded existing vector index from S3", extra={"key": key})
         else:
-            raise
+            logger.info(
+                "No existing vector index found — starting fresh", extra={"key": key}
+            )
 
-    conn = _open_db()
+    conn = _open_db(local_path)
     _init_schema(conn)
+    folded = _replay_change_log(conn, bucket, shard)
     try:
         yield conn
         conn.commit()
+        log_sequence = _log_position(conn)
     finally:
         conn.close()
-        s3_client.upload_file(VECTOR_DB_LOCAL_PATH, bucket, VECTOR_DB_S3_KEY)
-        logger.info("Uploaded updated vector index to S3")
+    metrics.add_metric(
+        name="IndexSizeBytes",
+        unit=MetricUnit.Bytes,
+        value=os.path.getsize(local_path),
+    )
+    with timed_stage("IndexUpload"):
+        _upload_index_file(local_path, bucket, key, log_sequence)
+    logger.info(
+        "Uploaded updated vector index to S3",
+        extra={"key": key, "log_sequence": log_sequence},
+    )
+    _delete_change_records(bucket, folded)
+
+
+# ---------------------------------------------------------------------------
+# Change log
+# ---------------------------------------------------------------------------
+
+
+def _log_prefix(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return "vector-index/log/"
+    return f"vector-index/shards-{INDEX_SHARDS}/log-{shard:03d}/"
+
+
+def _log_key(shard: int, sequence: int) -> str:
+    # Zero-padded so S3 lists records in sequence order
+    return f"{_log_prefix(shard)}{sequence:012d}.json.gz"
+
+
+def _log_sequence(key: str) -> int:
+    return int(key.rsplit("/", 1)[1].split(".", 1)[0])
+
+
+def _log_position(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT sequence FROM change_log_position").fetchone()
+    return row[0] if row else 0
+
+
+def _set_log_position(conn: sqlite3.Connection, sequence: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO change_log_position (id, sequence) VALUES (1, ?)
+        ON CONFLICT(id) DO UPDATE SET sequence = excluded.sequence
+        """,
+        (sequence,),
+    )
+
+
+def _snapshot_log_position(bucket: str, key: str) -> int | None:
+    """Change-log position of the published snapshot (None if there is none)."""
+    s3 = get_s3_client()
+    if "gzip" in INDEX_PUBLISH_FORMATS:
+        key = f"{key}.gz"
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+        return None
+    return int(head["Metadata"].get("log-sequence", "0"))
+
+
+def _pending_log_keys(bucket: str, shard: int, position: int) -> list[str]:
+    """Keys of the shard's log records after `position`, in order."""
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    keys = []
+    for page in paginator.paginate(
+        Bucket=bucket,
+        Prefix=_log_prefix(shard),
+        StartAfter=_log_key(shard, position),
+    ):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+def _document_change(
+    url: str, chunks: list[str], embeddings: list[list[float]], title: str | None
+) -> dict[str, Any]:
+    """Log record replacing everything indexed for `url`.
+
+    Carries the rows `_write_rows` stores, vectors as base64 float32 blobs,
+    so replicas insert them as they are instead of deriving them again.
+    """
+    rows = _document_rows(url, chunks, embeddings, title)
+    centroid = rows["centroid"]
+    return {
+        "format": CHANGE_LOG_FORMAT,
+        "op": "upsert",
+        **rows,
+        "chunks": [
+            {
+                "text": chunk["text"],
+                "embedding": base64.b64encode(chunk["embedding"]).decode(),
+                "short_embedding": base64.b64encode(chunk["short_embedding"]).decode(),
+            }
+            for chunk in rows["chunks"]
+        ],
+        "centroid": base64.b64encode(centroid).decode() if centroid else None,
+    }
+
+
+@tracer.capture_method
+def append_change(change: dict[str, Any]) -> int:
+    """Append a record to the log of the shard holding its URL; returns its sequence.
+
+    Sequences continue from the last record, or from the snapshot's position
+    once compaction has deleted the records.  The put is conditional, so a
+    second writer racing for the same sequence fails instead of overwriting.
+    """
+    bucket = get_application_bucket()
+    shard = _shard_for(change["url"])
+    position = _snapshot_log_position(bucket, _shard_key(shard)) or 0
+    pending = _pending_log_keys(bucket, shard, position)
+    sequence = (_log_sequence(pending[-1]) if pending else position) + 1
+    # One writer: the template reserves a concurrency of 1 for this function
+    # (ReservedConcurrentExecutions: 1), so nothing appends or compacts between
+    # the LIST above and the PUT below.  If that ever stops holding, refuse to
+    # write a record the snapshot already covers or one that leaves a gap.
+    if sequence <= position or (pending and _log_sequence(pending[0]) != position + 1):
+        raise RuntimeError(
+            f"Change log for shard {shard} does not continue from snapshot "
+            f"position {position}"
+        )
+
+    body = gzip.compress(
+        json.dumps({**change, "sequence": sequence}).encode(),
+        compresslevel=INDEX_COMPRESSION_LEVEL,
+    )
+    get_s3_client().put_object(
+        Bucket=bucket, Key=_log_key(shard, sequence), Body=body, IfNoneMatch="*"
+    )
+    metrics.add_metric(name="ChangeLogBytes", unit=MetricUnit.Bytes, value=len(body))
+    logger.info(
+        "Appended change record",
+        extra={
+            "url": change["url"],
+            "op": change["op"],
+            "shard": shard,
+            "sequence": sequence,
+            "bytes": len(body),
+        },
+    )
+    return sequence
+
+
+def _read_change(bucket: str, key: str) -> dict[str, Any]:
+    body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+    change = json.loads(gzip.decompress(body))
+    if change.get("format") != CHANGE_LOG_FORMAT:
+        raise ValueError(f"Unsupported change record format in {key}")
+    return change
+
+
+def _apply_change(conn: sqlite3.Connection, change: dict[str, Any]) -> None:
+    if change["op"] == "delete":
+        _delete_document(conn, change["url"])
+    else:
+        centroid = change["centroid"]
+        _write_rows(
+            conn,
+            {
+                **change,
+                "chunks": [
+                    {
+                        "text": chunk["text"],
+                        "embedding": base64.b64decode(chunk["embedding"]),
+                        "short_embedding": base64.b64decode(chunk["short_embedding"]),
+                    }
+                    for chunk in change["chunks"]
+                ],
+                "centroid": base64.b64decode(centroid) if centroid else None,
+            },
+        )
+    _set_log_position(conn, change["sequence"])
+
+
+def _replay_change_log(conn: sqlite3.Connection, bucket: str, shard: int) -> list[str]:
+    """Apply the shard's log records newer than the file; returns their keys."""
+    keys = _pending_log_keys(bucket, shard, _log_position(conn))
+    if not keys:
+        return []
+    with timed_stage("ChangeLogReplay"):
+        for key in keys:
+            _apply_change(conn, _read_change(bucket, key))
+        conn.commit()
+    metrics.add_metric(
+        name="ChangeRecordsFolded", unit=MetricUnit.Count, value=len(keys)
+    )
+    logger.info(
+        "Folded change log into index",
+        extra={
+            "shard": shard,
+            "records": len(keys),
+            "log_sequence": _log_position(conn),
+        },
+    )
+    return keys
+
+
+def _delete_change_records(bucket: str, keys: list[str]) -> None:
+    s3 = get_s3_client()
+    for start in range(0, len(keys), 1000):  # delete_objects' per-call limit
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys[start : start + 1000]]},
+        )
+
+
+@tracer.capture_method
+def compact_change_log() -> int:
+    """Fold every shard's pending log records into a new snapshot.
+
+    Returns the number of records folded.  Shards with nothing pending are
+    left alone, so a scheduled run over an idle index costs a few requests.
+    """
+    bucket = get_application_bucket()
+    folded = 0
+    for shard in range(INDEX_SHARDS):
+        position = _snapshot_log_position(bucket, _shard_key(shard)) or 0
+        pending = len(_pending_log_keys(bucket, shard, position))
+        if pending:
+            with _sync_shard(shard):
+                pass
+            folded += pending
+    logger.info("Compacted change log", extra={"records": folded})
+    return folded
 
 
 # ---------------------------------------------------------------------------
@@ -192,14 +704,22 @@ def sync_vector_db() -> Generator[sqlite3.Connection, None, None]:
 
 
 def extract_text(content: bytes | str, content_type: str) -> str:
-    """Extract plain text from HTML, plain text, or PDF content."""
+    """Extract plain text from HTML, plain text, or PDF content.
+
+    pypdf and bs4 are imported on demand: a batch of HTML never loads pypdf and
+    plain text loads neither.
+    """
     if content_type == "application/pdf":
+        from pypdf import PdfReader
+
         raw = content if isinstance(content, bytes) else content.encode("latin-1")
         reader = PdfReader(io.BytesIO(raw))
         pages = [page.extract_text() or "" for page in reader.pages]
         return "\n\n".join(p for p in pages if p.strip())
     text = content.decode("utf-8") if isinstance(content, bytes) else content
     if "html" in content_type:
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(text, "html.parser")
         for tag in soup(["script", "style", "head", "nav", "footer"]):
             tag.decompose()
@@ -207,6 +727,84 @@ def extract_text(content: bytes | str, content_type: str) -> str:
     return text
 
 
+def normalize_extracted_text(text: str) -> str:
+    """Collapse runs of blank lines left behind by extraction.
+
+    Paragraph breaks stay as a single blank line, so chunk_text produces the
+    same chunks from the normalised text as from the raw extraction.
+    """
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def _extracted_text_key(folder_path: str, content_id: str) -> str:
+    return f"{folder_path}/extracted-{content_id}-v{EXTRACTOR_VERSION}.txt"
+
+
+@tracer.capture_method
+def load_document_text(bucket: str, folder_path: str, metadata: dict) -> str:
+    """Return the entrypoint's extracted text, parsing it only once per content.
+
+    The extracted text is cached next to the document as a gzipped sidecar
+    keyed by the entrypoint's ETag (its content hash) and EXTRACTOR_VERSION,
+    so re-indexes and rebuilds skip the download and the HTML/PDF parse.
+    """
+    entrypoint = metadata["entrypoint"]
+    if entrypoint.endswith(".html"):
+        content_type = "text/html"
+    elif entrypoint.endswith(".pdf"):
+        content_type = "application/pdf"
+    else:
+        content_type = "text/plain"
+
+    doc_key = f"{folder_path}/{entrypoint}"
+    # The HEAD gives the content hash that keys the extracted-text sidecar
+    with timed_stage("ExtractedTextLookup"):
+        head = get_s3_client().head_object(Bucket=bucket, Key=doc_key)
+        metrics.add_metric(
+            name="DocumentBytes", unit=MetricUnit.Bytes, value=head["ContentLength"]
+        )
+        sidecar_key = _extracted_text_key(folder_path, head["ETag"].strip('"'))
+        cached_text = _get_extracted_text_sidecar(bucket, sidecar_key)
+
+    if cached_text is not None:
+        logger.info("Using cached extracted text", extra={"key": sidecar_key})
+        metrics.add_metric(
+            name="ExtractedTextCacheHits", unit=MetricUnit.Count, value=1
+        )
+        return cached_text
+
+    with timed_stage("DocumentFetch"):
+        # Read the document content, gunzipping as it streams if the
+        # storage service compressed it at rest
+        body = get_s3_client().get_object(Bucket=bucket, Key=doc_key)["Body"]
+        if metadata.get("entrypointEncoding") == "gzip":
+            body = gzip.GzipFile(fileobj=body)
+        content = body.read()
+
+    with timed_stage("TextExtraction"):
+        text = normalize_extracted_text(extract_text(content, content_type))
+
+    with timed_stage("ExtractedTextUpload"):
+        get_s3_client().put_object(
+            Bucket=bucket,
+            Key=sidecar_key,
+            Body=gzip.compress(text.encode("utf-8")),
+            ContentType="text/plain; charset=utf-8",
+            ContentEncoding="gzip",
+        )
+    return text
+
+
+def _get_extracted_text_sidecar(bucket: str, sidecar_key: str) -> str | None:
+    try:
+        sidecar = get_s3_client().get_object(Bucket=bucket, Key=sidecar_key)["Body"]
+    except get_s3_client().exceptions.ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+            raise
+        return None
+    return gzip.GzipFile(fileobj=sidecar).read().decode("utf-8")
+
+
 # ---------------------------------------------------------------------------
 # Chunking
 # ---------------------------------------------------------------------------
@@ -255,7 +853,7 @@ def chunk_text(text: str) -> list[str]:
 @tracer.capture_method
 def embed_text(text: str) -> list[float]:
     """Call Bedrock Titan V2 to get an embedding for a text chunk."""
-    response = bedrock_client.invoke_model(
+    response = get_bedrock_client().invoke_model(
         modelId=BEDROCK_MODEL_ID,
         body=json.dumps(
             {
@@ -279,6 +877,36 @@ def upsert_document(
     conn: sqlite3.Connection, url: str, chunks: list[str], title: str | None = None
 ) -> None:
     """Delete any existing chunks for this URL then insert fresh embeddings."""
+    embeddings = _embed_chunks(chunks)
+    with timed_stage("IndexWrite"):
+        _write_document(conn, url, chunks, embeddings, title)
+
+
+@tracer.capture_method
+def log_document(url: str, chunks: list[str], title: str | None = None) -> None:
+    """Embed a document and append it to the change log instead of the snapshot.
+
+    Replicas replay records on top of a snapshot, so a shard's first document
+    still goes through `sync_vector_db` to create one.
+    """
+    embeddings = _embed_chunks(chunks)
+    key = _shard_key(_shard_for(url))
+    if _snapshot_log_position(get_application_bucket(), key) is None:
+        with sync_vector_db(url) as conn, timed_stage("IndexWrite"):
+            _write_document(conn, url, chunks, embeddings, title)
+        return
+    with timed_stage("IndexWrite"):
+        append_change(_document_change(url, chunks, embeddings, title))
+
+
+def _embed_chunks(chunks: list[str]) -> list[list[float]]:
+    with timed_stage("Embedding"):
+        embeddings = [embed_text(chunk) for chunk in chunks]
+    metrics.add_metric(name="BedrockCalls", unit=MetricUnit.Count, value=len(chunks))
+    return embeddings
+
+
+def _delete_chunks(conn: sqlite3.Connection, url: str) -> None:
     # Find existing chunk ids so we can remove them from the vec table too
     existing_ids = [
         row[0] for row in conn.execute("SELECT id FROM chunks WHERE url = ?", (url,))
@@ -288,24 +916,85 @@ def upsert_document(
         conn.execute(
             f"DELETE FROM vec_chunks WHERE chunk_id IN ({placeholders})", existing_ids
         )
+        conn.execute(
+            f"DELETE FROM vec_chunks_short WHERE chunk_id IN ({placeholders})",
+            existing_ids,
+        )
         conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
 
-    for i, chunk in enumerate(chunks):
-        embedding = embed_text(chunk)
+
+def _delete_document(conn: sqlite3.Connection, url: str) -> None:
+    """Remove every row indexed for `url`."""
+    _delete_chunks(conn, url)
+    conn.execute("DELETE FROM vec_documents WHERE url = ?", (url,))
+    conn.execute("DELETE FROM document_tags WHERE url = ?", (url,))
+    conn.execute("DELETE FROM documents WHERE url = ?", (url,))
+    logger.info("Deleted document", extra={"url": url})
+
+
+def _document_rows(
+    url: str, chunks: list[str], embeddings: list[list[float]], title: str | None
+) -> dict[str, Any]:
+    """Everything stored for `url`: parsed title, tags and every vector."""
+    if title is not None:
+        full_title, normalized_title, tags = _parse_title(title)
+    else:
+        full_title, normalized_title, tags = None, None, []
+    return {
+        "url": url,
+        "full_title": full_title,
+        "title": normalized_title,
+        "tags": tags,
+        "chunks": [
+            {
+                "text": chunk,
+                "embedding": _serialize_embedding(embedding),
+                "short_embedding": _serialize_embedding(_short_vector(embedding)),
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ],
+        "centroid": (
+            _serialize_embedding(_centroid(embeddings)) if embeddings else None
+        ),
+    }
+
+
+def _write_document(
+    conn: sqlite3.Connection,
+    url: str,
+    chunks: list[str],
+    embeddings: list[list[float]],
+    title: str | None,
+) -> None:
+    _write_rows(conn, _document_rows(url, chunks, embeddings, title))
+
+
+def _write_rows(conn: sqlite3.Connection, rows: dict[str, Any]) -> None:
+    """Replace the rows stored for a document with `_document_rows` output."""
+    url = rows["url"]
+    _delete_chunks(conn, url)
+
+    for i, chunk in enumerate(rows["chunks"]):
         cur = conn.execute(
             "INSERT INTO chunks (url, chunk_index, chunk_text) VALUES (?, ?, ?)",
-            (url, i, chunk),
+            (url, i, chunk["text"]),
         )
         chunk_id = cur.lastrowid
         conn.execute(
             "INSERT INTO vec_chunks (chunk_id, embedding) VALUES (?, ?)",
-            (chunk_id, _serialize_embedding(embedding)),
+            (chunk_id, chunk["embedding"]),
+        )
+        conn.execute(
+            "INSERT INTO vec_chunks_short (chunk_id, embedding) VALUES (?, ?)",
+            (chunk_id, chunk["short_embedding"]),
         )
 
-    if title is not None:
-        full_title, normalized_title, tags = _parse_title(title)
-    else:
-        full_title, normalized_title, tags = None, None, []
+    conn.execute("DELETE FROM vec_documents WHERE url = ?", (url,))
+    if rows["centroid"] is not None:
+        conn.execute(
+            "INSERT INTO vec_documents (embedding, url) VALUES (?, ?)",
+            (rows["centroid"], url),
+        )
 
     conn.execute(
         """
@@ -314,11 +1003,11 @@ def upsert_document(
             full_title = excluded.full_title,
             title      = excluded.title
         """,
-        (url, full_title, normalized_title),
+        (url, rows["full_title"], rows["title"]),
     )
 
     conn.execute("DELETE FROM document_tags WHERE url = ?", (url,))
-    for tag in tags:
+    for tag in rows["tags"]:
         conn.execute(
             "INSERT OR IGNORE INTO document_tags (url, tag) VALUES (?, ?)",
             (url, tag),
@@ -326,7 +1015,11 @@ def upsert_document(
 
     logger.info(
         "Upserted document chunks",
-        extra={"url": url, "chunk_count": len(chunks), "tag_count": len(tags)},
+        extra={
+            "url": url,
+            "chunk_count": len(rows["chunks"]),
+            "tag_count": len(rows["tags"]),
+        },
     )
 
 
@@ -356,33 +1049,27 @@ def process_sqs_record(record: dict[str, Any]) -> None:
     # Read .metadata.json to find the entrypoint file
     metadata_key = f"{folder_path}/.metadata.json"
     metadata = json.loads(
-        s3_client.get_object(Bucket=bucket, Key=metadata_key)["Body"].read()
+        get_s3_client().get_object(Bucket=bucket, Key=metadata_key)["Body"].read()
     )
-    entrypoint = metadata["entrypoint"]
     document_title = metadata.get("title")
-    if entrypoint.endswith(".html"):
-        content_type = "text/html"
-    elif entrypoint.endswith(".pdf"):
-        content_type = "application/pdf"
-    else:
-        content_type = "text/plain"
 
-    # Read the document content
-    doc_key = f"{folder_path}/{entrypoint}"
-    raw_content = s3_client.get_object(Bucket=bucket, Key=doc_key)["Body"].read()
-
-    # Extract, chunk, embed, store
-    text = extract_text(raw_content, content_type)
-    chunks = chunk_text(text)
+    # Extract (or reuse cached text), chunk, embed, store
+    text = load_document_text(bucket, folder_path, metadata)
+    with timed_stage("Chunking"):
+        chunks = chunk_text(text)
+    metrics.add_metric(name="ChunksProduced", unit=MetricUnit.Count, value=len(chunks))
     logger.info(
         "Chunked document", extra={"url": document_url, "chunk_count": len(chunks)}
     )
 
-    with sync_vector_db() as conn:
-        upsert_document(conn, document_url, chunks, title=document_title)
+    if INDEX_CHANGE_LOG:
+        log_document(document_url, chunks, title=document_title)
+    else:
+        with sync_vector_db(document_url) as conn:
+            upsert_document(conn, document_url, chunks, title=document_title)
 
     # Publish "Document indexed" event
-    eventbridge_client.put_events(
+    get_eventbridge_client().put_events(
         Entries=[
             {
                 "Source": "just-my-links.index-documents",
@@ -398,6 +1085,101 @@ def process_sqs_record(record: dict[str, Any]) -> None:
     metrics.add_metric(name="DocumentsIndexed", unit=MetricUnit.Count, value=1)
 
 
+# ---------------------------------------------------------------------------
+# On-demand profiling
+# ---------------------------------------------------------------------------
+
+# "always" profiles every invocation. SQS batches and scheduled events carry
+# no request to opt in from, so the HTTP services' "query" mode profiles
+# nothing here. Reports go to PROFILE_OUTPUT (a local dir or s3://bucket/prefix)
+PROFILE_INVOCATIONS = os.getenv("PROFILE_INVOCATIONS", "").lower()
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "/tmp/profiles")
+PROFILE_TOP_N = 40
+
+
+def profile_on_demand(handler):
+    """Run the handler under cProfile + tracemalloc when profiling is requested."""
+
+    @wraps(handler)
+    def wrapper(event: dict[str, Any], context: LambdaContext) -> dict[str, Any]:
+        if PROFILE_INVOCATIONS != "always":
+            return handler(event, context)
+
+        import cProfile
+        import tracemalloc
+
+        profiler = cProfile.Profile()
+        tracemalloc.start(10)
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(handler, event, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            try:
+                _write_profile(
+                    profiler, snapshot, peak_bytes, duration_ms, context.aws_request_id
+                )
+            except Exception:
+                logger.exception("Failed to write invocation profile")
+
+    return wrapper
+
+
+def _write_profile(
+    profiler: Any,
+    snapshot: Any,
+    peak_bytes: int,
+    duration_ms: float,
+    request_id: str,
+) -> None:
+    """Write `<request_id>.prof` (pstats) and `<request_id>.txt` (summary)."""
+    import pstats
+    import tempfile
+
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_text)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    allocations = "\n".join(
+        str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+    )
+    report = (
+        f"Duration: {duration_ms:.1f} ms\n"
+        f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MiB\n\n"
+        f"Top allocations by line:\n{allocations}\n\n"
+        f"{stats_text.getvalue()}"
+    )
+    with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+        profiler.dump_stats(f.name)
+        profile_bytes = Path(f.name).read_bytes()
+
+    if PROFILE_OUTPUT.startswith("s3://"):
+        bucket, _, prefix = PROFILE_OUTPUT.removeprefix("s3://").partition("/")
+        location = f"s3://{bucket}/{prefix.rstrip('/')}/{request_id}"
+        for suffix, body in ((".prof", profile_bytes), (".txt", report.encode())):
+            get_s3_client().put_object(
+                Bucket=bucket,
+                Key=f"{prefix.rstrip('/')}/{request_id}{suffix}".lstrip("/"),
+                Body=body,
+            )
+    else:
+        os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+        location = os.path.join(PROFILE_OUTPUT, request_id)
+        Path(f"{location}.prof").write_bytes(profile_bytes)
+        Path(f"{location}.txt").write_text(report)
+
+    logger.info(
+        "Wrote invocation profile",
+        extra={
+            "location": location,
+            "duration_ms": duration_ms,
+            "peak_traced_bytes": peak_bytes,
+        },
+    )
+
+
 # ---------------------------------------------------------------------------
 # Lambda handler
 # ---------------------------------------------------------------------------
@@ -406,7 +1188,13 @@ def process_sqs_record(record: dict[str, Any]) -> None:
 @logger.inject_lambda_context()
 @tracer.capture_lambda_handler
 @metrics.log_metrics
+@profile_on_demand
 def lambda_handler(event: dict[str, Any], context: LambdaContext) -> dict[str, Any]:
+    # Scheduled compaction (EventBridge rule input {"compact": true})
+    if event.get("compact") is True:
+        folded = compact_change_log()
+        return {"statusCode": 200, "body": json.dumps({"folded_count": folded})}
+
     records = event.get("Records", [])
     logger.info(
         "Lambda handler invoked",
@@ -55,10 +55,24 @@ def app_module(monkeypatch, tmp_path):
     with patch("boto3.client", side_effect=client_factory):
         import app as m
 
-    m.get_application_bucket.cache_clear()
-    m.get_event_bus_name.cache_clear()
-    monkeypatch.setattr(m, "VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
-    return m
+        m.get_application_bucket.cache_clear()
+        m.get_event_bus_name.cache_clear()
+        monkeypatch.setattr(m, "VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
+        yield m
+
+
+def test_import_defers_aws_clients(monkeypatch):
+    """Cold starts shouldn't pay for boto3 clients until they're needed."""
+    monkeypatch.setenv("APPLICATION_BUCKET", "test-bucket")
+    sys.modules.pop("app", None)
+
+    with patch("boto3.client") as mock_client:
+        import app as m
+
+        mock_client.assert_not_called()
+        m.get_s3_client()
+        m.get_s3_client()
+        mock_client.assert_called_once_with("s3")
 
 
 # ---------------------------------------------------------------------------
@@ -147,6 +161,229 @@ def test_chunk_text_empty_string_returns_one_chunk(app_module):
     assert len(chunks) == 1
 
 
+# ---------------------------------------------------------------------------
+# process_sqs_record
+# ---------------------------------------------------------------------------
+
+
+def _fake_s3_objects(app_module, objects: dict[str, bytes]) -> None:
+    """Back the mocked S3 client's object calls with an in-memory dict."""
+    import hashlib
+    import io
+
+    from botocore.exceptions import ClientError
+
+    def missing(key):
+        return ClientError({"Error": {"Code": "NoSuchKey", "Key": key}}, "GetObject")
+
+    def get_object(Bucket, Key):
+        if Key not in objects:
+            raise missing(Key)
+        return {"Body": io.BytesIO(objects[Key])}
+
+    def head_object(Bucket, Key):
+        if Key not in objects:
+            raise missing(Key)
+        return {
+            "ETag": f'"{hashlib.md5(objects[Key]).hexdigest()}"',
+            "ContentLength": len(objects[Key]),
+        }
+
+    def put_object(Bucket, Key, Body, **kwargs):
+        objects[Key] = Body
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.side_effect = get_object
+    s3.head_object.side_effect = head_object
+    s3.put_object.side_effect = put_object
+
+
+def _capture_upserts(app_module, monkeypatch) -> dict[str, list[str]]:
+    upserted: dict[str, list[str]] = {}
+
+    def fake_upsert(conn, url, chunks, title=None):
+        upserted[url] = chunks
+
+    monkeypatch.setattr(app_module, "upsert_document", fake_upsert)
+    return upserted
+
+
+def test_process_sqs_record_gunzips_compressed_entrypoint(app_module, monkeypatch):
+    import gzip
+
+    html = "<html><body><p>" + "Compressed at rest. " * 20 + "</p></body></html>"
+    _fake_s3_objects(
+        app_module,
+        {
+            "docs/abc/.metadata.json": json.dumps(
+                {"entrypoint": "document.html", "entrypointEncoding": "gzip"}
+            ).encode("utf-8"),
+            "docs/abc/document.html": gzip.compress(html.encode("utf-8")),
+        },
+    )
+    upserted = _capture_upserts(app_module, monkeypatch)
+
+    app_module.process_sqs_record(make_sqs_record("docs/abc", "https://example.com/gz"))
+
+    assert "Compressed at rest." in upserted["https://example.com/gz"][0]
+
+
+def test_process_sqs_record_reuses_extracted_text_sidecar(app_module, monkeypatch):
+    html = "<html><body><p>" + "Parse me only once please. " * 10 + "</p></body></html>"
+    objects = {
+        "docs/abc/.metadata.json": json.dumps({"entrypoint": "document.html"}).encode(
+            "utf-8"
+        ),
+        "docs/abc/document.html": html.encode("utf-8"),
+    }
+    _fake_s3_objects(app_module, objects)
+    upserted = _capture_upserts(app_module, monkeypatch)
+    record = make_sqs_record("docs/abc", "https://example.com/once")
+
+    app_module.process_sqs_record(record)
+    first_chunks = upserted["https://example.com/once"]
+    sidecars = [k for k in objects if k.startswith("docs/abc/extracted-")]
+    assert len(sidecars) == 1
+    assert sidecars[0].endswith(f"-v{app_module.EXTRACTOR_VERSION}.txt")
+
+    def fail_extract(content, content_type):
+        raise AssertionError("extract_text should not run when a sidecar exists")
+
+    monkeypatch.setattr(app_module, "extract_text", fail_extract)
+    app_module.process_sqs_record(record)
+    assert upserted["https://example.com/once"] == first_chunks
+
+    # New content means a new ETag, so the stale sidecar is ignored
+    objects["docs/abc/document.html"] = b"<p>changed</p>"
+    with pytest.raises(AssertionError, match="should not run"):
+        app_module.process_sqs_record(record)
+
+
+def test_process_sqs_record_emits_stage_metrics(app_module, monkeypatch):
+    from botocore.exceptions import ClientError
+
+    html = "<html><body><p>" + "Time every stage of me. " * 10 + "</p></body></html>"
+    _fake_s3_objects(
+        app_module,
+        {
+            "docs/abc/.metadata.json": json.dumps(
+                {"entrypoint": "document.html"}
+            ).encode("utf-8"),
+            "docs/abc/document.html": html.encode("utf-8"),
+        },
+    )
+    app_module.get_s3_client().download_file.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    monkeypatch.setattr(app_module, "embed_text", lambda text: [0.0] * 1024)
+    app_module.metrics.clear_metrics()
+
+    app_module.process_sqs_record(make_sqs_record("docs/abc", "https://example.com/t"))
+
+    metric_set = app_module.metrics.metric_set
+    for stage in (
+        "ExtractedTextLookup",
+        "DocumentFetch",
+        "TextExtraction",
+        "ExtractedTextUpload",
+        "Chunking",
+        "IndexDownload",
+        "Embedding",
+        "IndexWrite",
+        "IndexUpload",
+    ):
+        assert metric_set[f"{stage}Duration"]["Unit"] == "Milliseconds"
+    assert metric_set["DocumentBytes"]["Value"] == [len(html)]
+    assert metric_set["ChunksProduced"]["Value"] == [1]
+    assert metric_set["BedrockCalls"]["Value"] == [1]
+    assert metric_set["IndexSizeBytes"]["Value"][0] > 0
+    app_module.metrics.clear_metrics()
+
+
+def test_sharded_index_syncs_only_the_documents_shard(app_module, monkeypatch):
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setattr(app_module, "INDEX_SHARDS", 4)
+    shards = {app_module._shard_for(f"https://example.com/{i}") for i in range(40)}
+    assert shards == {0, 1, 2, 3}
+
+    url = "https://example.com/sharded"
+    shard = app_module._shard_for(url)
+    assert app_module._shard_for(url) == shard
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.download_file.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    with app_module.sync_vector_db(url) as conn:
+        conn.execute(
+            "INSERT INTO chunks (url, chunk_index, chunk_text) VALUES (?, 0, 'x')",
+            (url,),
+        )
+
+    key = f"vector-index/shards-4/{shard:03d}.db"
+    local_path = app_module._shard_path(shard)
+    assert local_path != app_module.VECTOR_DB_LOCAL_PATH
+    s3.download_file.assert_called_once_with("test-bucket", key, local_path)
+    s3.upload_file.assert_any_call(
+        f"{local_path}.gz",
+        "test-bucket",
+        f"{key}.gz",
+        ExtraArgs={"Metadata": {"log-sequence": "0", "index-format": "gzip-1"}},
+    )
+    s3.upload_file.assert_any_call(
+        local_path, "test-bucket", key, ExtraArgs={"Metadata": {"log-sequence": "0"}}
+    )
+    s3.delete_object.assert_not_called()
+
+
+def test_failed_index_write_publishes_nothing(app_module):
+    from botocore.exceptions import ClientError
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.download_file.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    url = "https://example.com/failed"
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        with app_module.sync_vector_db(url) as conn:
+            conn.execute(
+                "INSERT INTO chunks (url, chunk_index, chunk_text) VALUES (?, 0, 'x')",
+                (url,),
+            )
+            raise RuntimeError("embedding failed")
+
+    s3.upload_file.assert_not_called()
+    s3.delete_objects.assert_not_called()
+
+
+def test_profiling_always_mode_writes_report(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", "always")
+    monkeypatch.setattr(app_module, "PROFILE_OUTPUT", str(tmp_path))
+    handler = app_module.profile_on_demand(
+        lambda event, context: app_module.chunk_text("Profile me. " * 50)
+    )
+
+    chunks = handler({"Records": []}, MagicMock(aws_request_id="req-1"))
+
+    assert chunks
+    assert (tmp_path / "req-1.prof").exists()
+    assert "chunk_text" in (tmp_path / "req-1.txt").read_text()
+
+    # Nothing in an SQS batch can opt in to the HTTP services' query mode
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", "query")
+    handler({"Records": []}, MagicMock(aws_request_id="req-2"))
+    assert not (tmp_path / "req-2.prof").exists()
+
+
+def test_normalize_extracted_text_preserves_chunking(app_module):
+    para = "A paragraph that is comfortably above the minimum chunk length. " * 2
+    raw = f"\n\n\n\n{para}\n\n\n\n\n{para}\n\n\n"
+    normalized = app_module.normalize_extracted_text(raw)
+    assert "\n\n\n" not in normalized
+    assert app_module.chunk_text(normalized) == app_module.chunk_text(raw)
+
+
 # ---------------------------------------------------------------------------
 # upsert_document (using a real in-memory sqlite-vec DB)
 # ---------------------------------------------------------------------------
@@ -418,3 +655,257 @@ def test_upsert_replaces_tags_on_reindex(app_module, tmp_path, monkeypatch):
     ]
     assert tags == ["new"]  # "old" tag should be gone
     conn.close()
+
+
+def test_upsert_maintains_one_centroid_per_document(app_module, tmp_path, monkeypatch):
+    import math
+    import struct
+
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr("app.VECTOR_DB_LOCAL_PATH", db_path)
+    monkeypatch.setattr("app.embed_text", lambda text: _make_fake_embedding(len(text)))
+
+    conn = _open_test_db(db_path, app_module)
+    app_module.upsert_document(conn, "https://example.com/a", ["a", "bb", "ccc"])
+    app_module.upsert_document(conn, "https://example.com/a", ["a", "bb"])
+    conn.commit()
+
+    rows = conn.execute("SELECT url, embedding FROM vec_documents").fetchall()
+    assert [url for url, _ in rows] == ["https://example.com/a"]
+    centroid = struct.unpack("1024f", rows[0][1])
+    expected = app_module._centroid([_make_fake_embedding(1), _make_fake_embedding(2)])
+    assert math.isclose(math.sqrt(sum(x * x for x in centroid)), 1.0, rel_tol=1e-5)
+    assert all(math.isclose(a, b, abs_tol=1e-5) for a, b in zip(centroid, expected))
+    conn.close()
+
+
+def test_init_schema_backfills_centroids_for_existing_index(
+    app_module, tmp_path, monkeypatch
+):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr("app.VECTOR_DB_LOCAL_PATH", db_path)
+    monkeypatch.setattr("app.embed_text", lambda text: _make_fake_embedding(len(text)))
+
+    conn = _open_test_db(db_path, app_module)
+    app_module.upsert_document(conn, "https://example.com/a", ["a", "bb"])
+    app_module.upsert_document(conn, "https://example.com/b", ["ccc"])
+    conn.execute("DROP TABLE vec_documents")  # an index from before centroids
+    conn.commit()
+
+    app_module._init_schema(conn)
+
+    urls = sorted(url for (url,) in conn.execute("SELECT url FROM vec_documents"))
+    assert urls == ["https://example.com/a", "https://example.com/b"]
+    conn.close()
+
+
+def test_short_vectors_follow_chunks_and_are_backfilled(
+    app_module, tmp_path, monkeypatch
+):
+    import math
+    import struct
+
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr("app.VECTOR_DB_LOCAL_PATH", db_path)
+    monkeypatch.setattr("app.embed_text", lambda text: _make_fake_embedding(len(text)))
+
+    conn = _open_test_db(db_path, app_module)
+    app_module.upsert_document(conn, "https://example.com/a", ["a", "bb", "ccc"])
+    app_module.upsert_document(conn, "https://example.com/a", ["a", "bb"])
+    conn.commit()
+
+    chunk_ids = [i for (i,) in conn.execute("SELECT id FROM chunks ORDER BY id")]
+    short = conn.execute(
+        "SELECT chunk_id, embedding FROM vec_chunks_short ORDER BY chunk_id"
+    ).fetchall()
+    assert [chunk_id for chunk_id, _ in short] == chunk_ids
+    vector = struct.unpack("256f", short[0][1])
+    expected = app_module._short_vector(_make_fake_embedding(1))
+    assert math.isclose(math.sqrt(sum(x * x for x in vector)), 1.0, rel_tol=1e-5)
+    assert all(math.isclose(a, b, abs_tol=1e-5) for a, b in zip(vector, expected))
+
+    conn.execute("DROP TABLE vec_chunks_short")  # an index from before short vectors
+    conn.commit()
+    app_module._init_schema(conn)
+
+    backfilled = [
+        i for (i,) in conn.execute("SELECT chunk_id FROM vec_chunks_short ORDER BY 1")
+    ]
+    assert backfilled == chunk_ids
+    conn.close()
+
+
+def test_index_round_trips_through_compressed_copy(app_module, tmp_path, monkeypatch):
+    import gzip
+    import io
+
+    from botocore.exceptions import ClientError
+    from botocore.response import StreamingBody
+
+    monkeypatch.setattr("app.VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
+    objects: dict[str, tuple[bytes, dict]] = {}
+
+    def upload_file(path, bucket, key, ExtraArgs=None):
+        with open(path, "rb") as f:
+            objects[key] = (f.read(), (ExtraArgs or {}).get("Metadata", {}))
+
+    def get_object(Bucket, Key):
+        if Key not in objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        data, metadata = objects[Key]
+        body = StreamingBody(io.BytesIO(data), len(data))
+        return {"Body": body, "Metadata": metadata}
+
+    def download_file(bucket, key, path):
+        if key not in objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        with open(path, "wb") as f:
+            f.write(objects[key][0])
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.upload_file.side_effect = upload_file
+    s3.get_object.side_effect = get_object
+    s3.download_file.side_effect = download_file
+    s3.delete_object.side_effect = lambda Bucket, Key: objects.pop(Key, None)
+
+    def count_chunks(url: str) -> int:
+        with app_module.sync_vector_db(url) as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()
+            conn.execute(
+                "INSERT INTO chunks (url, chunk_index, chunk_text) VALUES (?, 0, 'x')",
+                (url,),
+            )
+        return count
+
+    assert count_chunks("https://example.com/a") == 0
+    raw, _ = objects["vector-index/index.db"]
+    compressed, metadata = objects["vector-index/index.db.gz"]
+    assert metadata == {"index-format": "gzip-1", "log-sequence": "0"}
+    assert gzip.decompress(compressed) == raw
+    assert len(compressed) < len(raw)
+
+    # Only the compressed copy is needed to read the index back
+    del objects["vector-index/index.db"]
+    assert count_chunks("https://example.com/b") == 1
+
+    # A compressed copy in a format this code does not know is skipped
+    objects["vector-index/index.db.gz"] = (b"zstd?", {"index-format": "zstd-1"})
+    assert count_chunks("https://example.com/c") == 2
+
+    # Publishing gzip only keeps the last raw copy for older readers...
+    monkeypatch.setattr("app.INDEX_PUBLISH_FORMATS", frozenset({"gzip"}))
+    assert count_chunks("https://example.com/d") == 3
+    assert "vector-index/index.db" in objects
+    # ...until the operator opts in to removing it
+    monkeypatch.setattr("app.INDEX_DELETE_UNPUBLISHED_RAW", True)
+    assert count_chunks("https://example.com/e") == 4
+    assert "vector-index/index.db" not in objects
+
+    # A truncated stream fails instead of leaving a corrupt index behind
+    compressed, metadata = objects["vector-index/index.db.gz"]
+    objects["vector-index/index.db.gz"] = (compressed[: len(compressed) // 2], metadata)
+    with pytest.raises(EOFError):
+        count_chunks("https://example.com/f")
+
+
+def test_change_log_appends_records_and_compaction_folds_them(
+    app_module, tmp_path, monkeypatch
+):
+    import io
+
+    from botocore.exceptions import ClientError
+    from botocore.response import StreamingBody
+
+    monkeypatch.setattr("app.VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
+    monkeypatch.setattr("app.INDEX_CHANGE_LOG", True)
+    monkeypatch.setattr("app.embed_text", lambda text: _make_fake_embedding(len(text)))
+    objects: dict[str, tuple[bytes, dict]] = {}
+
+    def missing(key):
+        return ClientError({"Error": {"Code": "404", "Key": key}}, "HeadObject")
+
+    def upload_file(path, bucket, key, ExtraArgs=None):
+        with open(path, "rb") as f:
+            objects[key] = (f.read(), (ExtraArgs or {}).get("Metadata", {}))
+
+    def download_file(bucket, key, path):
+        if key not in objects:
+            raise missing(key)
+        with open(path, "wb") as f:
+            f.write(objects[key][0])
+
+    def get_object(Bucket, Key):
+        if Key not in objects:
+            raise missing(Key)
+        data, metadata = objects[Key]
+        body = StreamingBody(io.BytesIO(data), len(data))
+        return {"Body": body, "Metadata": metadata}
+
+    def head_object(Bucket, Key):
+        if Key not in objects:
+            raise missing(Key)
+        return {"Metadata": objects[Key][1]}
+
+    def put_object(Bucket, Key, Body, IfNoneMatch=None):
+        assert IfNoneMatch == "*" and Key not in objects
+        objects[Key] = (Body, {})
+
+    def paginate(Bucket, Prefix, StartAfter):
+        keys = sorted(k for k in objects if k.startswith(Prefix) and k > StartAfter)
+        return [{"Contents": [{"Key": k} for k in keys]}]
+
+    def delete_objects(Bucket, Delete):
+        for obj in Delete["Objects"]:
+            del objects[obj["Key"]]
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.upload_file.side_effect = upload_file
+    s3.download_file.side_effect = download_file
+    s3.get_object.side_effect = get_object
+    s3.head_object.side_effect = head_object
+    s3.put_object.side_effect = put_object
+    s3.get_paginator.return_value.paginate.side_effect = paginate
+    s3.delete_objects.side_effect = delete_objects
+
+    # The first document creates the snapshot the records are replayed onto
+    app_module.log_document("https://example.com/a", ["alpha"], title="A #x")
+    assert objects["vector-index/index.db.gz"][1]["log-sequence"] == "0"
+    app_module.log_document("https://example.com/b", ["bravo", "b2"], title="B")
+    app_module.log_document("https://example.com/a", ["alpha two"], title="A2 #y")
+    assert sorted(k for k in objects if k.startswith("vector-index/log/")) == [
+        "vector-index/log/000000000001.json.gz",
+        "vector-index/log/000000000002.json.gz",
+    ]
+
+    assert app_module.compact_change_log() == 2
+    assert not [k for k in objects if k.startswith("vector-index/log/")]
+    assert objects["vector-index/index.db.gz"][1]["log-sequence"] == "2"
+    assert app_module.compact_change_log() == 0
+
+    # Sequences carry on from the snapshot once the records are gone
+    assert (
+        app_module.append_change(
+            {"format": 1, "op": "delete", "url": "https://example.com/b"}
+        )
+        == 3
+    )
+    with app_module.sync_vector_db("https://example.com/a") as conn:
+        documents = conn.execute("SELECT url, title FROM documents").fetchall()
+        chunks = conn.execute("SELECT url, chunk_text FROM chunks").fetchall()
+        tags = conn.execute("SELECT tag FROM document_tags").fetchall()
+        (vectors,) = conn.execute("SELECT COUNT(*) FROM vec_chunks").fetchone()
+    assert documents == [("https://example.com/a", "a2 y")]
+    assert chunks == [("https://example.com/a", "alpha two")]
+    assert tags == [("y",)]
+    assert vectors == 1
+    assert objects["vector-index/index.db.gz"][1]["log-sequence"] == "3"
+    assert not [k for k in objects if k.startswith("vector-index/log/")]
+
+    # A record past the snapshot's position leaves a gap: refuse to write
+    objects["vector-index/log/000000000009.json.gz"] = (b"", {})
+    with pytest.raises(RuntimeError, match="snapshot position 3"):
+        app_module.append_change(
+            {"format": 1, "op": "delete", "url": "https://example.com/a"}
+        )
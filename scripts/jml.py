@@ -12,7 +12,8 @@ Configuration (API URL and bearer token) is fetched automatically from CloudForm
 
 Usage:
     ./scripts/jml.py save <url> [--title <title>] [--file <path>] [--env dev]
-    ./scripts/jml.py search <query> [--top 8] [--env dev]
+    ./scripts/jml.py search <query> [--top 8] [--explain] [--env dev]
+    ./scripts/jml.py similar <url> [--top 8] [--env dev]
 
 Examples:
     ./scripts/jml.py save https://example.com/article --title "My Article" --file page.html
@@ -22,6 +23,7 @@ Examples:
 """
 
 import argparse
+import gzip
 import mimetypes
 import os
 import sys
@@ -33,6 +35,8 @@ import requests
 DEFAULT_TOP_K = 8
 DEFAULT_ENV = "dev"
 DEFAULT_REGION = "us-east-1"
+# Files above this size are uploaded straight to S3 via pre-signed URLs
+DIRECT_UPLOAD_THRESHOLD = 5 * 1024 * 1024
 
 _CONTENT_TYPE_TO_FILENAME = {
     "text/html": "document.html",
@@ -98,13 +102,65 @@ def cmd_save(args: argparse.Namespace, api_url: str, token: str) -> int:
         params["title"] = args.title
 
     print(f"Saving {args.url!r}...", file=sys.stderr)
-    response = requests.put(
+    if len(content) > DIRECT_UPLOAD_THRESHOLD:
+        response = _save_direct(api_url, token, params, filename, content)
+        return _report_save(response)
+
+    # Build the multipart body ourselves so it can be gzipped; the storage
+    # service inflates Content-Encoding: gzip request bodies
+    request = requests.Request(
+        "PUT",
         f"{api_url}/document",
         params=params,
         files={"document": (filename, content, content_type)},
         headers={"Authorization": f"Bearer {token}"},
+    ).prepare()
+    request.prepare_body(gzip.compress(request.body), None)
+    request.headers["Content-Encoding"] = "gzip"
+    with requests.Session() as http:
+        response = http.send(request)
+    return _report_save(response)
+
+
+def _save_direct(
+    api_url: str, token: str, params: dict[str, str], filename: str, content: bytes
+) -> requests.Response:
+    """Upload straight to S3 with pre-signed URLs, then ask the API to publish."""
+    auth = {"Authorization": f"Bearer {token}"}
+    response = requests.post(
+        f"{api_url}/document/uploads",
+        params={**params, "filename": filename, "size": str(len(content))},
+        headers=auth,
     )
+    if response.status_code != 200:
+        return response
+    upload = response.json()
+
+    completion: dict = {"filename": filename}
+    if upload_url := upload.get("uploadUrl"):
+        requests.put(
+            upload_url, data=content, headers={"Content-Type": upload["contentType"]}
+        ).raise_for_status()
+    else:
+        part_size = upload["partSize"]
+        parts = []
+        for i, part_url in enumerate(upload["partUrls"]):
+            part = requests.put(
+                part_url, data=content[i * part_size : (i + 1) * part_size]
+            )
+            part.raise_for_status()
+            parts.append({"ETag": part.headers["ETag"], "PartNumber": i + 1})
+        completion.update(uploadId=upload["uploadId"], parts=parts)
+
+    return requests.post(
+        f"{api_url}/document/uploads/complete",
+        params=params,
+        json=completion,
+        headers=auth,
+    )
+
 
+def _report_save(response: requests.Response) -> int:
     if response.status_code == 200:
         data = response.json()
         print(data.get("message", "Saved."))
@@ -117,9 +173,12 @@ def cmd_save(args: argparse.Namespace, api_url: str, token: str) -> int:
 
 
 def cmd_search(args: argparse.Namespace, api_url: str, token: str) -> int:
+    params = {"q": args.query, "top": args.top}
+    if args.explain:
+        params["explain"] = "1"
     response = requests.get(
         f"{api_url}/search",
-        params={"q": args.query, "top": args.top},
+        params=params,
         headers={"Authorization": f"Bearer {token}"},
     )
 
@@ -128,6 +187,8 @@ def cmd_search(args: argparse.Namespace, api_url: str, token: str) -> int:
         return 1
 
     data = response.json()
+    if args.explain:
+        _print_explain(response, data.get("explain", {}))
     sections = data.get("sections", {})
 
     if not sections:
@@ -161,6 +222,51 @@ def cmd_search(args: argparse.Namespace, api_url: str, token: str) -> int:
     return 0
 
 
+def cmd_similar(args: argparse.Namespace, api_url: str, token: str) -> int:
+    response = requests.get(
+        f"{api_url}/similar",
+        params={"url": args.url, "top": args.top},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    if response.status_code == 404:
+        print(f"Not indexed: {args.url}", file=sys.stderr)
+        return 1
+    if response.status_code != 200:
+        print(f"Error {response.status_code}: {response.text}", file=sys.stderr)
+        return 1
+
+    results = response.json().get("results", [])
+    if not results:
+        print("No related documents found.")
+        return 0
+
+    print(f"\nRelated to: {args.url}\n")
+    for i, item in enumerate(results, 1):
+        url = item["url"]
+        title = item.get("title")
+        if title and title != url:
+            print(f"  {i}. {title}")
+            print(f"     {url}")
+        else:
+            print(f"  {i}. {url}")
+    print()
+    return 0
+
+
+def _print_explain(response: requests.Response, explain: dict) -> None:
+    """Show where the time went, client round trip vs. server stages."""
+    print(
+        f"Round trip: {response.elapsed.total_seconds() * 1000:.0f}ms", file=sys.stderr
+    )
+    print(f"Server-Timing: {response.headers.get('Server-Timing')}", file=sys.stderr)
+    print(f"Index: {explain.get('index')}", file=sys.stderr)
+    print(f"Candidates: {explain.get('candidates')}", file=sys.stderr)
+    for name, plan in explain.get("query_plans", {}).items():
+        for step in plan:
+            print(f"  {name}: {step}", file=sys.stderr)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Just My Links CLI — save and search documents",
@@ -194,6 +300,22 @@ def main() -> None:
         default=DEFAULT_TOP_K,
         help=f"Number of results (default: {DEFAULT_TOP_K})",
     )
+    search_parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print server stage timings, candidate counts and query plans",
+    )
+
+    similar_parser = subparsers.add_parser(
+        "similar", help="List saved documents related to a saved URL"
+    )
+    similar_parser.add_argument("url", help="URL of an already saved document")
+    similar_parser.add_argument(
+        "--top",
+        type=int,
+        default=DEFAULT_TOP_K,
+        help=f"Number of results (default: {DEFAULT_TOP_K})",
+    )
 
     args = parser.parse_args()
 
@@ -204,6 +326,8 @@ def main() -> None:
         sys.exit(cmd_save(args, api_url, token))
     elif args.command == "search":
         sys.exit(cmd_search(args, api_url, token))
+    elif args.command == "similar":
+        sys.exit(cmd_similar(args, api_url, token))
 
 
 if __name__ == "__main__":
@@ -6,7 +6,8 @@ Two context managers:
     db_connection(script_path)
         Downloads the DB from S3 (or reads from SQLITE_DB_PATH env var for
         local dev), creates a .bak backup, yields an open sqlite3 connection,
-        and uploads the modified DB back to S3 on clean exit.  On error,
+        and uploads the modified DB (raw and gzip copies) back to S3 on clean
+        exit.  On error,
         restores from .bak so S3 is never left in a corrupt state.
 
     if_not_applied(conn, script_path)
@@ -22,6 +23,7 @@ Typical migration script usage:
                 conn.execute("ALTER TABLE ...")
 """
 
+import gzip
 import os
 import shutil
 import sqlite3
@@ -31,6 +33,8 @@ from pathlib import Path
 from typing import Generator
 
 VECTOR_DB_S3_KEY = "vector-index/index.db"
+# Must match COMPRESSED_INDEX_FORMAT in the index and search services
+COMPRESSED_INDEX_FORMAT = "gzip-1"
 _DEFAULT_LOCAL_PATH = "/tmp/migration-index.db"
 
 
@@ -48,6 +52,73 @@ def _open_db(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+def _download(s3, bucket: str, db_path: str) -> None:
+    """Fetch the DB, preferring the gzip copy the services publish."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=f"{VECTOR_DB_S3_KEY}.gz")
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+            raise
+    else:
+        if response["Metadata"].get("index-format") == COMPRESSED_INDEX_FORMAT:
+            print(
+                f"Downloading s3://{bucket}/{VECTOR_DB_S3_KEY}.gz → {db_path}",
+                file=sys.stderr,
+            )
+            with gzip.GzipFile(fileobj=response["Body"]) as src:
+                with open(db_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            return
+        response["Body"].close()
+    print(
+        f"Downloading s3://{bucket}/{VECTOR_DB_S3_KEY} → {db_path}",
+        file=sys.stderr,
+    )
+    s3.download_file(bucket, VECTOR_DB_S3_KEY, db_path)
+
+
+def _log_sequence(db_path: str) -> str:
+    """Change-log position stored in the DB, for the snapshot's metadata."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT sequence FROM change_log_position").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # created by an indexer that predates the change log
+    finally:
+        conn.close()
+    return str(row[0] if row else 0)
+
+
+def _upload(s3, bucket: str, db_path: str) -> None:
+    """Upload the DB and its gzip copy, so neither is left stale.
+
+    Both keep the indexer's `log-sequence` metadata, which numbers new
+    change-log records.
+    """
+    metadata = {"log-sequence": _log_sequence(db_path)}
+    gz_path = db_path + ".gz"
+    with open(db_path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=1) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    try:
+        print(
+            f"Uploading {db_path} → s3://{bucket}/{VECTOR_DB_S3_KEY}(.gz)",
+            file=sys.stderr,
+        )
+        s3.upload_file(
+            gz_path,
+            bucket,
+            f"{VECTOR_DB_S3_KEY}.gz",
+            ExtraArgs={
+                "Metadata": {**metadata, "index-format": COMPRESSED_INDEX_FORMAT}
+            },
+        )
+        s3.upload_file(
+            db_path, bucket, VECTOR_DB_S3_KEY, ExtraArgs={"Metadata": metadata}
+        )
+    finally:
+        os.remove(gz_path)
+
+
 @contextmanager
 def db_connection() -> Generator[sqlite3.Connection, None, None]:
     """
@@ -80,11 +151,7 @@ def db_connection() -> Generator[sqlite3.Connection, None, None]:
         db_path = _DEFAULT_LOCAL_PATH
 
         try:
-            print(
-                f"Downloading s3://{bucket}/{VECTOR_DB_S3_KEY} → {db_path}",
-                file=sys.stderr,
-            )
-            s3.download_file(bucket, VECTOR_DB_S3_KEY, db_path)
+            _download(s3, bucket, db_path)
         except s3.exceptions.ClientError as e:  # type: ignore[union-attr]
             if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
                 print("No existing DB in S3 — starting fresh.", file=sys.stderr)
@@ -117,11 +184,7 @@ def db_connection() -> Generator[sqlite3.Connection, None, None]:
                 print("Restored DB from backup due to error.", file=sys.stderr)
         else:
             if use_s3:
-                print(
-                    f"Uploading {db_path} → s3://{bucket}/{VECTOR_DB_S3_KEY}",
-                    file=sys.stderr,
-                )
-                s3.upload_file(db_path, bucket, VECTOR_DB_S3_KEY)  # type: ignore[union-attr]
+                _upload(s3, bucket, db_path)
         if os.path.exists(bak_path):
             os.remove(bak_path)
 
@@ -1,19 +1,29 @@
+import base64
+import gzip
+import hashlib
+import itertools
 import json
+import math
 import os
 import secrets
 import struct
+import tempfile
+import threading
 import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 
 try:
     import pysqlite3 as sqlite3  # Lambda's built-in sqlite3 disables enable_load_extension  # pyright: ignore[reportMissingImports]
 except ImportError:
     import sqlite3  # type: ignore[no-redef]
-from functools import cache
-from typing import Any, Dict
+from functools import cache, wraps
+from typing import Any, Callable, Dict, Generator, Iterable
 
-import boto3
-import sqlite_vec
 from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.event_handler import (
     APIGatewayHttpResolver,
@@ -23,6 +33,7 @@ from aws_lambda_powertools.event_handler import (
 from aws_lambda_powertools.event_handler.middlewares import NextMiddleware
 from aws_lambda_powertools.logging import correlation_paths
 from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEventV2
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 logger = Logger(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -30,15 +41,76 @@ tracer = Tracer()
 metrics = Metrics(namespace="just-my-links")
 app = APIGatewayHttpResolver()
 
-ssm_client = boto3.client("ssm")
-s3_client = boto3.client("s3")
-bedrock_client = boto3.client("bedrock-runtime")
-
 VECTOR_DB_S3_KEY = "vector-index/index.db"
 VECTOR_DB_LOCAL_PATH = "/tmp/index.db"
+# Documents are spread over this many index files by URL hash; must match the
+# indexer's.  Shards are downloaded and searched in parallel, and 1 keeps the
+# single VECTOR_DB_S3_KEY
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", "1"))
+# The indexer also publishes each index file gzip-compressed as "<key>.gz";
+# it is preferred when its index-format metadata is one this code can decode
+COMPRESSED_INDEX_FORMAT = "gzip-1"
+TRANSFER_CHUNK_BYTES = 1024 * 1024
 BEDROCK_MODEL_ID = "amazon.titan-embed-text-v2:0"
 EMBEDDING_DIMENSIONS = 1024
+SHORT_EMBEDDING_DIMENSIONS = 256  # must match the indexer's vec_chunks_short
 INDEX_CACHE_TTL_SECONDS = 300  # refresh index from S3 every 5 minutes
+# Past the TTL, keep serving the local index while a background refresh runs,
+# until it is this old; only then do requests block on the download
+INDEX_MAX_STALENESS_SECONDS = int(
+    os.getenv("INDEX_MAX_STALENESS_SECONDS", str(INDEX_CACHE_TTL_SECONDS))
+)
+# Apply the indexer's per-document change records (INDEX_CHANGE_LOG) on top of
+# the downloaded snapshot, listing S3 for new ones at most every
+# INDEX_CHANGE_LOG_POLL_SECONDS; must match the indexer's.  Ignored in
+# "remote" mode, which has no local file to write to
+INDEX_CHANGE_LOG = os.getenv("INDEX_CHANGE_LOG", "").lower() in ("1", "true")
+INDEX_CHANGE_LOG_POLL_SECONDS = float(os.getenv("INDEX_CHANGE_LOG_POLL_SECONDS", "5"))
+CHANGE_LOG_FORMAT = 1
+# Start downloading/opening the index while the Lambda is still initialising
+INDEX_PRIME_ON_INIT = os.getenv("INDEX_PRIME_ON_INIT", "").lower() in ("1", "true")
+# Search results kept per container, keyed by parsed query, top_k and index
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+# Tag-scoped vector search: when at least this share of chunks carries the
+# tags, widen a global KNN and drop untagged rows; below it, push the tagged
+# chunk ids into the vec0 scan instead
+TAG_POSTFILTER_MIN_SELECTIVITY = float(
+    os.getenv("TAG_POSTFILTER_MIN_SELECTIVITY", "0.5")
+)
+MAX_KNN_K = 4096  # sqlite-vec's upper bound on k
+# Plain queries shortlist this many documents per requested result by centroid
+# (vec_documents), then rank only those documents' chunks; 0 scores every chunk
+CENTROID_CANDIDATES_PER_RESULT = int(os.getenv("CENTROID_CANDIDATES_PER_RESULT", "4"))
+# When set, chunks are first ranked on their truncated vectors
+# (vec_chunks_short) and this many candidates per requested result are
+# re-ranked on the full embeddings; 0 scans the full vectors directly
+SHORT_VECTOR_CANDIDATES_PER_RESULT = int(
+    os.getenv("SHORT_VECTOR_CANDIDATES_PER_RESULT", "0")
+)
+# How a downloaded index is opened: "mmap" reads it read-only and immutable
+# (the file is only ever replaced, never written in place) through a memory
+# map and a large page cache; "memory" copies it into an in-memory database
+# once per index version; "file" uses SQLite's defaults; "remote" downloads
+# nothing and reads pages from S3 with ranged GETs as queries touch them
+INDEX_SERVING_MODES = ("mmap", "memory", "file", "remote")
+INDEX_SERVING_MODE = os.getenv("INDEX_SERVING_MODE", "mmap")
+if INDEX_SERVING_MODE not in INDEX_SERVING_MODES:
+    raise ValueError(f"INDEX_SERVING_MODE must be one of {INDEX_SERVING_MODES}")
+INDEX_MMAP_SIZE = int(os.getenv("INDEX_MMAP_SIZE", str(4 * 1024**3)))
+INDEX_CACHE_SIZE_KIB = int(os.getenv("INDEX_CACHE_SIZE_KIB", str(64 * 1024)))
+# "remote" mode reads the raw index key (keep "raw" in the indexer's
+# INDEX_PUBLISH_FORMATS) in blocks of this many bytes, and keeps up to
+# INDEX_REMOTE_CACHE_BYTES of them per container across index reopens
+INDEX_REMOTE_BLOCK_BYTES = int(os.getenv("INDEX_REMOTE_BLOCK_BYTES", str(256 * 1024)))
+INDEX_REMOTE_CACHE_BYTES = int(
+    os.getenv("INDEX_REMOTE_CACHE_BYTES", str(256 * 1024**2))
+)
+# Sequential reads (vec0 vector blobs, table scans) fetch a doubling run of
+# blocks ahead, up to this many bytes per GET
+INDEX_REMOTE_READAHEAD_BYTES = int(
+    os.getenv("INDEX_REMOTE_READAHEAD_BYTES", str(8 * 1024**2))
+)
+REMOTE_VFS_NAME = "s3-range"
 
 # ---------------------------------------------------------------------------
 # Title normalisation
@@ -59,6 +131,62 @@ def normalize_title(text: str) -> str:
 
 
 _index_last_downloaded: float = 0.0
+# One connection per shard and container, reopened only when a new index is
+# downloaded.  The lock serialises download/open between requests and the
+# priming and refresh threads.  The list is replaced, never mutated, so a
+# request keeps a consistent snapshot after releasing the lock.
+_shards: list[sqlite3.Connection] = []
+# Connections swapped out while a request may still be querying them; the
+# next `_get_shards` closes them
+_retired_shards: list[sqlite3.Connection] = []
+# Shards present in S3 at the last download; the indexer writes a shard only
+# once a document hashes to it
+_available_shards: list[int] = list(range(INDEX_SHARDS))
+# "remote" mode: the S3 object version each shard connection reads
+_remote_shards: "dict[int, RemoteIndexObject]" = {}
+_db_lock = threading.Lock()
+_refresh_thread: threading.Thread | None = None
+_change_log_checked: float = 0.0
+# Bumped whenever a new index is opened; part of every search cache key
+_index_generation = 0
+_search_cache: "OrderedDict[tuple, dict[str, list]]" = OrderedDict()
+
+
+@dataclass
+class ServerTiming:
+    """Named durations for one request, rendered as a Server-Timing header."""
+
+    durations_ms: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def measure(self, name: str) -> Generator[None, None, None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.durations_ms[name] = self.durations_ms.get(name, 0.0) + elapsed_ms
+
+    def header(self) -> str:
+        return ", ".join(
+            f"{name};dur={ms:.2f}" for name, ms in self.durations_ms.items()
+        )
+
+
+@dataclass(frozen=True)
+class RemoteIndexObject:
+    """One version of an index file in S3, pinned by its ETag."""
+
+    bucket: str
+    key: str
+    etag: str
+    size: int
+
+    @property
+    def name(self) -> str:
+        """File name SQLite sees; a new version is a different file."""
+        etag = self.etag.strip('"')
+        return f"{self.key}@{etag}"
 
 
 # ---------------------------------------------------------------------------
@@ -73,11 +201,33 @@ def get_application_bucket() -> str:
     return v
 
 
+# AWS clients are built on first use so boto3 stays out of the cold start
+@cache
+def get_ssm_client() -> Any:
+    import boto3
+
+    return boto3.client("ssm")
+
+
+@cache
+def get_s3_client() -> Any:
+    import boto3
+
+    return boto3.client("s3")
+
+
+@cache
+def get_bedrock_client() -> Any:
+    import boto3
+
+    return boto3.client("bedrock-runtime")
+
+
 @cache
 def get_bearer_token() -> str:
     param_name = os.getenv("BEARER_TOKEN_PARAM_NAME")
     assert param_name, "BEARER_TOKEN_PARAM_NAME environment variable not set"
-    response = ssm_client.get_parameter(Name=param_name, WithDecryption=True)
+    response = get_ssm_client().get_parameter(Name=param_name, WithDecryption=True)
     return response["Parameter"]["Value"]
 
 
@@ -95,15 +245,18 @@ def _unauthorized() -> Response:
     )
 
 
+def _has_valid_bearer_token(auth_header: str) -> bool:
+    if not auth_header.startswith("Bearer "):
+        return False
+    provided_token = auth_header[7:]
+    return secrets.compare_digest(provided_token, get_bearer_token())
+
+
 def authentication_middleware(
     app: APIGatewayHttpResolver, next_middleware: NextMiddleware
 ) -> Response:
     headers = getattr(app.current_event, "headers", None) or {}
-    auth_header = headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return _unauthorized()
-    provided_token = auth_header[7:]
-    if not secrets.compare_digest(provided_token, get_bearer_token()):
+    if not _has_valid_bearer_token(headers.get("Authorization", "")):
         return _unauthorized()
     return next_middleware(app)
 
@@ -116,36 +269,769 @@ app.use(middlewares=[authentication_middleware])
 # ---------------------------------------------------------------------------
 
 
-def _ensure_index_fresh() -> None:
-    """Download index.db from S3 if missing or stale (TTL-based)."""
+def _shard_key(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return VECTOR_DB_S3_KEY
+    return f"vector-index/shards-{INDEX_SHARDS}/{shard:03d}.db"
+
+
+def _shard_path(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return VECTOR_DB_LOCAL_PATH
+    root, ext = os.path.splitext(VECTOR_DB_LOCAL_PATH)
+    return f"{root}-{shard:03d}{ext}"
+
+
+@cache
+def _shard_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=INDEX_SHARDS, thread_name_prefix="shard")
+
+
+def _map_shards(fn: Callable[[Any], Any], items: Iterable[Any]) -> list:
+    """`fn` over per-shard items, in parallel when there is more than one.
+
+    SQLite releases the GIL while it steps a statement, so KNN scans on
+    different shard connections run on separate cores.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    return list(_shard_pool().map(fn, items))
+
+
+def _is_missing(error: Exception) -> bool:
+    code = error.response["Error"]["Code"]  # type: ignore[attr-defined]
+    return code in ("404", "NoSuchKey")
+
+
+def _download_index_file(bucket: str, key: str, local_path: str) -> bool:
+    """Fetch an index file, preferring its compressed copy.
+
+    The gzip stream is decoded straight to `local_path`; a stream that ends
+    early raises EOFError.  Returns False if neither copy exists.
+    """
+    s3 = get_s3_client()
+    try:
+        response = s3.get_object(Bucket=bucket, Key=f"{key}.gz")
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+    else:
+        if response["Metadata"].get("index-format") == COMPRESSED_INDEX_FORMAT:
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+            with open(local_path, "wb") as f:
+                for chunk in response["Body"].iter_chunks(TRANSFER_CHUNK_BYTES):
+                    f.write(decompressor.decompress(chunk))
+                f.write(decompressor.flush())
+            if not decompressor.eof:
+                raise EOFError(f"Truncated compressed index at {key}.gz")
+            return True
+        response["Body"].close()  # written by a newer format; use the raw copy
+    try:
+        s3.download_file(bucket, key, local_path)
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+        return False
+    return True
+
+
+def _download_shard(shard: int) -> str | None:
+    """Download one shard to a temp file beside the live one; returns its path.
+
+    `_install_index` swaps it into place.  Returns None if a sharded index
+    does not have this shard yet.
+    """
+    local_path = _shard_path(shard)
+    key = _shard_key(shard)
+    fd, download_path = tempfile.mkstemp(
+        dir=os.path.dirname(local_path), suffix=".download"
+    )
+    os.close(fd)
+    try:
+        found = _download_index_file(get_application_bucket(), key, download_path)
+    except BaseException:
+        os.remove(download_path)
+        raise
+    if not found:
+        os.remove(download_path)
+        if INDEX_SHARDS == 1:
+            raise FileNotFoundError(f"No vector index at {key}")
+        return None
+    return download_path
+
+
+# ---------------------------------------------------------------------------
+# Remote index (INDEX_SERVING_MODE=remote): SQLite pages from S3 range reads
+# ---------------------------------------------------------------------------
+
+
+class RemoteBlockCache:
+    """LRU of fixed-size blocks of remote index files, shared by connections.
+
+    Runs of missing blocks are fetched with one ranged GET.  Every GET is
+    conditional on the pinned ETag, so blocks of two index versions never mix.
+    """
+
+    def __init__(self, block_bytes: int, capacity_bytes: int) -> None:
+        self.block_bytes = block_bytes
+        self.capacity_bytes = capacity_bytes
+        self._blocks: OrderedDict[tuple[str, int], bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def read(
+        self, remote: RemoteIndexObject, offset: int, amount: int, readahead: int = 1
+    ) -> bytes:
+        """`amount` bytes at `offset`; a miss fetches at least `readahead` blocks."""
+        end = min(offset + amount, remote.size)
+        if end <= offset:
+            return b""
+        first, last = offset // self.block_bytes, (end - 1) // self.block_bytes
+        with self._lock:
+            blocks = {}
+            for index in range(first, last + 1):
+                block = self._blocks.get((remote.name, index))
+                if block is not None:
+                    self._blocks.move_to_end((remote.name, index))
+                    blocks[index] = block
+            self.hits += len(blocks)
+        missing = [index for index in range(first, last + 1) if index not in blocks]
+        if missing:
+            final = (remote.size - 1) // self.block_bytes
+            upto = missing[-1]
+            with self._lock:
+                # Read ahead only up to the next block that is already cached
+                while (
+                    upto < min(missing[0] + readahead - 1, final)
+                    and (remote.name, upto + 1) not in self._blocks
+                ):
+                    upto += 1
+            blocks.update(self._fetch(remote, missing[0], upto))
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        start = offset - first * self.block_bytes
+        return data[start : start + end - offset]
+
+    def _fetch(
+        self, remote: RemoteIndexObject, first: int, last: int
+    ) -> dict[int, bytes]:
+        start = first * self.block_bytes
+        end = min((last + 1) * self.block_bytes, remote.size) - 1
+        s3 = get_s3_client()
+        try:
+            response = s3.get_object(
+                Bucket=remote.bucket,
+                Key=remote.key,
+                Range=f"bytes={start}-{end}",
+                IfMatch=remote.etag,
+            )
+        except s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("412", "PreconditionFailed"):
+                logger.warning(
+                    "Remote index changed under a query", extra={"key": remote.key}
+                )
+                _expire_index()
+            raise
+        data = response["Body"].read()
+        blocks = {
+            first + i: data[offset : offset + self.block_bytes]
+            for i, offset in enumerate(range(0, len(data), self.block_bytes))
+        }
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(data)
+            for index, block in blocks.items():
+                if (remote.name, index) not in self._blocks:
+                    self._blocks[(remote.name, index)] = block
+                    self._size += len(block)
+            while self._size > self.capacity_bytes and self._blocks:
+                self._size -= len(self._blocks.popitem(last=False)[1])
+        return blocks
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cached_bytes": self._size,
+            "hits": self.hits,
+            "requests": self.requests,
+            "bytes_fetched": self.bytes_fetched,
+        }
+
+
+@cache
+def _remote_block_cache() -> RemoteBlockCache:
+    return RemoteBlockCache(INDEX_REMOTE_BLOCK_BYTES, INDEX_REMOTE_CACHE_BYTES)
+
+
+class _RemoteVFSFile:
+    """apsw VFS file over one remote index version; read-only and immutable."""
+
+    def __init__(self, remote: RemoteIndexObject) -> None:
+        self.remote = remote
+        self._last_block = -1
+        self._readahead = 1
+
+    def xRead(self, amount: int, offset: int) -> bytes:
+        cache = _remote_block_cache()
+        block = offset // cache.block_bytes
+        if block == self._last_block + 1:
+            limit = max(1, INDEX_REMOTE_READAHEAD_BYTES // cache.block_bytes)
+            self._readahead = min(self._readahead * 2, limit)
+        elif block != self._last_block:
+            self._readahead = 1
+        self._last_block = block
+        # A short read is zero-filled by SQLite, as for a local file
+        return cache.read(self.remote, offset, amount, self._readahead)
+
+    def xFileSize(self) -> int:
+        return self.remote.size
+
+    def xDeviceCharacteristics(self) -> int:
+        import apsw  # pyright: ignore[reportMissingImports]
+
+        return apsw.SQLITE_IOCAP_IMMUTABLE
+
+    def xSectorSize(self) -> int:
+        return 4096
+
+    def xCheckReservedLock(self) -> bool:
+        return False
+
+    def xFileControl(self, op: int, pointer: int) -> bool:
+        return False
+
+    def xLock(self, level: int) -> None:
+        pass
+
+    def xUnlock(self, level: int) -> None:
+        pass
+
+    def xSync(self, flags: int) -> None:
+        pass
+
+    def xClose(self) -> None:
+        pass
+
+    def xWrite(self, data: bytes, offset: int) -> None:
+        import apsw  # pyright: ignore[reportMissingImports]
+
+        raise apsw.ReadOnlyError("remote index is read-only")
+
+    def xTruncate(self, size: int) -> None:
+        import apsw  # pyright: ignore[reportMissingImports]
+
+        raise apsw.ReadOnlyError("remote index is read-only")
+
+
+@cache
+def _remote_vfs() -> Any:
+    """Register the S3 range-read VFS with apsw, once per container.
+
+    Only apsw can define a VFS from Python, and it bundles its own SQLite, so
+    "remote" connections are apsw connections (the DB-API calls used here
+    behave the same).  apsw is imported only in this mode.
+    """
+    import apsw  # pyright: ignore[reportMissingImports]
+
+    class RemoteVFS(apsw.VFS):
+        def __init__(self) -> None:
+            self.objects: dict[str, RemoteIndexObject] = {}
+            super().__init__(REMOTE_VFS_NAME, base="")
+
+        def xOpen(self, name: Any, flags: list[int]) -> Any:
+            if isinstance(name, apsw.URIFilename):
+                name = name.filename()
+            if name not in self.objects:
+                raise apsw.CantOpenError(f"not a remote index: {name}")
+            return _RemoteVFSFile(self.objects[name])
+
+        def xAccess(self, pathname: str, flags: int) -> bool:
+            return False  # there are never -wal, -shm or -journal files
+
+        def xFullPathname(self, name: str) -> str:
+            return name
+
+        def xDelete(self, filename: str, syncdir: bool) -> None:
+            raise apsw.ReadOnlyError("remote index is read-only")
+
+    return RemoteVFS()
+
+
+def _open_remote_db(remote: RemoteIndexObject) -> Any:
+    import apsw  # pyright: ignore[reportMissingImports]
+    import sqlite_vec
+
+    vfs = _remote_vfs()
+    vfs.objects[remote.name] = remote
+    conn = apsw.Connection(
+        f"file:{remote.name}?immutable=1",
+        flags=apsw.SQLITE_OPEN_READONLY | apsw.SQLITE_OPEN_URI,
+        vfs=REMOTE_VFS_NAME,
+    )
+    conn.execute(f"PRAGMA cache_size = -{INDEX_CACHE_SIZE_KIB}")
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)  # pyright: ignore[reportArgumentType]
+    conn.enable_load_extension(False)
+    return conn
+
+
+def _stat_remote_shard(shard: int) -> RemoteIndexObject | None:
+    """Pin the current S3 version of one shard instead of downloading it.
+
+    Returns None if a sharded index does not have this shard yet.
+    """
+    bucket, key = get_application_bucket(), _shard_key(shard)
+    s3 = get_s3_client()
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except s3.exceptions.ClientError as e:
+        if not _is_missing(e):
+            raise
+        if INDEX_SHARDS == 1:
+            raise FileNotFoundError(f"No vector index at {key}")
+        return None
+    return RemoteIndexObject(bucket, key, head["ETag"], head["ContentLength"])
+
+
+def _expire_index() -> None:
+    """Make the next request fetch the index again, synchronously."""
     global _index_last_downloaded
-    now = time.monotonic()
-    if (
-        os.path.exists(VECTOR_DB_LOCAL_PATH)
-        and (now - _index_last_downloaded) < INDEX_CACHE_TTL_SECONDS
-    ):
-        logger.debug(
-            "Using cached index", extra={"age_seconds": now - _index_last_downloaded}
-        )
-        return
-    bucket = get_application_bucket()
-    logger.info("Downloading vector index from S3")
-    s3_client.download_file(bucket, VECTOR_DB_S3_KEY, VECTOR_DB_LOCAL_PATH)
+    _index_last_downloaded = 0.0
+
+
+def _have_index() -> bool:
+    if INDEX_SERVING_MODE == "remote":
+        return all(shard in _remote_shards for shard in _available_shards)
+    return all(os.path.exists(_shard_path(shard)) for shard in _available_shards)
+
+
+def _index_size_bytes() -> int:
+    if INDEX_SERVING_MODE == "remote":
+        return sum(_remote_shards[shard].size for shard in _available_shards)
+    return sum(os.path.getsize(_shard_path(shard)) for shard in _available_shards)
+
+
+def _open_shard(shard: int) -> Any:
+    if INDEX_SERVING_MODE == "remote":
+        return _open_remote_db(_remote_shards[shard])
+    return _open_db(_shard_path(shard))
+
+
+def _fetch_index() -> dict[int, Any]:
+    """Fetch every shard present in S3, in parallel, leaving the live ones alone.
+
+    Maps each shard to its downloaded temp file ("remote" mode: its pinned S3
+    version).  If any shard fails, the others' temp files are removed.
+    """
+    logger.info("Downloading vector index from S3", extra={"shards": INDEX_SHARDS})
+    fetch = _stat_remote_shard if INDEX_SERVING_MODE == "remote" else _download_shard
+
+    def fetch_one(shard: int) -> tuple[Any, Exception | None]:
+        try:
+            return fetch(shard), None
+        except Exception as e:
+            return None, e
+
+    outcomes = _map_shards(fetch_one, range(INDEX_SHARDS))
+    fetched = {shard: got for shard, (got, _) in enumerate(outcomes) if got}
+    errors = [error for _, error in outcomes if error is not None]
+    if errors:
+        if INDEX_SERVING_MODE != "remote":
+            for path in fetched.values():
+                os.remove(path)
+        raise errors[0]
+    return fetched
+
+
+def _install_index(fetched: dict[int, Any]) -> None:
+    """Swap fetched shards in for the live ones (call with `_db_lock` held).
+
+    Retires the shared connections; `_open_shards` opens them on the new files.
+    """
+    global _shards, _available_shards, _index_last_downloaded, _change_log_checked
+    _retired_shards.extend(_shards)
+    _shards = []
+    if INDEX_SERVING_MODE == "remote":
+        _remote_shards.clear()
+        _remote_shards.update(fetched)
+    else:
+        for shard, path in fetched.items():
+            os.replace(path, _shard_path(shard))
+    _available_shards = sorted(fetched)
     _index_last_downloaded = time.monotonic()
+    _change_log_checked = 0.0  # catch the new snapshots up on the next request
 
 
-def _open_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(VECTOR_DB_LOCAL_PATH)
+def _download_index() -> None:
+    """Download every shard and swap it in (call with `_db_lock` held)."""
+    _install_index(_fetch_index())
+
+
+def _refresh_index_in_background() -> None:
+    """Fetch the index without the lock, then swap it in and reopen under it."""
+    try:
+        fetched = _fetch_index()
+        with _db_lock:
+            _install_index(fetched)
+            _open_shards()
+    except Exception:
+        logger.exception("Background index refresh failed")
+
+
+def _start_background_refresh() -> None:
+    global _refresh_thread
+    if _refresh_thread is not None and _refresh_thread.is_alive():
+        return
+    _refresh_thread = threading.Thread(
+        target=_refresh_index_in_background, name="index-refresh", daemon=True
+    )
+    _refresh_thread.start()
+
+
+def _ensure_index_fresh(timing: ServerTiming | None = None) -> bool:
+    """Download the index shards from S3 if missing or stale (TTL-based).
+
+    Between INDEX_CACHE_TTL_SECONDS and INDEX_MAX_STALENESS_SECONDS the local
+    copy is served as-is while a background thread fetches the new one.
+    Returns True if a new copy was downloaded synchronously.
+    """
+    age = time.monotonic() - _index_last_downloaded
+    if _have_index():
+        if age < INDEX_CACHE_TTL_SECONDS:
+            logger.debug("Using cached index", extra={"age_seconds": age})
+            return False
+        if age < INDEX_MAX_STALENESS_SECONDS:
+            logger.debug(
+                "Serving stale index while refreshing", extra={"age_seconds": age}
+            )
+            _start_background_refresh()
+            return False
+    with (timing or ServerTiming()).measure("index-download"):
+        _download_index()
+    return True
+
+
+def _open_db(path: str | None = None) -> sqlite3.Connection:
+    import sqlite_vec
+
+    path = path or VECTOR_DB_LOCAL_PATH
+    # The connection may be opened by the priming thread and used by requests
+    if INDEX_SERVING_MODE == "file":
+        conn = sqlite3.connect(path, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(
+            f"{Path(path).absolute().as_uri()}?mode=ro&immutable=1",
+            uri=True,
+            check_same_thread=False,
+        )
+    if INDEX_SERVING_MODE == "mmap":
+        conn.execute(f"PRAGMA mmap_size = {INDEX_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{INDEX_CACHE_SIZE_KIB}")
+    elif INDEX_SERVING_MODE == "memory":
+        source, conn = conn, sqlite3.connect(":memory:", check_same_thread=False)
+        source.backup(conn)
+        source.close()
+        conn.execute("PRAGMA query_only = 1")
     conn.enable_load_extension(True)
     sqlite_vec.load(conn)
     conn.enable_load_extension(False)
     return conn
 
 
+def _get_index(
+    timing: ServerTiming | None = None,
+) -> tuple[list[sqlite3.Connection], int]:
+    """Return the connections to the up-to-date local index shards and their
+    generation, read together so a concurrent refresh cannot split them.
+
+    Blocks while another thread (e.g. init-time priming) is downloading.
+    The "index-check" timing includes any synchronous "index-download".
+    """
+    timing = timing or ServerTiming()
+    with _db_lock:
+        if _retired_shards:
+            # Requests run one at a time, so the one that was using them is done
+            for conn in _retired_shards:
+                conn.close()
+            _retired_shards.clear()
+            _search_cache.clear()
+        with timing.measure("index-check"):
+            _ensure_index_fresh(timing)
+        if _change_log_due():
+            with timing.measure("change-log"):
+                _catch_up_change_log()
+        if not _shards:
+            with timing.measure("db-open"):
+                _open_shards()
+        return _shards, _index_generation
+
+
+def _get_shards(timing: ServerTiming | None = None) -> list[sqlite3.Connection]:
+    """Return the shared connections to the up-to-date local index shards."""
+    return _get_index(timing)[0]
+
+
+def _open_shards() -> None:
+    """Open the shared connections on the live shards (call with `_db_lock` held).
+
+    Leaves the search cache to `_get_index`: the refresh thread calls this
+    while a request may be using the cache.
+    """
+    global _shards, _index_generation
+    _retired_shards.extend(_shards)
+    _shards = _map_shards(_open_shard, _available_shards)
+    _index_generation += 1
+
+
+def _read_file(path: str) -> None:
+    with open(path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+
+
+def _prime_index() -> None:
+    """Fetch and open the index, then pull the shards into the OS page cache."""
+    started = time.monotonic()
+    try:
+        _get_shards()
+        if INDEX_SERVING_MODE != "remote":
+            paths = [_shard_path(shard) for shard in _available_shards]
+            _map_shards(_read_file, paths)
+    except Exception:
+        logger.exception("Failed to prime vector index")
+        return
+    logger.info(
+        "Primed vector index",
+        extra={"duration_ms": (time.monotonic() - started) * 1000},
+    )
+
+
+def _start_index_priming() -> threading.Thread:
+    thread = threading.Thread(target=_prime_index, name="index-priming", daemon=True)
+    thread.start()
+    return thread
+
+
 def _serialize_embedding(embedding: list[float]) -> bytes:
     return struct.pack(f"{len(embedding)}f", *embedding)
 
 
+def _short_vector(embedding: list[float]) -> list[float]:
+    """Leading SHORT_EMBEDDING_DIMENSIONS of an embedding, renormalised."""
+    short = embedding[:SHORT_EMBEDDING_DIMENSIONS]
+    norm = math.sqrt(sum(x * x for x in short)) or 1.0
+    return [x / norm for x in short]
+
+
+# ---------------------------------------------------------------------------
+# Change log (INDEX_CHANGE_LOG): the indexer's records, replayed locally
+# ---------------------------------------------------------------------------
+
+
+def _log_prefix(shard: int) -> str:
+    if INDEX_SHARDS == 1:
+        return "vector-index/log/"
+    return f"vector-index/shards-{INDEX_SHARDS}/log-{shard:03d}/"
+
+
+def _log_key(shard: int, sequence: int) -> str:
+    return f"{_log_prefix(shard)}{sequence:012d}.json.gz"
+
+
+def _log_sequence(key: str) -> int:
+    return int(key.rsplit("/", 1)[1].split(".", 1)[0])
+
+
+def _change_log_due() -> bool:
+    """Whether to look for new records now (call with `_db_lock` held)."""
+    return (
+        INDEX_CHANGE_LOG
+        and INDEX_SERVING_MODE != "remote"
+        and time.monotonic() - _change_log_checked >= INDEX_CHANGE_LOG_POLL_SECONDS
+    )
+
+
+def _local_log_position(shard: int) -> int:
+    """Last change record applied to the local shard (0 if it predates the log)."""
+    uri = Path(_shard_path(shard)).absolute().as_uri()
+    conn = sqlite3.connect(f"{uri}?mode=ro&immutable=1", uri=True)
+    try:
+        row = conn.execute("SELECT sequence FROM change_log_position").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def _list_change_records(shard: int, position: int) -> list[str]:
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    keys = []
+    for page in paginator.paginate(
+        Bucket=get_application_bucket(),
+        Prefix=_log_prefix(shard),
+        StartAfter=_log_key(shard, position),
+    ):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+def _pending_changes(shard: int) -> tuple[list[str], bool]:
+    """Keys of the shard's change records the local copy has not applied.
+
+    When compaction has already deleted records this copy never saw, the
+    newer snapshot is swapped in first; the flag says the file was replaced.
+    """
+    position = _local_log_position(shard)
+    keys = _list_change_records(shard, position)
+    if not keys or _log_sequence(keys[0]) == position + 1:
+        return keys, False
+    logger.info(
+        "Change log is past the local index; downloading snapshot",
+        extra={"shard": shard, "position": position, "next_key": keys[0]},
+    )
+    download_path = _download_shard(shard)
+    if download_path is None:
+        return [], False
+    os.replace(download_path, _shard_path(shard))
+    return _list_change_records(shard, _local_log_position(shard)), True
+
+
+def _catch_up_change_log() -> None:
+    """Apply new change records to the local shards (call with `_db_lock` held).
+
+    The serving connections are immutable, so they are closed before the
+    files are written; `_get_shards` then reopens them.
+    """
+    global _change_log_checked, _shards
+    pending = _map_shards(_pending_changes, _available_shards)
+    _change_log_checked = time.monotonic()
+    if not any(keys or replaced for keys, replaced in pending):
+        return
+    for conn in _shards:
+        conn.close()
+    _shards = []
+    applied = sum(
+        _map_shards(
+            lambda item: _apply_changes(*item),
+            [
+                (shard, keys)
+                for shard, (keys, _) in zip(_available_shards, pending)
+                if keys
+            ],
+        )
+    )
+    metrics.add_metric(
+        name="ChangeRecordsApplied", unit=MetricUnit.Count, value=applied
+    )
+    logger.info("Applied change log", extra={"records": applied})
+
+
+def _apply_changes(shard: int, keys: list[str]) -> int:
+    """Apply change records to a local shard in one transaction; returns the count.
+
+    Stops at a record in a format this code does not know, leaving it and
+    everything after it for a newer search service or the next compaction.
+    """
+    import sqlite_vec
+
+    bucket = get_application_bucket()
+    conn = sqlite3.connect(_shard_path(shard))
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+    conn.enable_load_extension(False)
+    applied = 0
+    try:
+        # Same definition as the indexer's; older snapshots lack it
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_log_position (
+                id       INTEGER PRIMARY KEY CHECK (id = 1),
+                sequence INTEGER NOT NULL
+            )
+        """
+        )
+        for key in keys:
+            body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+            change = json.loads(gzip.decompress(body))
+            if change.get("format") != CHANGE_LOG_FORMAT:
+                logger.warning(
+                    "Stopping at change record in an unknown format",
+                    extra={"key": key, "format": change.get("format")},
+                )
+                break
+            _apply_change(conn, change)
+            applied += 1
+        conn.commit()
+        # Fold the WAL back in: serving connections open the file immutable
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return applied
+
+
+def _apply_change(conn: sqlite3.Connection, change: dict[str, Any]) -> None:
+    """Store one change record's rows, derived by the indexer's `_document_rows`."""
+    url = change["url"]
+    has_short_vectors = _has_table(conn, "vec_chunks_short")
+    has_centroids = _has_table(conn, "vec_documents")
+    for (chunk_id,) in conn.execute(
+        "SELECT id FROM chunks WHERE url = ?", (url,)
+    ).fetchall():
+        conn.execute("DELETE FROM vec_chunks WHERE chunk_id = ?", (chunk_id,))
+        if has_short_vectors:
+            conn.execute("DELETE FROM vec_chunks_short WHERE chunk_id = ?", (chunk_id,))
+    conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+    if has_centroids:
+        conn.execute("DELETE FROM vec_documents WHERE url = ?", (url,))
+    conn.execute("DELETE FROM document_tags WHERE url = ?", (url,))
+
+    if change["op"] == "delete":
+        conn.execute("DELETE FROM documents WHERE url = ?", (url,))
+    else:
+        for i, chunk in enumerate(change["chunks"]):
+            chunk_id = conn.execute(
+                "INSERT INTO chunks (url, chunk_index, chunk_text) VALUES (?, ?, ?)",
+                (url, i, chunk["text"]),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO vec_chunks (chunk_id, embedding) VALUES (?, ?)",
+                (chunk_id, base64.b64decode(chunk["embedding"])),
+            )
+            if has_short_vectors:
+                conn.execute(
+                    "INSERT INTO vec_chunks_short (chunk_id, embedding) VALUES (?, ?)",
+                    (chunk_id, base64.b64decode(chunk["short_embedding"])),
+                )
+        if has_centroids and change["centroid"] is not None:
+            conn.execute(
+                "INSERT INTO vec_documents (embedding, url) VALUES (?, ?)",
+                (base64.b64decode(change["centroid"]), url),
+            )
+        conn.execute(
+            """
+            INSERT INTO documents (url, full_title, title) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                full_title = excluded.full_title,
+                title      = excluded.title
+            """,
+            (url, change["full_title"], change["title"]),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO document_tags (url, tag) VALUES (?, ?)",
+            [(url, tag) for tag in change["tags"]],
+        )
+    conn.execute(
+        """
+        INSERT INTO change_log_position (id, sequence) VALUES (1, ?)
+        ON CONFLICT(id) DO UPDATE SET sequence = excluded.sequence
+        """,
+        (change["sequence"],),
+    )
+
+
 # ---------------------------------------------------------------------------
 # Core search logic
 # ---------------------------------------------------------------------------
@@ -153,7 +1039,7 @@ def _serialize_embedding(embedding: list[float]) -> bytes:
 
 @tracer.capture_method
 def embed_query(text: str) -> list[float]:
-    response = bedrock_client.invoke_model(
+    response = get_bedrock_client().invoke_model(
         modelId=BEDROCK_MODEL_ID,
         body=json.dumps(
             {
@@ -184,25 +1070,241 @@ def _parse_query(query: str) -> tuple[str, list[str]]:
     return " ".join(text_words), tags
 
 
-@tracer.capture_method
-def _vector_search(
-    conn: sqlite3.Connection, embedding: list[float], top_k: int
-) -> list[dict]:
-    """KNN search; deduplicate by URL keeping best (lowest) distance per document."""
-    blob = _serialize_embedding(embedding)
-    rows = conn.execute(
+def _vector_search_query(
+    embedding: list[float],
+    k: int,
+    tags: list[str] | None = None,
+    strategy: str = "global",
+    documents: list[str] | None = None,
+    short_candidates: int = 0,
+) -> tuple[str, tuple]:
+    """KNN over chunk vectors, narrowed by the plan's strategy.
+
+    With `short_candidates`, that many chunks are picked on their short
+    vectors, and the closest `k` of them by exact distance on the full
+    embeddings are returned.
+    """
+    chunk_filter, filter_params = "", ()
+    if tags and strategy in ("prefilter", "postfilter"):
+        placeholders = ",".join("?" * len(tags))
+        filter_params = tuple(tags)
+        if strategy == "prefilter":
+            chunk_filter = f"""
+          AND v.chunk_id IN (
+            SELECT tc.id FROM chunks tc
+            JOIN document_tags dt ON dt.url = tc.url
+            WHERE dt.tag IN ({placeholders})
+          )"""
+        else:
+            chunk_filter = f"""
+          AND c.url IN (SELECT url FROM document_tags WHERE tag IN ({placeholders}))"""
+    elif strategy == "two-stage":
+        placeholders = ",".join("?" * len(documents or []))
+        filter_params = tuple(documents or [])
+        chunk_filter = f"""
+          AND v.chunk_id IN (SELECT id FROM chunks WHERE url IN ({placeholders}))"""
+    if short_candidates:
+        sql = f"""
+        WITH candidates AS (
+            SELECT v.chunk_id
+            FROM vec_chunks_short v
+            JOIN chunks c ON c.id = v.chunk_id
+            WHERE v.embedding MATCH ?
+              AND k = ?{chunk_filter}
+        )
+        SELECT c.url, vec_distance_l2(f.embedding, ?) AS distance, d.full_title
+        FROM candidates s
+        JOIN vec_chunks f ON f.chunk_id = s.chunk_id
+        JOIN chunks c ON c.id = s.chunk_id
+        LEFT JOIN documents d ON d.url = c.url
+        ORDER BY distance
+        LIMIT ?
         """
+        return sql, (
+            _serialize_embedding(_short_vector(embedding)),
+            short_candidates,
+            *filter_params,
+            _serialize_embedding(embedding),
+            k,
+        )
+    sql = f"""
         SELECT c.url, v.distance, d.full_title
         FROM vec_chunks v
         JOIN chunks c ON c.id = v.chunk_id
         LEFT JOIN documents d ON d.url = c.url
         WHERE v.embedding MATCH ?
-          AND k = ?
+          AND k = ?{chunk_filter}
         ORDER BY v.distance
+        """
+    return sql, (_serialize_embedding(embedding), k, *filter_params)
+
+
+def _candidate_documents_query(embedding: list[float], k: int) -> tuple[str, tuple]:
+    sql = """
+        SELECT url FROM vec_documents
+        WHERE embedding MATCH ?
+          AND k = ?
+        ORDER BY distance
+        """
+    return sql, (_serialize_embedding(embedding), k)
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    """Older indexes lack vec_documents and vec_chunks_short."""
+    return (
+        conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+        is not None
+    )
+
+
+@dataclass
+class VectorSearchPlan:
+    """How a KNN query narrows the chunks it scores.
+
+    "global" scores every chunk, "two-stage" first shortlists documents by
+    centroid and scores only their chunks, "none" means no chunk carries the
+    tags, "postfilter" widens k by 1/selectivity and filters the KNN rows, and
+    "prefilter" restricts the vec0 scan to the tagged chunk ids.  With
+    `short_candidates`, any of them scans short vectors and re-ranks that many
+    chunks on the full embeddings.
+    """
+
+    strategy: str
+    k: int
+    selectivity: float | None = None
+    chunks: int | None = None
+    documents: list[str] | None = None  # two-stage shortlist
+    short_candidates: int = 0
+
+    @property
+    def exhaustive(self) -> bool:
+        """True if k already covers every chunk in the index."""
+        return self.chunks is not None and self.k >= self.chunks
+
+
+def _plan_vector_search(
+    conn: sqlite3.Connection, top_k: int, tags: list[str] | None
+) -> VectorSearchPlan:
+    """Choose two-stage for plain queries, pre- or post-filtering for tagged ones."""
+    k = top_k * 3  # over-fetch, dedupe
+    if not tags:
+        if CENTROID_CANDIDATES_PER_RESULT and _has_table(conn, "vec_documents"):
+            return VectorSearchPlan("two-stage", k)
+        return VectorSearchPlan("global", k)
+    placeholders = ",".join("?" * len(tags))
+    tagged = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM chunks
+        WHERE url IN (SELECT url FROM document_tags WHERE tag IN ({placeholders}))
         """,
-        (blob, top_k * 3),  # over-fetch then deduplicate
-    ).fetchall()
+        tags,
+    ).fetchone()[0]
+    if not tagged:
+        return VectorSearchPlan("none", 0, 0.0)
+    chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    selectivity = tagged / chunks
+    if selectivity >= TAG_POSTFILTER_MIN_SELECTIVITY:
+        widened = min(MAX_KNN_K, math.ceil(k / selectivity))
+        return VectorSearchPlan("postfilter", widened, selectivity, chunks)
+    return VectorSearchPlan("prefilter", k, selectivity, chunks)
 
+
+@tracer.capture_method
+def _vector_search(
+    conn: sqlite3.Connection,
+    embedding: list[float],
+    top_k: int,
+    tags: list[str] | None = None,
+    stats: dict | None = None,
+) -> list[dict]:
+    """KNN search; deduplicate by URL keeping best (lowest) distance per document.
+
+    With `tags`, only chunks of documents carrying any of them are considered.
+    If `stats` is given, the number of chunk candidates and the plan are
+    stored in it.
+    """
+    plan = _plan_vector_search(conn, top_k, tags)
+    short_candidates = 0
+    if SHORT_VECTOR_CANDIDATES_PER_RESULT and _has_table(conn, "vec_chunks_short"):
+        short_candidates = min(MAX_KNN_K, top_k * SHORT_VECTOR_CANDIDATES_PER_RESULT)
+    if plan.strategy == "two-stage":
+        shortlist = min(MAX_KNN_K, top_k * CENTROID_CANDIDATES_PER_RESULT)
+        query = _candidate_documents_query(embedding, shortlist)
+        plan.documents = [url for (url,) in conn.execute(*query)]
+    rows = []
+    if plan.strategy != "none":
+        if short_candidates:
+            plan.short_candidates = max(plan.k, short_candidates)
+        query = _vector_search_query(
+            embedding,
+            plan.k,
+            tags,
+            plan.strategy,
+            plan.documents,
+            plan.short_candidates,
+        )
+        rows = conn.execute(*query).fetchall()
+    if (
+        plan.strategy == "postfilter"
+        and not plan.exhaustive
+        and len({url for url, _, _ in rows}) < top_k
+    ):
+        # The widened KNN came up short after filtering; let vec0 do it exactly
+        plan = VectorSearchPlan("prefilter", top_k * 3, plan.selectivity, plan.chunks)
+        if short_candidates:
+            plan.short_candidates = max(plan.k, short_candidates)
+        query = _vector_search_query(
+            embedding,
+            plan.k,
+            tags,
+            plan.strategy,
+            short_candidates=plan.short_candidates,
+        )
+        rows = conn.execute(*query).fetchall()
+    if stats is not None:
+        stats["candidates"] = len(rows)
+        stats["plan"] = plan
+
+    return _best_per_document(rows, top_k)
+
+
+def _merge_shard_results(
+    per_shard: list[list[dict]], top_k: int, key: Callable[[dict], Any] | None = None
+) -> list[dict]:
+    """Combine per-shard top-k lists into the overall top-k.
+
+    A document lives in exactly one shard, so there is nothing to dedupe.
+    """
+    merged = list(itertools.chain.from_iterable(per_shard))
+    if key is not None:
+        merged.sort(key=key)
+    return merged[:top_k]
+
+
+def _vector_search_shards(
+    shards: list[sqlite3.Connection],
+    embedding: list[float],
+    top_k: int,
+    tags: list[str] | None = None,
+    stats: dict | None = None,
+) -> list[dict]:
+    """`_vector_search` on every shard, merged by distance.
+
+    `stats` gets the total candidates and the first shard's plan.
+    """
+    shard_stats: list[dict] = [{} for _ in shards]
+    per_shard = _map_shards(
+        lambda i: _vector_search(shards[i], embedding, top_k, tags, shard_stats[i]),
+        range(len(shards)),
+    )
+    if stats is not None and shard_stats:
+        stats["candidates"] = sum(s["candidates"] for s in shard_stats)
+        stats["plan"] = shard_stats[0]["plan"]
+    return _merge_shard_results(per_shard, top_k, key=lambda r: r["distance"])
+
+
+def _best_per_document(rows: list[tuple], top_k: int) -> list[dict]:
+    """Collapse (url, distance, title) chunk rows to the closest chunk per URL."""
     seen: dict[str, tuple[float, str | None]] = {}
     for url, dist, title in rows:
         if url not in seen or dist < seen[url][0]:
@@ -214,29 +1316,104 @@ def _vector_search(
     ]
 
 
-def _title_search(conn: sqlite3.Connection, text: str, top_k: int) -> list[dict]:
-    """Substring match on the normalized title column."""
+def _document_centroid(conn: sqlite3.Connection, url: str) -> list[float] | None:
+    """A document's centroid (None if unindexed).
+
+    Read from vec_documents, where the indexer stores it; indexes predating
+    that table fall back to the normalised mean of the stored chunk vectors.
+    """
+    if _has_table(conn, "vec_documents"):
+        # +url is an auxiliary column, so this walks the rows until it matches
+        row = conn.execute(
+            "SELECT embedding FROM vec_documents WHERE url = ? LIMIT 1", (url,)
+        ).fetchone()
+        if row is not None:
+            (blob,) = row
+            return list(struct.unpack(f"{len(blob) // 4}f", blob))
+    blobs = [
+        blob
+        for (blob,) in conn.execute(
+            """
+            SELECT v.embedding
+            FROM chunks c
+            JOIN vec_chunks v ON v.chunk_id = c.id
+            WHERE c.url = ?
+            """,
+            (url,),
+        )
+    ]
+    if not blobs:
+        return None
+    dimensions = len(blobs[0]) // 4
+    centroid = [0.0] * dimensions
+    for blob in blobs:
+        for i, value in enumerate(struct.unpack(f"{dimensions}f", blob)):
+            centroid[i] += value
+    norm = math.sqrt(sum(x * x for x in centroid)) or 1.0
+    return [x / norm for x in centroid]
+
+
+@tracer.capture_method
+def _similar_documents(
+    shards: list[sqlite3.Connection], url: str, top_k: int
+) -> list[dict] | None:
+    """Documents closest to `url`'s centroid, excluding itself (None if unindexed).
+
+    Uses only vectors already in the index, so there is no Bedrock call.
+    """
+    centroids = _map_shards(lambda conn: _document_centroid(conn, url), shards)
+    found = [(conn, c) for conn, c in zip(shards, centroids) if c is not None]
+    if not found:
+        return None
+    source, centroid = found[0]
+    (own_chunks,) = source.execute(
+        "SELECT COUNT(*) FROM chunks WHERE url = ?", (url,)
+    ).fetchone()
+    # The document's own chunks sit closest to its centroid; fetch past them
+    k = min(MAX_KNN_K, top_k * 3 + own_chunks)
+    per_shard = _map_shards(
+        lambda conn: _nearest_documents(conn, centroid, k, top_k, url), shards
+    )
+    return _merge_shard_results(per_shard, top_k, key=lambda r: r["distance"])
+
+
+def _nearest_documents(
+    conn: sqlite3.Connection,
+    embedding: list[float],
+    k: int,
+    top_k: int,
+    exclude_url: str,
+) -> list[dict]:
+    """Best chunk per document among the `k` nearest, leaving out `exclude_url`."""
+    rows = conn.execute(*_vector_search_query(embedding, k)).fetchall()
+    return _best_per_document([row for row in rows if row[0] != exclude_url], top_k)
+
+
+def _title_search_query(text: str, top_k: int) -> tuple[str, list] | None:
     normalized = normalize_title(text)
     if not normalized:
-        return []
+        return None
     words = normalized.split()
     clauses = " AND ".join("title LIKE ?" for _ in words)
     params: list = [f"%{w}%" for w in words]
     params.append(top_k)
-    rows = conn.execute(
-        f"SELECT url, full_title FROM documents WHERE {clauses} LIMIT ?",
-        params,
-    ).fetchall()
+    return f"SELECT url, full_title FROM documents WHERE {clauses} LIMIT ?", params
+
+
+def _title_search(conn: sqlite3.Connection, text: str, top_k: int) -> list[dict]:
+    """Substring match on the normalized title column."""
+    query = _title_search_query(text, top_k)
+    if query is None:
+        return []
+    rows = conn.execute(*query).fetchall()
     return [{"url": url, "title": full_title} for url, full_title in rows]
 
 
-def _tags_search(conn: sqlite3.Connection, tags: list[str], top_k: int) -> list[dict]:
-    """Find documents matching any of the given tags, ranked by match count."""
+def _tags_search_query(tags: list[str], top_k: int) -> tuple[str, tuple] | None:
     if not tags:
-        return []
+        return None
     placeholders = ",".join("?" * len(tags))
-    rows = conn.execute(
-        f"""
+    sql = f"""
         SELECT d.url, d.full_title, GROUP_CONCAT(dt.tag) AS matched_tags
         FROM document_tags dt
         JOIN documents d ON d.url = dt.url
@@ -244,9 +1421,16 @@ def _tags_search(conn: sqlite3.Connection, tags: list[str], top_k: int) -> list[
         GROUP BY d.url
         ORDER BY COUNT(dt.tag) DESC
         LIMIT ?
-        """,
-        (*tags, top_k),
-    ).fetchall()
+        """
+    return sql, (*tags, top_k)
+
+
+def _tags_search(conn: sqlite3.Connection, tags: list[str], top_k: int) -> list[dict]:
+    """Find documents matching any of the given tags, ranked by match count."""
+    query = _tags_search_query(tags, top_k)
+    if query is None:
+        return []
+    rows = conn.execute(*query).fetchall()
     return [
         {
             "url": url,
@@ -258,10 +1442,70 @@ def _tags_search(conn: sqlite3.Connection, tags: list[str], top_k: int) -> list[
 
 
 # ---------------------------------------------------------------------------
-# Route
+# Result cache / ETags
+# ---------------------------------------------------------------------------
+
+
+def _cache_get(key: tuple) -> dict[str, list] | None:
+    sections = _search_cache.get(key)
+    if sections is not None:
+        _search_cache.move_to_end(key)
+    return sections
+
+
+def _cache_put(key: tuple, sections: dict[str, list]) -> None:
+    """Store results, evicting the least recently used beyond SEARCH_CACHE_SIZE."""
+    _search_cache[key] = sections
+    _search_cache.move_to_end(key)
+    while len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+
+def _etag(body: dict[str, Any]) -> str:
+    """Strong ETag over the response body, so it is the same on every container."""
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+    return f'"{hashlib.blake2b(encoded, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _revalidated_response(body: dict[str, Any], timing: ServerTiming) -> Response:
+    """200 with an ETag, or 304 when the client's If-None-Match matches it."""
+    etag = _etag(body)
+    headers = {
+        "ETag": etag,
+        # Private (bearer-authenticated); clients may keep it but must revalidate
+        "Cache-Control": "private, no-cache",
+        "Server-Timing": timing.header(),
+    }
+    if _etag_matches((app.current_event.headers or {}).get("If-None-Match"), etag):
+        metrics.add_metric(name="SearchNotModified", unit=MetricUnit.Count, value=1)
+        return Response(status_code=304, headers=headers)
+    return Response(
+        status_code=200,
+        content_type=content_types.APPLICATION_JSON,
+        body=body,
+        headers=headers,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Routes
 # ---------------------------------------------------------------------------
 
 
+def _parse_top_k(params: dict[str, str]) -> int:
+    try:
+        return max(1, min(int(params.get("top", "5")), 20))
+    except ValueError:
+        return 5
+
+
 @app.get("/search")
 @tracer.capture_method
 def search() -> Response:
@@ -274,11 +1518,8 @@ def search() -> Response:
             body={"error": "Missing required query parameter 'q'"},
         )
 
-    try:
-        top_k = int(params.get("top", "5"))
-        top_k = max(1, min(top_k, 20))
-    except ValueError:
-        top_k = 5
+    top_k = _parse_top_k(params)
+    explain = params.get("explain", "").lower() in ("1", "true")
 
     text_query, tags = _parse_query(query)
     logger.info(
@@ -286,37 +1527,311 @@ def search() -> Response:
         extra={"query": query, "text_query": text_query, "tags": tags, "top_k": top_k},
     )
 
-    _ensure_index_fresh()
-    conn = _open_db()
+    timing = ServerTiming()
+    vector_stats: dict = {}
+    with timing.measure("total"):
+        shards, generation = _get_index(timing)
+        # explain=1 always runs the queries so its timings and plans are real
+        cache_key = ("search", text_query, tuple(sorted(set(tags))), top_k, generation)
+        sections = None if explain else _cache_get(cache_key)
+        cache_hit = sections is not None
+        if sections is None:
+            sections = _run_searches(
+                shards, text_query, tags, top_k, timing, vector_stats
+            )
+            if not explain:
+                _cache_put(cache_key, sections)
+
+    metrics.add_metric(
+        name="SearchCacheHits" if cache_hit else "SearchCacheMisses",
+        unit=MetricUnit.Count,
+        value=1,
+    )
+    metrics.add_metric(name="SearchRequests", unit=MetricUnit.Count, value=1)
+    logger.info(
+        "Search complete",
+        extra={
+            "sections": list(sections.keys()),
+            "cache_hit": cache_hit,
+            "timings_ms": timing.durations_ms,
+        },
+    )
+
+    body: dict[str, Any] = {
+        "query": query,
+        "parsed": {"text": text_query, "tags": tags},
+        "sections": sections,
+    }
+    if explain:
+        body["explain"] = _explain(
+            shards, text_query, tags, top_k, timing, vector_stats, sections
+        )
+    return _revalidated_response(body, timing)
+
+
+def _run_searches(
+    shards: list[sqlite3.Connection],
+    text_query: str,
+    tags: list[str],
+    top_k: int,
+    timing: ServerTiming,
+    vector_stats: dict,
+) -> dict[str, list]:
+    """Run vector, title and tag search; empty sections are left out."""
     sections: dict[str, list] = {}
-    try:
-        if text_query:
+    if text_query:
+        with timing.measure("embed"):
             embedding = embed_query(text_query)
-            vector_results = _vector_search(conn, embedding, top_k)
-            if vector_results:
-                sections["vector"] = vector_results
-
-            title_results = _title_search(conn, text_query, top_k)
-            if title_results:
-                sections["title"] = title_results
-
-        if tags:
-            tags_results = _tags_search(conn, tags, top_k)
-            if tags_results:
-                sections["tags"] = tags_results
-    finally:
-        conn.close()
+        with timing.measure("vector"):
+            vector_results = _vector_search_shards(
+                shards, embedding, top_k, tags, vector_stats
+            )
+        if vector_results:
+            sections["vector"] = vector_results
+
+        with timing.measure("title"):
+            title_results = _merge_shard_results(
+                _map_shards(
+                    lambda conn: _title_search(conn, text_query, top_k), shards
+                ),
+                top_k,
+            )
+        if title_results:
+            sections["title"] = title_results
+
+    if tags:
+        with timing.measure("tags"):
+            tags_results = _merge_shard_results(
+                _map_shards(lambda conn: _tags_search(conn, tags, top_k), shards),
+                top_k,
+                key=lambda r: -len(r["matched_tags"]),
+            )
+        if tags_results:
+            sections["tags"] = tags_results
+    return sections
+
+
+@app.get("/similar")
+@tracer.capture_method
+def similar() -> Response:
+    """Saved documents related to an already-indexed one ("more like this")."""
+    params = app.current_event.query_string_parameters or {}
+    url = params.get("url", "").strip()
+    if not url:
+        return Response(
+            status_code=400,
+            content_type=content_types.APPLICATION_JSON,
+            body={"error": "Missing required query parameter 'url'"},
+        )
+    top_k = _parse_top_k(params)
+    logger.info("Similar request", extra={"url": url, "top_k": top_k})
+
+    timing = ServerTiming()
+    with timing.measure("total"):
+        shards, generation = _get_index(timing)
+        cache_key = ("similar", url, top_k, generation)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            results = cached["similar"]
+        else:
+            with timing.measure("similar"):
+                results = _similar_documents(shards, url, top_k)
+            if results is not None:
+                _cache_put(cache_key, {"similar": results})
+
+    metrics.add_metric(
+        name="SearchCacheHits" if cached is not None else "SearchCacheMisses",
+        unit=MetricUnit.Count,
+        value=1,
+    )
+    metrics.add_metric(name="SimilarRequests", unit=MetricUnit.Count, value=1)
+    if results is None:
+        return Response(
+            status_code=404,
+            content_type=content_types.APPLICATION_JSON,
+            body={"error": "Document is not indexed"},
+        )
+    return _revalidated_response({"url": url, "results": results}, timing)
 
-    metrics.add_metric(name="SearchRequests", unit=MetricUnit.Count, value=1)
-    logger.info("Search complete", extra={"sections": list(sections.keys())})
 
-    return Response(
-        status_code=200,
-        content_type=content_types.APPLICATION_JSON,
-        body={
-            "query": query,
-            "parsed": {"text": text_query, "tags": tags},
-            "sections": sections,
+def _query_plan(conn: sqlite3.Connection | None, query: tuple | None) -> list[str]:
+    if conn is None or query is None:
+        return []
+    sql, params = query
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _explain(
+    shards: list[sqlite3.Connection],
+    text_query: str,
+    tags: list[str],
+    top_k: int,
+    timing: ServerTiming,
+    vector_stats: dict,
+    sections: dict[str, list],
+) -> dict[str, Any]:
+    """Timings, candidate counts and SQLite query plans for `explain=1`.
+
+    With several shards, the plans are the first shard's.
+    """
+    conn = shards[0] if shards else None
+    placeholder_embedding = [0.0] * EMBEDDING_DIMENSIONS
+    plan: VectorSearchPlan | None = vector_stats.get("plan")
+    return {
+        "timings_ms": {k: round(v, 3) for k, v in timing.durations_ms.items()},
+        "index": {
+            "age_seconds": round(time.monotonic() - _index_last_downloaded, 1),
+            "size_bytes": _index_size_bytes(),
+            "shards": len(shards),
+            **(
+                {"remote_cache": _remote_block_cache().stats()}
+                if INDEX_SERVING_MODE == "remote"
+                else {}
+            ),
+        },
+        "candidates": {
+            "vector": vector_stats.get("candidates", 0),
+            "title": len(sections.get("title", [])),
+            "tags": len(sections.get("tags", [])),
+        },
+        "vector_filter": (
+            {
+                "strategy": plan.strategy,
+                "k": plan.k,
+                "selectivity": plan.selectivity,
+                "shortlisted_documents": (
+                    len(plan.documents) if plan.documents is not None else None
+                ),
+                "short_vector_candidates": plan.short_candidates,
+            }
+            if plan
+            else None
+        ),
+        "query_plans": {
+            "vector": _query_plan(
+                conn,
+                _vector_search_query(
+                    placeholder_embedding,
+                    plan.k,
+                    tags,
+                    plan.strategy,
+                    plan.documents,
+                    plan.short_candidates,
+                )
+                if plan and plan.strategy != "none"
+                else None,
+            ),
+            "title": _query_plan(conn, _title_search_query(text_query, top_k)),
+            "tags": _query_plan(conn, _tags_search_query(tags, top_k)),
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# On-demand profiling
+# ---------------------------------------------------------------------------
+
+# "always" profiles every invocation, warm-up pings included; "query" only
+# authenticated requests sent with `profile=1` alongside `q=` or `url=`.
+# Reports go to PROFILE_OUTPUT (a local dir or s3://bucket/prefix)
+PROFILE_INVOCATIONS = os.getenv("PROFILE_INVOCATIONS", "").lower()
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "/tmp/profiles")
+PROFILE_QUERY_PARAMETER = "profile"
+PROFILE_TOP_N = 40
+
+
+def _should_profile(event: Dict[str, Any]) -> bool:
+    if PROFILE_INVOCATIONS == "always":
+        return True
+    if PROFILE_INVOCATIONS == "query":
+        params = event.get("queryStringParameters") or {}
+        if params.get(PROFILE_QUERY_PARAMETER, "").lower() not in ("1", "true"):
+            return False
+        # The wrapper runs ahead of authentication_middleware
+        headers = APIGatewayProxyEventV2(event).headers
+        return _has_valid_bearer_token(headers.get("Authorization", ""))
+    return False
+
+
+def profile_on_demand(handler):
+    """Run the handler under cProfile + tracemalloc when profiling is requested."""
+
+    @wraps(handler)
+    def wrapper(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+        if not _should_profile(event):
+            return handler(event, context)
+
+        import cProfile
+        import tracemalloc
+
+        profiler = cProfile.Profile()
+        tracemalloc.start(10)
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(handler, event, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            try:
+                _write_profile(
+                    profiler, snapshot, peak_bytes, duration_ms, context.aws_request_id
+                )
+            except Exception:
+                logger.exception("Failed to write invocation profile")
+
+    return wrapper
+
+
+def _write_profile(
+    profiler: Any,
+    snapshot: Any,
+    peak_bytes: int,
+    duration_ms: float,
+    request_id: str,
+) -> None:
+    """Write `<request_id>.prof` (pstats) and `<request_id>.txt` (summary)."""
+    import io
+    import pstats
+
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_text)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    allocations = "\n".join(
+        str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+    )
+    report = (
+        f"Duration: {duration_ms:.1f} ms\n"
+        f"Peak traced memory: {peak_bytes / 1024 / 1024:.1f} MiB\n\n"
+        f"Top allocations by line:\n{allocations}\n\n"
+        f"{stats_text.getvalue()}"
+    )
+    with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+        profiler.dump_stats(f.name)
+        profile_bytes = Path(f.name).read_bytes()
+
+    if PROFILE_OUTPUT.startswith("s3://"):
+        bucket, _, prefix = PROFILE_OUTPUT.removeprefix("s3://").partition("/")
+        location = f"s3://{bucket}/{prefix.rstrip('/')}/{request_id}"
+        for suffix, body in ((".prof", profile_bytes), (".txt", report.encode())):
+            get_s3_client().put_object(
+                Bucket=bucket,
+                Key=f"{prefix.rstrip('/')}/{request_id}{suffix}".lstrip("/"),
+                Body=body,
+            )
+    else:
+        os.makedirs(PROFILE_OUTPUT, exist_ok=True)
+        location = os.path.join(PROFILE_OUTPUT, request_id)
+        Path(f"{location}.prof").write_bytes(profile_bytes)
+        Path(f"{location}.txt").write_text(report)
+
+    logger.info(
+        "Wrote invocation profile",
+        extra={
+            "location": location,
+            "duration_ms": duration_ms,
+            "peak_traced_bytes": peak_bytes,
         },
     )
 
@@ -329,5 +1844,22 @@ def search() -> Response:
 @logger.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_HTTP)
 @tracer.capture_lambda_handler
 @metrics.log_metrics
+@profile_on_demand
 def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    if _is_warmup_event(event):
+        _prime_index()
+        metrics.add_metric(name="WarmupInvocations", unit=MetricUnit.Count, value=1)
+        return {"statusCode": 200, "body": json.dumps({"warmed": True})}
     return app.resolve(event, context)
+
+
+def _is_warmup_event(event: Dict[str, Any]) -> bool:
+    """Scheduled pings ({"warmup": true} or a plain EventBridge schedule)."""
+    return event.get("warmup") is True or (
+        event.get("source") == "aws.events"
+        and event.get("detail-type") == "Scheduled Event"
+    )
+
+
+if INDEX_PRIME_ON_INIT:
+    _start_index_priming()
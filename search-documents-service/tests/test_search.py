@@ -1,6 +1,7 @@
 """Tests for search-documents-service."""
 
 import math
+import os
 import sqlite3
 import struct
 import sys
@@ -107,10 +108,10 @@ def app_module(monkeypatch, tmp_path):
     with patch("boto3.client", side_effect=client_factory):
         import app as m
 
-    m.get_application_bucket.cache_clear()
-    m.get_bearer_token.cache_clear()
-    monkeypatch.setattr(m, "VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
-    return m
+        m.get_application_bucket.cache_clear()
+        m.get_bearer_token.cache_clear()
+        monkeypatch.setattr(m, "VECTOR_DB_LOCAL_PATH", str(tmp_path / "index.db"))
+        yield m
 
 
 # ---------------------------------------------------------------------------
@@ -288,3 +289,1016 @@ def test_tags_search_empty_tags_returns_empty(tmp_path, app_module):
     results = app_module._tags_search(conn, [], top_k=5)
     conn.close()
     assert results == []
+
+
+# ---------------------------------------------------------------------------
+# Tag-filtered _vector_search
+# ---------------------------------------------------------------------------
+
+
+def _tagged_corpus(tmp_path, tagged: int, untagged: int) -> sqlite3.Connection:
+    """Documents a0.. tagged "llm" and b0.. untagged; b* are closest to seed 1."""
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    for i in range(untagged):
+        _insert_chunk(conn, f"https://b{i}.com", 0, _make_embedding(1))
+    for i in range(tagged):
+        _insert_chunk(conn, f"https://a{i}.com", 0, _make_embedding(50 + i))
+        _insert_tag(conn, f"https://a{i}.com", "llm")
+    return conn
+
+
+def test_vector_search_with_rare_tag_prefilters(tmp_path, app_module):
+    conn = _tagged_corpus(tmp_path, tagged=2, untagged=20)
+    stats: dict = {}
+
+    results = app_module._vector_search(
+        conn, _make_embedding(1), top_k=5, tags=["llm"], stats=stats
+    )
+    conn.close()
+
+    assert {r["url"] for r in results} == {"https://a0.com", "https://a1.com"}
+    assert stats["plan"].strategy == "prefilter"
+
+
+def test_vector_search_with_common_tag_postfilters(tmp_path, app_module):
+    conn = _tagged_corpus(tmp_path, tagged=20, untagged=2)
+    stats: dict = {}
+
+    results = app_module._vector_search(
+        conn, _make_embedding(1), top_k=3, tags=["llm"], stats=stats
+    )
+    conn.close()
+
+    assert len(results) == 3
+    assert all(r["url"].startswith("https://a") for r in results)
+    assert stats["plan"].strategy == "postfilter"
+
+
+def test_vector_search_postfilter_falls_back_when_short(
+    tmp_path, app_module, monkeypatch
+):
+    # Untagged chunks crowd the widened KNN, so too few tagged ones survive
+    monkeypatch.setattr(app_module, "TAG_POSTFILTER_MIN_SELECTIVITY", 0.0)
+    monkeypatch.setattr(app_module, "MAX_KNN_K", 20)
+    conn = _tagged_corpus(tmp_path, tagged=3, untagged=30)
+    stats: dict = {}
+
+    results = app_module._vector_search(
+        conn, _make_embedding(1), top_k=3, tags=["llm"], stats=stats
+    )
+    conn.close()
+
+    assert len(results) == 3
+    assert stats["plan"].strategy == "prefilter"
+
+
+def test_vector_search_with_unknown_tag_returns_nothing(tmp_path, app_module):
+    conn = _tagged_corpus(tmp_path, tagged=2, untagged=2)
+
+    results = app_module._vector_search(
+        conn, _make_embedding(1), top_k=5, tags=["missing"]
+    )
+    conn.close()
+
+    assert results == []
+
+
+# ---------------------------------------------------------------------------
+# Two-stage (document centroid → chunk) _vector_search
+# ---------------------------------------------------------------------------
+
+
+def _add_centroids(conn: sqlite3.Connection, centroids: dict[str, list[float]]):
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_documents USING vec0(
+            document_id INTEGER PRIMARY KEY,
+            embedding   float[1024],
+            +url        TEXT
+        )
+        """
+    )
+    for url, centroid in centroids.items():
+        conn.execute(
+            "INSERT INTO vec_documents (embedding, url) VALUES (?, ?)",
+            (_serialize(centroid), url),
+        )
+    conn.commit()
+
+
+def test_vector_search_scores_only_shortlisted_documents(
+    tmp_path, app_module, monkeypatch
+):
+    monkeypatch.setattr(app_module, "CENTROID_CANDIDATES_PER_RESULT", 1)
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    for i in range(5):
+        _insert_chunk(conn, f"https://example.com/{i}", 0, _make_embedding(i * 10))
+    # Only /3's centroid is near the query; the rest point elsewhere
+    centroids = {f"https://example.com/{i}": _make_embedding(500 + i) for i in range(5)}
+    centroids["https://example.com/3"] = _make_embedding(30)
+    _add_centroids(conn, centroids)
+    stats: dict = {}
+
+    results = app_module._vector_search(conn, _make_embedding(30), 1, stats=stats)
+    conn.close()
+
+    assert [r["url"] for r in results] == ["https://example.com/3"]
+    assert stats["plan"].strategy == "two-stage"
+    assert stats["plan"].documents == ["https://example.com/3"]
+
+
+def test_vector_search_without_centroid_table_scores_every_chunk(tmp_path, app_module):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    _insert_chunk(conn, "https://example.com/a", 0, _make_embedding(1))
+    stats: dict = {}
+
+    app_module._vector_search(conn, _make_embedding(1), 5, stats=stats)
+    conn.close()
+
+    assert stats["plan"].strategy == "global"
+
+
+# ---------------------------------------------------------------------------
+# /search route
+# ---------------------------------------------------------------------------
+
+
+def _add_short_vectors(conn: sqlite3.Connection, vectors: dict[int, list[float]]):
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks_short USING vec0(
+            chunk_id  INTEGER PRIMARY KEY,
+            embedding float[256]
+        )
+        """
+    )
+    for chunk_id, vector in vectors.items():
+        conn.execute(
+            "INSERT INTO vec_chunks_short (chunk_id, embedding) VALUES (?, ?)",
+            (chunk_id, _serialize(vector)),
+        )
+    conn.commit()
+
+
+def test_short_vector_pass_reranks_candidates_on_full_embeddings(
+    tmp_path, app_module, monkeypatch
+):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    for i in range(8):
+        _insert_chunk(conn, f"https://example.com/{i}", 0, _make_embedding(i * 10))
+    # /3 is the exact match, but its short vector points elsewhere
+    _add_short_vectors(
+        conn,
+        {
+            i + 1: app_module._short_vector(_make_embedding(52 if i == 3 else i * 10))
+            for i in range(8)
+        },
+    )
+    query = _make_embedding(30)
+    exact = app_module._vector_search(conn, query, 1)
+    monkeypatch.setattr(app_module, "SHORT_VECTOR_CANDIDATES_PER_RESULT", 3)
+    stats: dict = {}
+
+    results = app_module._vector_search(conn, query, 1, stats=stats)
+    conn.close()
+
+    assert stats["plan"].short_candidates == 3
+    assert stats["candidates"] == 3
+    assert exact[0]["url"] == "https://example.com/3"
+    assert results[0]["url"] != "https://example.com/3"
+    assert results[0]["distance"] > exact[0]["distance"]
+
+
+def test_short_vector_pass_keeps_exact_distances(tmp_path, app_module, monkeypatch):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    for i in range(4):
+        _insert_chunk(conn, f"https://example.com/{i}", 0, _make_embedding(i * 10))
+    short = {i + 1: app_module._short_vector(_make_embedding(i * 10)) for i in range(4)}
+    _add_short_vectors(conn, short)
+    exact = app_module._vector_search(conn, _make_embedding(11), 2)
+    monkeypatch.setattr(app_module, "SHORT_VECTOR_CANDIDATES_PER_RESULT", 4)
+
+    results = app_module._vector_search(conn, _make_embedding(11), 2)
+    conn.close()
+
+    assert [r["url"] for r in results] == [r["url"] for r in exact]
+    for found, expected in zip(results, exact):
+        assert math.isclose(found["distance"], expected["distance"], rel_tol=1e-5)
+
+
+def _search_event(query: dict, path: str = "/search") -> dict:
+    return {
+        "version": "2.0",
+        "routeKey": f"GET {path}",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"authorization": "Bearer test-token"},
+        "queryStringParameters": query,
+        "isBase64Encoded": False,
+        "requestContext": {
+            "http": {
+                "method": "GET",
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "1.2.3.4",
+                "userAgent": "test",
+            },
+            "requestId": "test-123",
+            "stage": "$default",
+        },
+    }
+
+
+@pytest.fixture
+def search_ready(app_module, monkeypatch):
+    """Authenticate requests, embed deterministically and serve a small index."""
+    import json
+    import time
+
+    app_module.get_ssm_client().get_parameter.return_value = {
+        "Parameter": {"Value": "test-token"}
+    }
+    monkeypatch.setattr(app_module, "embed_query", lambda text: _make_embedding(1))
+    conn = _open_test_db(app_module.VECTOR_DB_LOCAL_PATH)
+    _insert_chunk(conn, "https://example.com/a", 0, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/a", 1, _make_embedding(2))
+    conn.execute(
+        "INSERT INTO documents (url, full_title, title) VALUES (?, ?, ?)",
+        ("https://example.com/a", "Cold starts", "cold starts"),
+    )
+    conn.execute(
+        "INSERT INTO document_tags (url, tag) VALUES (?, ?)",
+        ("https://example.com/a", "aws"),
+    )
+    conn.commit()
+    conn.close()
+    app_module._index_last_downloaded = time.monotonic()
+
+    def search(query: dict) -> tuple[dict, dict]:
+        result = app_module.app.resolve(_search_event(query), MagicMock())
+        assert result["statusCode"] == 200
+        return result["headers"], json.loads(result["body"])
+
+    yield search
+    for conn in app_module._shards + app_module._retired_shards:
+        conn.close()
+
+
+def test_search_returns_server_timing_header(search_ready):
+    headers, body = search_ready({"q": "cold #aws"})
+
+    timings = dict(
+        entry.split(";dur=") for entry in headers["Server-Timing"].split(", ")
+    )
+    expected = {"index-check", "db-open", "embed", "vector", "title", "tags", "total"}
+    assert expected <= set(timings)
+    assert all(float(ms) >= 0 for ms in timings.values())
+    assert "explain" not in body
+
+
+def test_search_explain_reports_candidates_and_query_plans(search_ready):
+    _, body = search_ready({"q": "cold #aws", "explain": "1"})
+
+    explain = body["explain"]
+    assert explain["candidates"] == {"vector": 2, "title": 1, "tags": 1}
+    assert explain["timings_ms"]["total"] >= explain["timings_ms"]["vector"]
+    assert explain["index"]["size_bytes"] > 0
+    plans = explain["query_plans"]
+    assert any("VIRTUAL TABLE" in step for step in plans["vector"])
+    assert plans["title"] == ["SCAN documents"]
+    assert any("idx_document_tags_tag" in step for step in plans["tags"])
+
+
+def test_repeated_search_is_served_from_cache(search_ready, app_module, monkeypatch):
+    embedded = []
+    monkeypatch.setattr(
+        app_module,
+        "embed_query",
+        lambda text: embedded.append(text) or _make_embedding(1),
+    )
+
+    first_headers, first = search_ready({"q": "cold #aws"})
+    second_headers, second = search_ready({"q": "cold #aws"})
+
+    assert embedded == ["cold"]
+    assert second == first
+    assert second_headers["ETag"] == first_headers["ETag"]
+    assert "vector" not in dict(
+        entry.split(";dur=") for entry in second_headers["Server-Timing"].split(", ")
+    )
+
+
+def test_search_cache_is_invalidated_when_a_new_index_is_opened(
+    search_ready, app_module, monkeypatch
+):
+    embedded = []
+    monkeypatch.setattr(
+        app_module,
+        "embed_query",
+        lambda text: embedded.append(text) or _make_embedding(1),
+    )
+
+    search_ready({"q": "cold"})
+    _serve_index_from(app_module, app_module.VECTOR_DB_LOCAL_PATH)
+    app_module._refresh_index_in_background()
+    search_ready({"q": "cold"})
+
+    assert embedded == ["cold", "cold"]
+
+
+def test_refresh_during_a_search_leaves_its_connections_open(
+    search_ready, app_module, monkeypatch
+):
+    _serve_index_from(app_module, app_module.VECTOR_DB_LOCAL_PATH)
+
+    def embed_while_refreshing(text):
+        # The background refresh lands between opening the shards and querying
+        app_module._refresh_index_in_background()
+        return _make_embedding(1)
+
+    monkeypatch.setattr(app_module, "embed_query", embed_while_refreshing)
+
+    _, body = search_ready({"q": "cold"})
+
+    assert body["sections"]["vector"]
+    assert app_module._retired_shards
+    monkeypatch.setattr(app_module, "embed_query", lambda text: _make_embedding(1))
+    search_ready({"q": "cold"})
+    assert not app_module._retired_shards
+
+
+def test_search_cache_evicts_least_recently_used(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "SEARCH_CACHE_SIZE", 2)
+    app_module._search_cache.clear()
+
+    app_module._cache_put(("a",), {})
+    app_module._cache_put(("b",), {})
+    app_module._cache_get(("a",))
+    app_module._cache_put(("c",), {})
+
+    assert list(app_module._search_cache) == [("a",), ("c",)]
+
+
+def test_search_returns_304_for_matching_if_none_match(search_ready, app_module):
+    headers, _ = search_ready({"q": "cold #aws"})
+
+    event = _search_event({"q": "cold #aws"})
+    event["headers"]["if-none-match"] = f'"other", W/{headers["ETag"]}'
+    result = app_module.app.resolve(event, MagicMock())
+
+    assert result["statusCode"] == 304
+    assert not result["body"]
+    assert result["headers"]["ETag"] == headers["ETag"]
+
+
+def test_similar_documents_uses_stored_vectors_only(tmp_path, app_module):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    _insert_chunk(conn, "https://example.com/source", 0, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/source", 1, _make_embedding(2))
+    _insert_chunk(conn, "https://example.com/near", 0, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/far", 0, _make_embedding(500))
+
+    results = app_module._similar_documents([conn], "https://example.com/source", 5)
+    conn.close()
+
+    urls = [r["url"] for r in results]
+    assert urls[0] == "https://example.com/near"
+    assert "https://example.com/source" not in urls
+    app_module.get_bedrock_client().invoke_model.assert_not_called()
+
+
+def test_similar_documents_reads_stored_centroid(tmp_path, app_module):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    _insert_chunk(conn, "https://example.com/source", 0, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/near", 0, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/far", 0, _make_embedding(500))
+    # A stored centroid wins over the mean of the source's chunks
+    _add_centroids(conn, {"https://example.com/source": _make_embedding(500)})
+
+    results = app_module._similar_documents([conn], "https://example.com/source", 1)
+    conn.close()
+
+    assert [r["url"] for r in results] == ["https://example.com/far"]
+
+
+def test_similar_documents_fetches_past_the_source_chunks(tmp_path, app_module):
+    conn = _open_test_db(str(tmp_path / "test.db"))
+    for i in range(8):
+        _insert_chunk(conn, "https://example.com/source", i, _make_embedding(1))
+    _insert_chunk(conn, "https://example.com/other", 0, _make_embedding(2))
+
+    results = app_module._similar_documents([conn], "https://example.com/source", 1)
+    conn.close()
+
+    assert [r["url"] for r in results] == ["https://example.com/other"]
+
+
+def test_similar_route_returns_related_documents(search_ready, app_module):
+    import json
+
+    conn = _open_test_db(app_module.VECTOR_DB_LOCAL_PATH)
+    _insert_chunk(conn, "https://example.com/b", 0, _make_embedding(3))
+    conn.close()
+
+    event = _search_event({"url": "https://example.com/a"}, path="/similar")
+    result = app_module.app.resolve(event, MagicMock())
+
+    assert result["statusCode"] == 200
+    assert result["headers"]["ETag"]
+    body = json.loads(result["body"])
+    assert [r["url"] for r in body["results"]] == ["https://example.com/b"]
+
+
+def test_similar_route_unknown_url_is_404(search_ready, app_module):
+    event = _search_event({"url": "https://example.com/missing"}, path="/similar")
+    result = app_module.app.resolve(event, MagicMock())
+
+    assert result["statusCode"] == 404
+
+
+# ---------------------------------------------------------------------------
+# Index priming / shared connection
+# ---------------------------------------------------------------------------
+
+
+def _serve_index_from(app_module, source_path: str) -> None:
+    """Make the mocked S3 download copy source_path to the requested file."""
+    import shutil
+
+    app_module.get_s3_client().download_file.side_effect = lambda bucket, key, dest: (
+        shutil.copyfile(source_path, dest)
+    )
+
+
+def test_get_shards_reuses_connection_until_new_download(app_module):
+    import time
+
+    _open_test_db(app_module.VECTOR_DB_LOCAL_PATH).close()
+    _serve_index_from(app_module, app_module.VECTOR_DB_LOCAL_PATH + ".src")
+    _open_test_db(app_module.VECTOR_DB_LOCAL_PATH + ".src").close()
+    app_module._index_last_downloaded = time.monotonic()
+
+    (first,) = app_module._get_shards()
+    assert app_module._get_shards() == [first]
+    app_module.get_s3_client().download_file.assert_not_called()
+
+    # TTL expired → re-download and reopen
+    app_module._index_last_downloaded = 0.0
+    (second,) = app_module._get_shards()
+    assert second is not first
+    app_module.get_s3_client().download_file.assert_called_once()
+    second.close()
+
+
+def test_warmup_event_primes_index_without_routing(app_module):
+    _open_test_db(app_module.VECTOR_DB_LOCAL_PATH + ".src").close()
+    _serve_index_from(app_module, app_module.VECTOR_DB_LOCAL_PATH + ".src")
+
+    result = app_module.lambda_handler({"warmup": True}, MagicMock())
+
+    assert result["statusCode"] == 200
+    assert app_module._shards
+    app_module.get_s3_client().download_file.assert_called_once()
+    app_module._shards[0].close()
+
+
+def test_stale_index_is_served_while_refreshing_in_background(app_module, monkeypatch):
+    import time
+
+    monkeypatch.setattr(app_module, "INDEX_MAX_STALENESS_SECONDS", 3600)
+    _open_test_db(app_module.VECTOR_DB_LOCAL_PATH).close()
+    app_module._index_last_downloaded = time.monotonic()
+    (first,) = app_module._get_shards()
+
+    # Newer index in S3 has a document the local copy lacks
+    source = app_module.VECTOR_DB_LOCAL_PATH + ".src"
+    conn = _open_test_db(source)
+    _insert_chunk(conn, "https://example.com/new", 0, _make_embedding(1))
+    conn.close()
+    import shutil
+    import threading
+
+    release = threading.Event()
+
+    def slow_download(bucket, key, dest):
+        release.wait(timeout=5)
+        shutil.copyfile(source, dest)
+
+    app_module.get_s3_client().download_file.side_effect = slow_download
+
+    # TTL expired but within max staleness → served from the open connection
+    app_module._index_last_downloaded = (
+        time.monotonic() - app_module.INDEX_CACHE_TTL_SECONDS - 1
+    )
+    assert app_module._get_shards() == [first]
+    assert first.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 0
+    release.set()
+    app_module._refresh_thread.join(timeout=5)
+    app_module.get_s3_client().download_file.assert_called_once()
+    # A request still holding the old snapshot can finish its queries
+    assert first.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 0
+
+    # The refresh swapped the file in and reopened under the lock; the next
+    # request closes the old connection
+    (second,) = app_module._get_shards()
+    assert second is not first
+    assert second.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute("SELECT 1")
+    index_dir = os.path.dirname(app_module.VECTOR_DB_LOCAL_PATH)
+    assert not [f for f in os.listdir(index_dir) if f.endswith(".download")]
+    second.close()
+
+
+def test_index_past_max_staleness_blocks_on_download(app_module, monkeypatch):
+    import time
+
+    monkeypatch.setattr(app_module, "INDEX_MAX_STALENESS_SECONDS", 3600)
+    _open_test_db(app_module.VECTOR_DB_LOCAL_PATH).close()
+    _serve_index_from(app_module, app_module.VECTOR_DB_LOCAL_PATH)
+    app_module._index_last_downloaded = time.monotonic() - 3601
+
+    assert app_module._ensure_index_fresh() is True
+    assert app_module._refresh_thread is None
+
+
+def test_failed_shard_download_keeps_live_shards(app_module, monkeypatch):
+    import shutil
+
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setattr(app_module, "INDEX_SHARDS", 2)
+    monkeypatch.setattr(app_module, "_available_shards", [0])
+    live = app_module._shard_path(0)
+    _open_test_db(live).close()
+    source = f"{app_module.VECTOR_DB_LOCAL_PATH}.src"
+    conn = _open_test_db(source)
+    _insert_chunk(conn, "https://example.com/new", 0, _make_embedding(1))
+    conn.close()
+
+    def download_file(bucket, key, dest):
+        if key == app_module._shard_key(1):
+            raise ClientError({"Error": {"Code": "SlowDown"}}, "GetObject")
+        shutil.copyfile(source, dest)
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.side_effect = ClientError({"Error": {"Code": "404"}}, "GetObject")
+    s3.download_file.side_effect = download_file
+
+    with pytest.raises(ClientError):
+        app_module._fetch_index()
+
+    # Shard 0's finished download is discarded; the live file is untouched
+    index_dir = os.path.dirname(live)
+    assert not [f for f in os.listdir(index_dir) if f.endswith(".download")]
+    assert app_module._available_shards == [0]
+    served = app_module._open_db(live)
+    assert served.execute("SELECT COUNT(*) FROM chunks").fetchone() == (0,)
+    served.close()
+
+
+def test_sharded_index_downloads_available_shards_and_merges(app_module, monkeypatch):
+    import shutil
+
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setattr(app_module, "INDEX_SHARDS", 3)
+    monkeypatch.setattr(app_module, "_available_shards", [0, 1, 2])
+    sources = {}
+    for shard, docs in ((0, {"far": 500, "source": 1}), (2, {"near": 1})):
+        path = f"{app_module.VECTOR_DB_LOCAL_PATH}.src{shard}"
+        conn = _open_test_db(path)
+        for name, seed in docs.items():
+            _insert_chunk(conn, f"https://example.com/{name}", 0, _make_embedding(seed))
+            conn.execute(
+                "INSERT INTO documents (url, full_title, title) VALUES (?, ?, ?)",
+                (f"https://example.com/{name}", name, name),
+            )
+        conn.commit()
+        conn.close()
+        sources[app_module._shard_key(shard)] = path
+
+    def download_file(bucket, key, dest):
+        if key not in sources:  # no document has hashed to shard 1 yet
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        shutil.copyfile(sources[key], dest)
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+    )
+    s3.download_file.side_effect = download_file
+
+    shards = app_module._get_shards()
+    vector = app_module._vector_search_shards(shards, _make_embedding(1), 2)
+    similar = app_module._similar_documents(shards, "https://example.com/source", 5)
+    for conn in shards:
+        conn.close()
+
+    assert s3.download_file.call_count == 3
+    assert app_module._available_shards == [0, 2]
+    assert len(shards) == 2
+    assert {r["url"] for r in vector} == {
+        "https://example.com/source",
+        "https://example.com/near",
+    }
+    assert [r["url"] for r in similar] == [
+        "https://example.com/near",
+        "https://example.com/far",
+    ]
+
+
+@pytest.mark.parametrize("mode", ["mmap", "memory", "file"])
+def test_open_db_serving_modes_are_read_only(app_module, monkeypatch, mode):
+    monkeypatch.setattr(app_module, "INDEX_SERVING_MODE", mode)
+    conn = _open_test_db(app_module.VECTOR_DB_LOCAL_PATH)
+    _insert_chunk(conn, "https://example.com/a", 0, _make_embedding(1))
+    conn.close()
+
+    served = app_module._open_db()
+    results = app_module._vector_search(served, _make_embedding(1), top_k=5)
+    assert [r["url"] for r in results] == ["https://example.com/a"]
+    if mode == "mmap":
+        assert served.execute("PRAGMA mmap_size").fetchone()[0] > 0
+    if mode != "file":
+        with pytest.raises(sqlite3.OperationalError):
+            served.execute("DELETE FROM chunks")
+    served.close()
+
+
+def test_is_warmup_event_recognises_eventbridge_schedule(app_module):
+    assert app_module._is_warmup_event(
+        {"source": "aws.events", "detail-type": "Scheduled Event"}
+    )
+    assert not app_module._is_warmup_event({"rawPath": "/search"})
+
+
+# ---------------------------------------------------------------------------
+# On-demand profiling
+# ---------------------------------------------------------------------------
+
+
+def test_profiling_query_mode_only_profiles_opted_in_requests(
+    app_module, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", "query")
+    monkeypatch.setattr(app_module, "PROFILE_OUTPUT", str(tmp_path / "profiles"))
+    app_module.get_ssm_client().get_parameter.return_value = {
+        "Parameter": {"Value": "test-token"}
+    }
+    handler = app_module.profile_on_demand(lambda event, context: {"statusCode": 200})
+
+    handler({"queryStringParameters": {"q": "x"}}, MagicMock(aws_request_id="plain"))
+    handler({"warmup": True}, MagicMock(aws_request_id="ping"))
+    # Opting in takes a valid token, as the route itself would
+    for headers in ({}, {"authorization": "Bearer wrong-token"}):
+        event = {"headers": headers, "queryStringParameters": {"profile": "1"}}
+        handler(event, MagicMock(aws_request_id="anonymous"))
+    assert not (tmp_path / "profiles").exists()
+
+    event = {
+        "headers": {"authorization": "Bearer test-token"},
+        "queryStringParameters": {"q": "x", "profile": "1"},
+    }
+    result = handler(event, MagicMock(aws_request_id="req-1"))
+
+    assert result == {"statusCode": 200}
+    assert (tmp_path / "profiles" / "req-1.prof").stat().st_size > 0
+    report = (tmp_path / "profiles" / "req-1.txt").read_text()
+    assert "Peak traced memory" in report
+    assert "function calls" in report
+
+
+def test_profiling_writes_to_s3_prefix(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "PROFILE_INVOCATIONS", "always")
+    monkeypatch.setattr(
+        app_module, "PROFILE_OUTPUT", "s3://profile-bucket/profiles/search"
+    )
+    handler = app_module.profile_on_demand(lambda event, context: {"statusCode": 200})
+
+    handler({}, MagicMock(aws_request_id="req-2"))
+
+    keys = [
+        c.kwargs["Key"] for c in app_module.get_s3_client().put_object.call_args_list
+    ]
+    assert keys == ["profiles/search/req-2.prof", "profiles/search/req-2.txt"]
+
+
+def test_download_prefers_compressed_index(app_module, tmp_path):
+    import gzip
+    import io
+
+    from botocore.exceptions import ClientError
+    from botocore.response import StreamingBody
+
+    source = str(tmp_path / "source.db")
+    conn = _open_test_db(source)
+    _insert_chunk(conn, "https://example.com/gz", 0, _make_embedding(1))
+    conn.close()
+    with open(source, "rb") as f:
+        data = gzip.compress(f.read())
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.return_value = {
+        "Body": StreamingBody(io.BytesIO(data), len(data)),
+        "Metadata": {"index-format": app_module.COMPRESSED_INDEX_FORMAT},
+    }
+
+    app_module._download_index()
+    s3.get_object.assert_called_once_with(
+        Bucket="test-bucket", Key=f"{app_module.VECTOR_DB_S3_KEY}.gz"
+    )
+    s3.download_file.assert_not_called()
+    served = app_module._open_db()
+    results = app_module._vector_search(served, _make_embedding(1), top_k=5)
+    served.close()
+    assert [r["url"] for r in results] == ["https://example.com/gz"]
+
+
+def test_download_falls_back_to_raw_index_when_compressed_copy_is_unusable(
+    app_module, tmp_path
+):
+    import gzip
+    import io
+
+    from botocore.exceptions import ClientError
+    from botocore.response import StreamingBody
+
+    source = str(tmp_path / "source.db")
+    conn = _open_test_db(source)
+    _insert_chunk(conn, "https://example.com/raw", 0, _make_embedding(1))
+    conn.close()
+    _serve_index_from(app_module, source)
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+
+    # No compressed copy yet
+    s3.get_object.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+    )
+    app_module._download_index()
+    s3.download_file.assert_called_once()
+
+    # A permissions problem surfaces instead of passing for a missing copy
+    s3.get_object.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "GetObject"
+    )
+    with pytest.raises(ClientError):
+        app_module._download_index()
+    s3.download_file.assert_called_once()
+
+    # A truncated gzip stream fails and leaves the current index in place
+    with open(source, "rb") as f:
+        data = gzip.compress(f.read())[:-100]
+    s3.get_object.side_effect = None
+    s3.get_object.return_value = {
+        "Body": StreamingBody(io.BytesIO(data), len(data)),
+        "Metadata": {"index-format": app_module.COMPRESSED_INDEX_FORMAT},
+    }
+    os.remove(source)
+    with pytest.raises(EOFError):
+        app_module._download_index()
+    served = app_module._open_db()
+    (count,) = served.execute("SELECT COUNT(*) FROM chunks").fetchone()
+    served.close()
+    assert count == 1
+    assert os.listdir(tmp_path) == ["index.db"]
+
+
+def test_missing_unsharded_index_raises(app_module):
+    from botocore.exceptions import ClientError
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.side_effect = ClientError({"Error": {"Code": "NoSuchKey"}}, "Get")
+    s3.download_file.side_effect = ClientError({"Error": {"Code": "404"}}, "Head")
+
+    with pytest.raises(FileNotFoundError):
+        app_module._download_shard(0)
+
+
+def _range_s3(app_module, path: str) -> dict:
+    """Fake S3 serving `path` with HEAD and ranged, ETag-conditional GETs."""
+    import io
+
+    from botocore.exceptions import ClientError
+    from botocore.response import StreamingBody
+
+    state = {"etag": '"v1"', "ranges": []}
+
+    def head_object(Bucket, Key):
+        with open(path, "rb") as f:
+            size = len(f.read())
+        return {"ETag": state["etag"], "ContentLength": size}
+
+    def get_object(Bucket, Key, Range, IfMatch):
+        if IfMatch != state["etag"]:
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "GetObject")
+        start, end = (int(n) for n in Range.removeprefix("bytes=").split("-"))
+        state["ranges"].append((start, end))
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        return {"Body": StreamingBody(io.BytesIO(data), len(data))}
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.head_object.side_effect = head_object
+    s3.get_object.side_effect = get_object
+    return state
+
+
+def test_remote_mode_reads_pages_with_range_requests(app_module, tmp_path, monkeypatch):
+    import itertools
+
+    monkeypatch.setattr(app_module, "INDEX_SERVING_MODE", "remote")
+    monkeypatch.setattr(app_module, "INDEX_REMOTE_BLOCK_BYTES", 4096)
+    monkeypatch.setattr(app_module, "INDEX_REMOTE_READAHEAD_BYTES", 8 * 4096)
+    source = str(tmp_path / "remote.db")
+    conn = _open_test_db(source)
+    for seed in range(40):
+        url = f"https://example.com/{seed}"
+        _insert_chunk(conn, url, 0, _make_embedding(seed))
+        conn.execute(
+            "INSERT INTO documents (url, full_title, title) VALUES (?, ?, ?)",
+            (url, f"doc {seed} #t{seed % 4}", f"doc {seed}"),
+        )
+        conn.execute(
+            "INSERT INTO document_tags (url, tag) VALUES (?, ?)", (url, f"t{seed % 4}")
+        )
+    conn.commit()
+    conn.close()
+    state = _range_s3(app_module, source)
+
+    shards = app_module._get_shards()
+    tagged = app_module._tags_search(shards[0], ["t1"], 5)
+    fetched = app_module._remote_block_cache().bytes_fetched
+    vector = app_module._vector_search(shards[0], _make_embedding(3), 1)
+    requests = len(state["ranges"])
+    assert app_module._tags_search(shards[0], ["t1"], 5) == tagged
+
+    app_module.get_s3_client().download_file.assert_not_called()
+    assert len(tagged) == 5
+    assert all(int(r["url"].rsplit("/", 1)[1]) % 4 == 1 for r in tagged)
+    assert fetched < os.path.getsize(source) / 4
+    assert [r["url"] for r in vector] == ["https://example.com/3"]
+    assert len(state["ranges"]) == requests  # served from the block cache
+    assert all(end - start + 1 <= 8 * 4096 for start, end in state["ranges"])
+    fetched = sorted(state["ranges"])
+    assert all(a[1] < b[0] for a, b in itertools.pairwise(fetched))  # no overlap
+
+
+def test_remote_index_change_forces_refresh(app_module, tmp_path, monkeypatch):
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setattr(app_module, "INDEX_SERVING_MODE", "remote")
+    monkeypatch.setattr(app_module, "INDEX_REMOTE_BLOCK_BYTES", 4096)
+    source = str(tmp_path / "remote.db")
+    conn = _open_test_db(source)
+    _insert_chunk(conn, "https://example.com/a", 0, _make_embedding(1))
+    conn.close()
+    state = _range_s3(app_module, source)
+
+    shards = app_module._get_shards()
+    state["etag"] = '"v2"'
+    # The VFS read's failed conditional GET surfaces through apsw unchanged
+    with pytest.raises(ClientError, match="PreconditionFailed"):
+        app_module._vector_search(shards[0], _make_embedding(1), 1)
+    assert app_module._index_last_downloaded == 0.0
+
+    shards = app_module._get_shards()
+    assert app_module._remote_shards[0].etag == '"v2"'
+    results = app_module._vector_search(shards[0], _make_embedding(1), 1)
+    assert [r["url"] for r in results] == ["https://example.com/a"]
+
+
+# ---------------------------------------------------------------------------
+# Change log replay
+# ---------------------------------------------------------------------------
+
+
+def _change_record(
+    sequence: int, op: str, url: str, title=None, tags=(), embeddings=()
+):
+    """A record shaped like the indexer's; the short vectors and centroid are
+    stand-ins of the right size."""
+    import base64
+    import gzip
+    import json
+
+    def encode(embedding):
+        return base64.b64encode(_serialize(embedding)).decode()
+
+    change = {
+        "format": 1,
+        "sequence": sequence,
+        "op": op,
+        "url": url,
+        "full_title": title,
+        "title": title.lower() if title else None,
+        "tags": list(tags),
+        "chunks": [
+            {
+                "text": f"chunk {i}",
+                "embedding": encode(e),
+                "short_embedding": encode(e[:256]),
+            }
+            for i, e in enumerate(embeddings)
+        ],
+        "centroid": encode(embeddings[0]) if embeddings else None,
+    }
+    return gzip.compress(json.dumps(change).encode())
+
+
+def _change_log_s3(app_module, snapshot: str) -> dict[str, bytes]:
+    """Serve `snapshot` as the raw index and a dict of keys as the change log."""
+    import io
+    import shutil
+
+    from botocore.exceptions import ClientError
+
+    records: dict[str, bytes] = {}
+
+    def get_object(Bucket, Key):
+        if Key not in records:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(records[Key])}
+
+    def paginate(Bucket, Prefix, StartAfter):
+        keys = sorted(k for k in records if k.startswith(Prefix) and k > StartAfter)
+        return [{"Contents": [{"Key": k} for k in keys]}]
+
+    s3 = app_module.get_s3_client()
+    s3.exceptions.ClientError = ClientError
+    s3.get_object.side_effect = get_object
+    s3.download_file.side_effect = lambda bucket, key, dest: shutil.copyfile(
+        snapshot, dest
+    )
+    s3.get_paginator.return_value.paginate.side_effect = paginate
+    return records
+
+
+def test_change_log_is_applied_on_top_of_snapshot(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "INDEX_CHANGE_LOG", True)
+    snapshot = str(tmp_path / "snapshot.db")
+    conn = _open_test_db(snapshot)
+    _insert_chunk(conn, "https://example.com/a", 0, _make_embedding(1))
+    conn.close()
+    records = _change_log_s3(app_module, snapshot)
+    records["vector-index/log/000000000001.json.gz"] = _change_record(
+        1,
+        "upsert",
+        "https://example.com/new",
+        "New page",
+        ["fresh"],
+        [_make_embedding(7)],
+    )
+
+    (shard,) = app_module._get_shards()
+    assert app_module._local_log_position(0) == 1
+    results = app_module._vector_search(shard, _make_embedding(7), top_k=1)
+    assert [r["url"] for r in results] == ["https://example.com/new"]
+    assert [r["url"] for r in app_module._tags_search(shard, ["fresh"], 5)] == [
+        "https://example.com/new"
+    ]
+
+    # Nothing is listed again until the poll interval has passed
+    records["vector-index/log/000000000002.json.gz"] = _change_record(
+        2, "delete", "https://example.com/a"
+    )
+    assert app_module._get_shards() == [shard]
+    app_module._change_log_checked = 0.0
+    (shard,) = app_module._get_shards()
+    urls = [row[0] for row in shard.execute("SELECT url FROM chunks")]
+    assert urls == ["https://example.com/new"]
+
+    # Compaction deleted records this copy never saw: start from its snapshot
+    conn = _open_test_db(snapshot)
+    _insert_chunk(conn, "https://example.com/compacted", 0, _make_embedding(3))
+    conn.execute(
+        "CREATE TABLE change_log_position (id INTEGER PRIMARY KEY, sequence INTEGER)"
+    )
+    conn.execute("INSERT INTO change_log_position VALUES (1, 5)")
+    conn.commit()
+    conn.close()
+    records.clear()
+    records["vector-index/log/000000000006.json.gz"] = _change_record(
+        6,
+        "upsert",
+        "https://example.com/after",
+        "After",
+        embeddings=[_make_embedding(4)],
+    )
+    app_module._change_log_checked = 0.0
+    (shard,) = app_module._get_shards()
+    urls = sorted(row[0] for row in shard.execute("SELECT url FROM chunks"))
+    assert urls == [
+        "https://example.com/a",
+        "https://example.com/after",
+        "https://example.com/compacted",
+    ]
+    assert app_module._local_log_position(0) == 6
+    shard.close()